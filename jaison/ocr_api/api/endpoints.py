@@ -4,7 +4,7 @@ OCR API endpoints for image upload and processing
 import os
 import uuid
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable, Awaitable
 from datetime import datetime, timezone
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, BackgroundTasks, Path
 import httpx
@@ -17,14 +17,26 @@ from jaison.ocr_api.api.models import (
     ProcessingRequest,
     ProcessingResponse,
     ErrorResponse,
-    HealthCheckResponse
+    HealthCheckResponse,
+    MetricsResponse,
 )
 from jaison.ocr_api.api.dependencies import get_api_key, rate_limiter, APIKeyInfo
 from jaison.ocr_api.services.admin_client import admin_client
-from jaison.ocr_api.services.openrouter_client import openrouter_client
+from jaison.ocr_api.services.openrouter_client import openrouter_client, ExtractionResult
+from jaison.ocr_api.services.image_processor import image_processor, compute_fingerprint, images_match
+from jaison.ocr_api.services.result_cache import result_cache
+from jaison.ocr_api.services.micro_batcher import micro_batcher
+from jaison.ocr_api.services.model_cascade import model_cascade
+from jaison.ocr_api.services.field_repair import field_repairer
+from jaison.ocr_api.services.adaptive_limits import adaptive_limits
+from jaison.ocr_api.services.phash_index import phash_index
+from jaison.ocr_api.services.image_profiles import get_image_profile
+from jaison.ocr_api.services.pdf_processor import pdf_processor, is_pdf
 from jaison.ocr_api.services.prompt_service import PromptService
-from jaison.ocr_api.services.storage_service import StorageService
+from jaison.ocr_api.services.storage_service import storage_service, FileTooLargeError
 from jaison.ocr_api.config.settings import settings
+from jaison.ocr_api.utils.json_parser import REPAIR_TRUNCATED
+from jaison.ocr_api.utils.single_flight import SingleFlight
 
 # Create router
 router = APIRouter(
@@ -41,12 +53,15 @@ router = APIRouter(
 )
 
 # Initialize services
-storage_service = StorageService()
 prompt_service = PromptService()
+extraction_flights = SingleFlight()
 
 # Start time for uptime calculation
 START_TIME = time.time()
 
+# Formats accepted by /upload, as sniffed from the file content
+UPLOAD_CONTENT_TYPES = ("image/jpeg", "image/png", "application/pdf")
+
 @router.get("/health", response_model=HealthCheckResponse, dependencies=[])
 async def health_check():
     """
@@ -66,7 +81,31 @@ async def health_check():
         status="ok",
         version="1.0.0",
         admin_api_status=admin_api_status,
-        uptime_seconds=time.time() - START_TIME
+        uptime_seconds=time.time() - START_TIME,
+        circuit_breakers=openrouter_client.get_circuit_breaker_states(),
+    )
+
+@router.get("/metrics", response_model=MetricsResponse, dependencies=[])
+async def get_metrics():
+    """
+    Metrics endpoint
+
+    Returns runtime statistics of the OCR API components
+    """
+    return MetricsResponse(
+        openrouter_pool=openrouter_client.get_pool_stats(),
+        openrouter_concurrency=openrouter_client.get_concurrency_stats(),
+        openrouter_routing=openrouter_client.get_routing_stats(),
+        image_processor=image_processor.get_stats(),
+        result_cache=result_cache.get_stats(),
+        single_flight=extraction_flights.get_stats(),
+        near_duplicates=phash_index.get_stats(),
+        micro_batching=micro_batcher.get_stats(),
+        cascade=model_cascade.get_stats(),
+        field_repair=field_repairer.get_stats(),
+        adaptive_limits=adaptive_limits.get_stats(),
+        prompts=prompt_service.get_stats(),
+        retention=storage_service.get_stats(),
     )
 
 @router.post("/upload", response_model=UploadResponse, status_code=201)
@@ -92,36 +131,45 @@ async def upload_image(
                 detail=f"Unsupported file type: {file_ext}. Supported types: JPG, PNG, PDF"
             )
 
-        # Check file size
-        file_size = 0
-        file_content = await file.read()
-        file_size = len(file_content)
-
-        if file_size > settings.MAX_UPLOAD_SIZE:
+        # Reject uploads whose size is already known to be too large before reading them
+        if file.size is not None and file.size > settings.MAX_UPLOAD_SIZE:
             raise HTTPException(
                 status_code=400,
-                detail=f"File too large: {file_size} bytes. Maximum size: {settings.MAX_UPLOAD_SIZE} bytes"
+                detail=f"File too large: {file.size} bytes. Maximum size: {settings.MAX_UPLOAD_SIZE} bytes"
             )
 
-        # Reset file position after reading
-        await file.seek(0)
-
         # Generate unique file ID
         file_id = str(uuid.uuid4())
 
-        # Save file
-        await storage_service.save_file(file_id, file)
+        # Save file, checking the size and hashing it while it is written
+        try:
+            saved = await storage_service.save_file(file_id, file, max_size=settings.MAX_UPLOAD_SIZE)
+        except FileTooLargeError as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"File too large. Maximum size: {e.max_size} bytes"
+            )
+
+        # Validate the content, not just the extension
+        if saved.content_type not in UPLOAD_CONTENT_TYPES:
+            await storage_service.delete_file(file_id)
+            raise HTTPException(
+                status_code=400,
+                detail="Unsupported file content. Supported types: JPG, PNG, PDF"
+            )
+        file_size = saved.size
 
         # Create response
         response = UploadResponse(
             file_id=file_id,
             filename=file.filename,
-            content_type=file.content_type,
+            content_type=saved.content_type,
             size=file_size,
+            sha256=saved.sha256,
             upload_time=datetime.now(timezone.utc),
         )
 
-        logger.info(f"File uploaded: {file_id}, size: {file_size} bytes, type: {file.content_type}")
+        logger.info(f"File uploaded: {file_id}, size: {file_size} bytes, type: {saved.content_type}")
 
         # Record API usage with Admin API
         try:
@@ -132,7 +180,7 @@ async def upload_image(
                 status_code=201,
                 processing_time_ms=int((time.time() - start_time) * 1000),
                 request_size_bytes=file_size,
-                document_type=file.content_type,
+                document_type=saved.content_type,
                 credits_used=0.1  # Upload costs 0.1 credits
             )
         except Exception as e:
@@ -172,14 +220,14 @@ async def process_document(
     - **extraction_prompt**: What information to extract from the document
     - **model**: Optional model to use (defaults to system default)
     - **output_schema**: Optional JSON schema for structuring the output
+    - **stream**: Optional flag to publish partial results to /status while the model generates
     """
     # Start timing the request
     start_time = time.time()
 
     try:
         # Check if file exists
-        file_path = storage_service.get_file_path(request.file_id)
-        if not os.path.exists(file_path):
+        if not await storage_service.file_exists(request.file_id):
             raise HTTPException(
                 status_code=404,
                 detail=f"File not found: {request.file_id}"
@@ -197,7 +245,9 @@ async def process_document(
         )
 
         # Store the response for later retrieval
-        await storage_service.save_processing_response(request_id, response.model_dump())
+        await storage_service.save_processing_response(
+            request_id, response.model_dump(), user_id=api_key_info.user_id, api_key_id=api_key_info.key_id
+        )
 
         # Record API usage with Admin API
         try:
@@ -224,6 +274,8 @@ async def process_document(
             extraction_prompt=request.extraction_prompt,
             model=request.model,
             output_schema=request.output_schema,
+            stream=request.stream,
+            cascade=request.cascade,
             user_id=api_key_info.user_id,
             api_key_id=api_key_info.key_id,
         )
@@ -295,6 +347,102 @@ async def get_processing_status(
         )
 
 
+async def extract_with_cache(
+    image_data: bytes,
+    prompt: str,
+    model: str,
+    on_partial: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    deadline: Optional[float] = None,
+    near_duplicate_scope: Optional[str] = None,
+    output_schema: Optional[Dict[str, Any]] = None,
+    max_tokens: int = 1000,
+    budget_key: Optional[str] = None,
+    system_prompt: Optional[str] = None,
+    repair: Optional[Callable[[ExtractionResult], Awaitable[ExtractionResult]]] = None,
+    api_key_id: Optional[str] = None,
+) -> ExtractionResult:
+    """
+    Extract data from a normalized image, reusing a previous or in-flight extraction of the same content
+
+    Args:
+        image_data: Normalized image bytes
+        prompt: Request-specific user prompt
+        model: Model to use
+        on_partial: Optional callback receiving partial results while streaming
+        deadline: Monotonic time by which retries must be finished
+        near_duplicate_scope: If given, reuse the extraction of a visually
+            near-identical image in this scope, once its pixels are verified
+        output_schema: JSON schema the output must follow (not embedded in the prompt)
+        max_tokens: Maximum tokens to generate
+        budget_key: If given, record the tokens generated under this key of adaptive_limits
+        system_prompt: Static instructions sent before the prompt as a system message
+        repair: If given, applied to a new extraction before it is cached, so
+            cache hits return the repaired result without repeating the repair
+        api_key_id: API key of the request, which micro-batches are kept within
+
+    Returns:
+        Extraction result
+    """
+    cache_key = result_cache.make_key(image_data, prompt, model, output_schema, system_prompt)
+    cached = await result_cache.get(cache_key)
+
+    if cached is not None:
+        logger.info(f"Result cache hit: {cache_key[:12]}")
+        return ExtractionResult(**cached)
+
+    fingerprint = None
+    if near_duplicate_scope is not None and phash_index.enabled:
+        fingerprint = await image_processor.run(compute_fingerprint, image_data)
+        image_hash, pixels = fingerprint
+        for duplicate_key, duplicate_pixels in phash_index.candidates(near_duplicate_scope, image_hash):
+            # Same-template documents hash alike, so only reuse a result once the pixels match too
+            if not await image_processor.run(images_match, pixels, duplicate_pixels, phash_index.verify_tolerance):
+                phash_index.record_verification(False)
+                continue
+            cached = await result_cache.get(duplicate_key)
+            if cached is not None:
+                phash_index.record_verification(True)
+                logger.info(f"Near-duplicate hit: {cache_key[:12]} matches {duplicate_key[:12]}")
+                return ExtractionResult(**cached)
+
+    async def extract() -> ExtractionResult:
+        # Process the image; small documents that are not streamed may share a call with others
+        if on_partial is None and micro_batcher.accepts(image_data):
+            result = await micro_batcher.submit(
+                image_data, prompt, model, deadline, output_schema, max_tokens, system_prompt, api_key_id
+            )
+        else:
+            result = await openrouter_client.extract_image(
+                image_data=image_data,
+                prompt=prompt,
+                model=model,
+                max_tokens=max_tokens,
+                preprocessed=True,
+                on_partial=on_partial,
+                deadline=deadline,
+                output_schema=output_schema,
+                system_prompt=system_prompt,
+            )
+
+        if budget_key is not None:
+            adaptive_limits.record_completion(budget_key, result.usage, truncated=REPAIR_TRUNCATED in result.repairs)
+
+        if repair is not None:
+            result = await repair(result)
+
+        # Only cache results the model returned as JSON, and never output cut off by the token limit
+        if "raw_content" not in result.data and REPAIR_TRUNCATED not in result.repairs:
+            await result_cache.set(cache_key, result.model_dump())
+            if fingerprint is not None:
+                image_hash, pixels = fingerprint
+                phash_index.add(near_duplicate_scope, image_hash, (cache_key, pixels))
+
+        return result
+
+    # Identical requests in flight share one model call; only the first one streams partial results
+    return await extraction_flights.do(cache_key, extract)
+
+
 async def process_document_task(
     request_id: str,
     file_id: str,
@@ -304,6 +452,8 @@ async def process_document_task(
     api_key_id: str,
     model: Optional[str] = None,
     output_schema: Optional[Dict[str, Any]] = None,
+    stream: Optional[bool] = None,
+    cascade: Optional[bool] = None,
 ):
     """Background task for document processing"""
     try:
@@ -314,18 +464,18 @@ async def process_document_task(
         response.updated_at = datetime.now(timezone.utc)
         await storage_service.save_processing_response(request_id, response.model_dump())
 
-        # Get file path
-        file_path = storage_service.get_file_path(file_id)
-
         # Read file content
-        with open(file_path, "rb") as f:
-            file_content = f.read()
+        file_content = await storage_service.read_file(file_id)
+        if file_content is None:
+            raise FileNotFoundError(f"File not found: {file_id}")
 
-        # Generate prompt
+        # Generate prompt: the template's static instructions go first so providers can cache them,
+        # and the schema is sent separately, as a response format where the model supports it
         final_prompt = prompt_service.generate_prompt(
             document_type=document_type,
             user_prompt=extraction_prompt,
-            output_schema=output_schema
+            output_schema=output_schema,
+            embed_schema=False,
         )
 
         # Process with OpenRouter
@@ -334,13 +484,115 @@ async def process_document_task(
         # Use the model specified or default
         model_to_use = model or settings.OPENROUTER_MODEL
 
-        # Process the image
-        result = await openrouter_client.process_image(
-            image_data=file_content,
-            prompt=final_prompt,
-            model=model_to_use,
+        # Retries of every model call must finish within the job deadline
+        deadline = time.monotonic() + settings.JOB_DEADLINE
+
+        # Size the output budget from the schema, the document type and previous extractions
+        budget_key = adaptive_limits.make_budget_key(document_type.value, output_schema)
+        max_tokens = adaptive_limits.get_max_tokens(
+            document_type.value, prompt_service.get_max_tokens(document_type), output_schema
         )
 
+        on_partial = None
+        if stream if stream is not None else settings.OPENROUTER_STREAMING:
+            async def on_partial(partial_result: Dict[str, Any]) -> None:
+                # Publish the fields completed so far while the job is still processing
+                response.result = partial_result
+                response.updated_at = datetime.now(timezone.utc)
+                await storage_service.save_processing_response(request_id, response.model_dump())
+
+        async def extract_document(model_name: str, publish_partials: bool = True) -> ExtractionResult:
+            if is_pdf(file_content):
+                # Models that actually answered (fallbacks may answer instead of the requested model)
+                page_models = set()
+                page_repairs = set()
+
+                async def extract_page(page_image: bytes) -> Dict[str, Any]:
+                    page_result = await extract_with_cache(
+                        page_image,
+                        final_prompt.user,
+                        model_name,
+                        deadline=deadline,
+                        output_schema=output_schema,
+                        max_tokens=max_tokens,
+                        budget_key=budget_key,
+                        system_prompt=final_prompt.system,
+                        api_key_id=api_key_id,
+                    )
+                    page_models.add(page_result.model)
+                    page_repairs.update(page_result.repairs)
+                    return page_result.data
+
+                async def on_progress(pages_done: int, pages_total: int, partial_result: Dict[str, Any]) -> None:
+                    # Publish page progress and the pages merged so far
+                    response.progress = {"pages_done": pages_done, "pages_total": pages_total}
+                    response.result = partial_result
+                    response.updated_at = datetime.now(timezone.utc)
+                    await storage_service.save_processing_response(request_id, response.model_dump())
+
+                # Rasterize and extract the pages concurrently, then merge them
+                merged = await pdf_processor.extract(
+                    pdf_data=file_content,
+                    profile=get_image_profile(model_name),
+                    extract_page=extract_page,
+                    on_progress=on_progress if publish_partials else None,
+                )
+                return ExtractionResult(data=merged, model=",".join(sorted(page_models)), repairs=sorted(page_repairs))
+
+            # Normalize the image to the model's profile
+            image_data = await openrouter_client.prepare_image(file_content, model_name)
+
+            repair = None
+            if field_repairer.enabled and output_schema:
+                async def repair(extraction: ExtractionResult) -> ExtractionResult:
+                    # Ask again for only the required fields that are missing or invalid, instead of rerunning everything
+                    return await field_repairer.repair(
+                        extraction,
+                        lambda repair_prompt, repair_schema: extract_with_cache(
+                            image_data,
+                            repair_prompt,
+                            model_name,
+                            deadline=deadline,
+                            output_schema=repair_schema,
+                            system_prompt=final_prompt.system,
+                            api_key_id=api_key_id,
+                        ),
+                        output_schema=output_schema,
+                    )
+
+            return await extract_with_cache(
+                image_data,
+                final_prompt.user,
+                model_name,
+                on_partial if publish_partials else None,
+                deadline,
+                # The system prompt follows from the document type, which is part of the scope
+                near_duplicate_scope=phash_index.make_scope(
+                    api_key_id, document_type.value, final_prompt.user, model_name, output_schema
+                ),
+                output_schema=output_schema,
+                max_tokens=max_tokens,
+                budget_key=budget_key,
+                system_prompt=final_prompt.system,
+                repair=repair,
+                api_key_id=api_key_id,
+            )
+
+        # An explicitly requested model bypasses the cascade
+        use_cascade = cascade if cascade is not None else model_cascade.enabled
+        if use_cascade and not model and model_cascade.get_models(document_type.value):
+            # Intermediate stages may be rejected, so their partial results are not published
+            extraction, models_tried = await model_cascade.run(
+                document_type.value,
+                lambda model_name: extract_document(model_name, publish_partials=False),
+                output_schema=output_schema,
+                expected_fields=prompt_service.get_expected_fields(document_type),
+            )
+            logger.info(f"Cascade for {request_id} tried {', '.join(models_tried)}")
+        else:
+            extraction = await extract_document(model_to_use)
+        result = extraction.data
+
         # Calculate processing time
         processing_time = time.time() - start_time
 
@@ -349,7 +601,7 @@ async def process_document_task(
         response.updated_at = datetime.now(timezone.utc)
         response.completed_at = datetime.now(timezone.utc)
         response.result = result
-        response.model_used = model_to_use
+        response.model_used = extraction.model or model_to_use
         response.processing_time = processing_time
         response.credits_used = 1.0  # Placeholder, will be calculated based on model and usage
 
@@ -364,7 +616,7 @@ async def process_document_task(
                 status_code=200,
                 processing_time_ms=int(processing_time * 1000),
                 document_type=document_type.value,
-                model_used=model_to_use,
+                model_used=response.model_used,
                 credits_used=1.0  # Will be calculated based on model and usage
             )
         except Exception as e:
@@ -32,6 +32,7 @@ class UploadResponse(BaseModel):
     filename: str
     content_type: str
     size: int
+    sha256: Optional[str] = None
     upload_time: datetime
 
 
@@ -42,6 +43,8 @@ class ProcessingRequest(BaseModel):
     extraction_prompt: Optional[str] = None
     model: Optional[str] = None
     output_schema: Optional[Dict[str, Any]] = None
+    stream: Optional[bool] = None  # Publish partial results while the model generates
+    cascade: Optional[bool] = None  # Try the document type's cheap models first, escalate if the result does not validate
 
 
 class ProcessingResponse(BaseModel):
@@ -52,6 +55,7 @@ class ProcessingResponse(BaseModel):
     updated_at: datetime
     completed_at: Optional[datetime] = None
     result: Optional[Dict[str, Any]] = None
+    progress: Optional[Dict[str, int]] = None  # e.g. pages_done / pages_total for PDFs
     error: Optional[str] = None
     model_used: Optional[str] = None
     processing_time: Optional[float] = None
@@ -74,6 +78,8 @@ class PromptTemplate(BaseModel):
     description: Optional[str] = None
     is_default: bool = False
     parameters: List[str] = Field(default_factory=list)
+    expected_fields: List[str] = Field(default_factory=list)  # Name fragments, alternatives separated by "|"
+    max_tokens: int = 1000  # Default token budget of the output
 
 
 class HealthCheckResponse(BaseModel):
@@ -83,3 +89,22 @@ class HealthCheckResponse(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     admin_api_status: str
     uptime_seconds: float
+    circuit_breakers: Dict[str, Any] = Field(default_factory=dict)
+
+
+class MetricsResponse(BaseModel):
+    """Metrics response model"""
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    openrouter_pool: Dict[str, Any] = Field(default_factory=dict)
+    openrouter_concurrency: Dict[str, Any] = Field(default_factory=dict)
+    openrouter_routing: Dict[str, Any] = Field(default_factory=dict)
+    image_processor: Dict[str, Any] = Field(default_factory=dict)
+    result_cache: Dict[str, Any] = Field(default_factory=dict)
+    single_flight: Dict[str, Any] = Field(default_factory=dict)
+    near_duplicates: Dict[str, Any] = Field(default_factory=dict)
+    micro_batching: Dict[str, Any] = Field(default_factory=dict)
+    cascade: Dict[str, Any] = Field(default_factory=dict)
+    field_repair: Dict[str, Any] = Field(default_factory=dict)
+    adaptive_limits: Dict[str, Any] = Field(default_factory=dict)
+    prompts: Dict[str, Any] = Field(default_factory=dict)
+    retention: Dict[str, Any] = Field(default_factory=dict)
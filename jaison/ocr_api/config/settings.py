@@ -31,6 +31,85 @@ class Settings:
     # OpenRouter settings
     OPENROUTER_API_KEY: str = os.getenv("OPENROUTER_API_KEY", "")
     OPENROUTER_MODEL: str = os.getenv("OPENROUTER_MODEL", "meta-llama/llama-4-maverick:free")
+    OPENROUTER_STREAMING: bool = os.getenv("OPENROUTER_STREAMING", "False").lower() in ("true", "1", "t")
+    STREAM_PUBLISH_INTERVAL: float = float(os.getenv("STREAM_PUBLISH_INTERVAL", "0.5"))  # seconds
+    MODEL_CAPABILITIES: str = os.getenv("MODEL_CAPABILITIES", "")  # JSON object of per-model capability overrides
+    OPENROUTER_API_URL: str = os.getenv("OPENROUTER_API_URL", "https://openrouter.ai/api/v1")
+
+    # Other OpenAI-compatible inference providers and the models routed to them
+    INFERENCE_PROVIDERS: str = os.getenv("INFERENCE_PROVIDERS", "")  # JSON object of provider name to base_url, api_key, headers
+    MODEL_ROUTES: str = os.getenv("MODEL_ROUTES", "")  # JSON object of model prefix to provider, upstream_model, timeout, concurrency
+
+    # OpenRouter model fallback and request hedging settings
+    OPENROUTER_FALLBACK_MODELS: List[str] = [
+        model for model in os.getenv("OPENROUTER_FALLBACK_MODELS", "").split(",") if model
+    ]
+    OPENROUTER_HEDGE_ENABLED: bool = os.getenv("OPENROUTER_HEDGE_ENABLED", "True").lower() in ("true", "1", "t")
+    OPENROUTER_HEDGE_PERCENTILE: float = float(os.getenv("OPENROUTER_HEDGE_PERCENTILE", "0.95"))
+    OPENROUTER_HEDGE_MIN_DELAY: float = float(os.getenv("OPENROUTER_HEDGE_MIN_DELAY", "2"))  # seconds
+    OPENROUTER_HEDGE_MIN_SAMPLES: int = int(os.getenv("OPENROUTER_HEDGE_MIN_SAMPLES", "20"))
+
+    # OpenRouter connection pool settings
+    OPENROUTER_HTTP2: bool = os.getenv("OPENROUTER_HTTP2", "True").lower() in ("true", "1", "t")
+    OPENROUTER_MAX_CONNECTIONS: int = int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "100"))
+    OPENROUTER_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("OPENROUTER_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    OPENROUTER_KEEPALIVE_EXPIRY: float = float(os.getenv("OPENROUTER_KEEPALIVE_EXPIRY", "30"))  # seconds
+
+    # OpenRouter retry and circuit breaker settings
+    OPENROUTER_MAX_RETRIES: int = int(os.getenv("OPENROUTER_MAX_RETRIES", "3"))
+    OPENROUTER_RETRY_BASE_DELAY: float = float(os.getenv("OPENROUTER_RETRY_BASE_DELAY", "0.5"))  # seconds
+    OPENROUTER_RETRY_MAX_DELAY: float = float(os.getenv("OPENROUTER_RETRY_MAX_DELAY", "8"))  # seconds
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_BREAKER_RECOVERY_TIME: float = float(os.getenv("CIRCUIT_BREAKER_RECOVERY_TIME", "30"))  # seconds
+    JOB_DEADLINE: float = float(os.getenv("JOB_DEADLINE", "120"))  # seconds per processing job
+
+    # Adaptive (AIMD) concurrency limits per model
+    OPENROUTER_CONCURRENCY_INITIAL: int = int(os.getenv("OPENROUTER_CONCURRENCY_INITIAL", "8"))
+    OPENROUTER_CONCURRENCY_MIN: int = int(os.getenv("OPENROUTER_CONCURRENCY_MIN", "1"))
+    OPENROUTER_CONCURRENCY_MAX: int = int(os.getenv("OPENROUTER_CONCURRENCY_MAX", "64"))
+    OPENROUTER_CONCURRENCY_QUEUE_SIZE: int = int(os.getenv("OPENROUTER_CONCURRENCY_QUEUE_SIZE", "256"))
+    OPENROUTER_CONCURRENCY_BACKOFF: float = float(os.getenv("OPENROUTER_CONCURRENCY_BACKOFF", "0.5"))
+    OPENROUTER_CONCURRENCY_LATENCY_TOLERANCE: float = float(os.getenv("OPENROUTER_CONCURRENCY_LATENCY_TOLERANCE", "2.0"))
+
+    # Image preprocessing settings
+    IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", str(os.cpu_count() or 1)))  # 0 runs in a thread
+    IMAGE_QUEUE_SIZE: int = int(os.getenv("IMAGE_QUEUE_SIZE", "64"))
+    IMAGE_PROFILES: str = os.getenv("IMAGE_PROFILES", "")  # JSON object of per-model profile overrides
+
+    # Model cascade settings
+    CASCADE_ENABLED: bool = os.getenv("CASCADE_ENABLED", "False").lower() in ("true", "1", "t")
+    CASCADE_MODELS: str = os.getenv("CASCADE_MODELS", "")  # JSON object of document type (or "default") to models, cheapest first
+    CASCADE_MIN_FILL_RATIO: float = float(os.getenv("CASCADE_MIN_FILL_RATIO", "0.3"))
+
+    # Targeted re-extraction of missing or invalid fields
+    FIELD_REPAIR_ENABLED: bool = os.getenv("FIELD_REPAIR_ENABLED", "False").lower() in ("true", "1", "t")
+    FIELD_REPAIR_MAX_FIELDS: int = int(os.getenv("FIELD_REPAIR_MAX_FIELDS", "5"))
+
+    # Micro-batching of small documents into one model call
+    MICRO_BATCH_ENABLED: bool = os.getenv("MICRO_BATCH_ENABLED", "False").lower() in ("true", "1", "t")
+    MICRO_BATCH_SIZE: int = int(os.getenv("MICRO_BATCH_SIZE", "4"))
+    MICRO_BATCH_MAX_WAIT_MS: float = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "25"))
+    MICRO_BATCH_MAX_IMAGE_BYTES: int = int(os.getenv("MICRO_BATCH_MAX_IMAGE_BYTES", "153600"))  # 150 KB
+
+    # Near-duplicate detection (perceptual hash index)
+    PHASH_ENABLED: bool = os.getenv("PHASH_ENABLED", "False").lower() in ("true", "1", "t")
+    PHASH_MAX_DISTANCE: int = int(os.getenv("PHASH_MAX_DISTANCE", "16"))  # bits of 256
+    PHASH_MAX_ENTRIES: int = int(os.getenv("PHASH_MAX_ENTRIES", "10000"))  # Each keeps its compressed pixels
+    PHASH_MAX_CANDIDATES: int = int(os.getenv("PHASH_MAX_CANDIDATES", "3"))  # Verified per lookup
+    PHASH_VERIFY_TOLERANCE: float = float(os.getenv("PHASH_VERIFY_TOLERANCE", "0.17"))  # Mean difference of a 4x4 block
+
+    # PDF settings
+    PDF_PAGE_CONCURRENCY: int = int(os.getenv("PDF_PAGE_CONCURRENCY", "4"))
+    PDF_MAX_PAGES: int = int(os.getenv("PDF_MAX_PAGES", "50"))
+    PDF_MIN_DPI: int = int(os.getenv("PDF_MIN_DPI", "72"))
+    PDF_MAX_DPI: int = int(os.getenv("PDF_MAX_DPI", "300"))
+
+    # Extraction result cache settings
+    RESULT_CACHE_ENABLED: bool = os.getenv("RESULT_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+    RESULT_CACHE_TTL: int = int(os.getenv("RESULT_CACHE_TTL", "86400"))  # 1 day
+    RESULT_CACHE_MAX_ENTRIES: int = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1024"))  # Memory tier
+    RESULT_CACHE_MAX_DISK_BYTES: int = int(os.getenv("RESULT_CACHE_MAX_DISK_BYTES", str(256 * 1024 * 1024)))  # 256MB
+    RESULT_CACHE_DIR: str = os.getenv("RESULT_CACHE_DIR", "cache")
 
     # Logging settings
     LOG_LEVEL: str = os.getenv("OCR_LOG_LEVEL", "INFO")
@@ -38,12 +117,48 @@ class Settings:
 
     # File upload settings
     MAX_UPLOAD_SIZE: int = int(os.getenv("MAX_UPLOAD_SIZE", str(10 * 1024 * 1024)))  # 10MB
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))  # 1MB, bounds memory per upload
+    STORAGE_SHARD_DEPTH: int = int(os.getenv("STORAGE_SHARD_DEPTH", "2"))  # uploads/ab/cd/<id>, 0 for flat directories
+
+    # Retention of uploads and results (0 hours keeps them forever)
+    RETENTION_ENABLED: bool = os.getenv("RETENTION_ENABLED", "True").lower() in ("true", "1", "t")
+    UPLOAD_RETENTION_HOURS: float = float(os.getenv("UPLOAD_RETENTION_HOURS", "168"))  # 7 days
+    RESULT_RETENTION_HOURS: float = float(os.getenv("RESULT_RETENTION_HOURS", "168"))  # 7 days
+    RETENTION_BUCKET_SECONDS: int = int(os.getenv("RETENTION_BUCKET_SECONDS", "3600"))  # Expiry index granularity
+    RETENTION_SWEEP_INTERVAL: int = int(os.getenv("RETENTION_SWEEP_INTERVAL", "300"))
+    RETENTION_MAX_DELETES_PER_SECOND: int = int(os.getenv("RETENTION_MAX_DELETES_PER_SECOND", "200"))
     ALLOWED_EXTENSIONS: List[str] = os.getenv("ALLOWED_EXTENSIONS", "jpg,jpeg,png,pdf").split(",")
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads")
     RESULTS_DIR: str = os.getenv("RESULTS_DIR", "results")
+    RESULTS_STORE: str = os.getenv("RESULTS_STORE", "sqlite")  # "sqlite" or "files" (one JSON file per request)
+    RESULTS_DB_FILE: str = os.getenv("RESULTS_DB_FILE", "results/results.db")
+
+    # Storage backend of uploads and results: "local" (working directory) or "s3" (shared by all nodes)
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "local")
+    S3_BUCKET: str = os.getenv("S3_BUCKET", "")
+    S3_PREFIX: str = os.getenv("S3_PREFIX", "")  # e.g. jaison/
+    S3_ENDPOINT_URL: str = os.getenv("S3_ENDPOINT_URL", "")  # e.g. http://localhost:9000 for MinIO, empty for AWS
+    S3_REGION: str = os.getenv("S3_REGION", "")
+    S3_ACCESS_KEY_ID: str = os.getenv("S3_ACCESS_KEY_ID", "")  # Empty to use the default credential chain
+    S3_SECRET_ACCESS_KEY: str = os.getenv("S3_SECRET_ACCESS_KEY", "")
+    S3_PART_SIZE: int = int(os.getenv("S3_PART_SIZE", str(8 * 1024 * 1024)))  # 8MB multipart upload parts
+    S3_MAX_CONNECTIONS: int = int(os.getenv("S3_MAX_CONNECTIONS", "32"))
 
     # API settings
     API_TIMEOUT: int = int(os.getenv("API_TIMEOUT", "30"))
 
+    # Token budgets and timeouts learned from previous extractions
+    ADAPTIVE_LIMITS_ENABLED: bool = os.getenv("ADAPTIVE_LIMITS_ENABLED", "True").lower() in ("true", "1", "t")
+    ADAPTIVE_LIMITS_FILE: str = os.getenv("ADAPTIVE_LIMITS_FILE", "cache/adaptive_limits.json")
+    ADAPTIVE_LIMITS_SAVE_INTERVAL: float = float(os.getenv("ADAPTIVE_LIMITS_SAVE_INTERVAL", "60"))  # seconds
+    ADAPTIVE_LIMITS_SAVE_EVERY: int = int(os.getenv("ADAPTIVE_LIMITS_SAVE_EVERY", "100"))  # samples
+    ADAPTIVE_MAX_TOKENS_MIN: int = int(os.getenv("ADAPTIVE_MAX_TOKENS_MIN", "256"))
+    ADAPTIVE_MAX_TOKENS_MAX: int = int(os.getenv("ADAPTIVE_MAX_TOKENS_MAX", "8192"))
+    ADAPTIVE_MAX_TOKENS_HEADROOM: float = float(os.getenv("ADAPTIVE_MAX_TOKENS_HEADROOM", "1.5"))
+    ADAPTIVE_TIMEOUT_MIN: float = float(os.getenv("ADAPTIVE_TIMEOUT_MIN", "5"))
+    ADAPTIVE_TIMEOUT_MAX: float = float(os.getenv("ADAPTIVE_TIMEOUT_MAX", "120"))
+    ADAPTIVE_TIMEOUT_PERCENTILE: float = float(os.getenv("ADAPTIVE_TIMEOUT_PERCENTILE", "0.99"))
+    ADAPTIVE_TIMEOUT_MULTIPLIER: float = float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", "2.0"))
+
 # Create settings instance
 settings = Settings()
@@ -8,6 +8,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from jaison.ocr_api.api.router import router
 from jaison.ocr_api.utils.logger import logger
 from jaison.ocr_api.config.settings import settings
+from jaison.ocr_api.services.openrouter_client import openrouter_client
+from jaison.ocr_api.services.image_processor import image_processor
+from jaison.ocr_api.services.result_cache import result_cache
+from jaison.ocr_api.services.adaptive_limits import adaptive_limits
+from jaison.ocr_api.services.storage_service import storage_service
 
 # Create FastAPI app
 app = FastAPI(
@@ -34,12 +39,39 @@ async def startup_event():
     """Startup event handler"""
     logger.info("Starting OCR API service")
 
+    # Open the pooled OpenRouter HTTP client
+    await openrouter_client.start()
+
+    # Start the image preprocessing worker pool
+    await image_processor.start()
+
+    # Load the extraction result cache index
+    await result_cache.start()
+
+    # Load the token budgets and timeouts learned by previous runs and keep saving them
+    await adaptive_limits.start()
+
+    # Start deleting uploads and results past their retention
+    await storage_service.start()
+
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     """Shutdown event handler"""
     logger.info("Shutting down OCR API service")
 
+    # Close the pooled OpenRouter HTTP client
+    await openrouter_client.close()
+
+    # Stop the image preprocessing worker pool
+    await image_processor.close()
+
+    # Keep the learned token budgets and timeouts for the next run
+    await adaptive_limits.close()
+
+    # Stop the retention sweeper
+    await storage_service.close()
+
 if __name__ == "__main__":
     # Run the application
     uvicorn.run(
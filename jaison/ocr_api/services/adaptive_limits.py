@@ -0,0 +1,348 @@
+"""
+Token budgets and request timeouts learned from previous extractions
+"""
+import os
+import json
+import asyncio
+import hashlib
+from typing import Dict, Any, Optional
+from loguru import logger
+
+from jaison.ocr_api.config.settings import settings
+from jaison.ocr_api.utils.latency import LatencyTracker
+
+# Rough token counts of the JSON a schema describes
+KEY_TOKENS = 4  # Quoted key, colon and separator
+STRING_TOKENS = 10
+SCALAR_TOKENS = 3  # Numbers, booleans and null
+ARRAY_ITEMS = 10  # Items assumed per array when the schema gives no maxItems
+
+
+def estimate_schema_tokens(schema: Dict[str, Any]) -> int:
+    """
+    Estimate the tokens of a JSON value following a schema
+
+    Args:
+        schema: JSON schema
+
+    Returns:
+        Estimated token count
+    """
+    schema_type = schema.get("type")
+    if isinstance(schema_type, list):
+        schema_type = next((t for t in schema_type if t != "null"), None)
+
+    if schema_type == "object" or "properties" in schema:
+        properties = schema.get("properties", {})
+        return 2 + sum(
+            KEY_TOKENS + estimate_schema_tokens(value if isinstance(value, dict) else {})
+            for value in properties.values()
+        )
+    if schema_type == "array" or "items" in schema:
+        items = schema.get("items") if isinstance(schema.get("items"), dict) else {}
+        return 2 + schema.get("maxItems", ARRAY_ITEMS) * (1 + estimate_schema_tokens(items))
+    if schema_type in ("number", "integer", "boolean", "null") or "enum" in schema:
+        return SCALAR_TOKENS
+    return STRING_TOKENS
+
+
+class AdaptiveLimits:
+    """
+    Picks max_tokens and per-attempt timeouts from recent history
+
+    max_tokens starts from the template's budget, or from the size of the
+    output schema, and once enough documents of the same kind were extracted
+    follows their completion token counts with some headroom. Truncated
+    outputs count double, so a budget that is too small grows quickly.
+
+    Timeouts start at the client's flat timeout and, once a model and token
+    budget have enough samples, follow a high percentile of their attempt
+    latencies times a multiplier. Attempts that time out count at their
+    timeout, so a timeout that is too short grows.
+
+    The history is saved every ADAPTIVE_LIMITS_SAVE_INTERVAL seconds, or as
+    soon as ADAPTIVE_LIMITS_SAVE_EVERY samples were recorded, so a crash
+    loses little of it.
+    """
+
+    def __init__(self):
+        """Initialize adaptive limits"""
+        self.enabled = settings.ADAPTIVE_LIMITS_ENABLED
+        self.state_file = settings.ADAPTIVE_LIMITS_FILE
+        self.min_max_tokens = settings.ADAPTIVE_MAX_TOKENS_MIN
+        self.max_max_tokens = settings.ADAPTIVE_MAX_TOKENS_MAX
+        self.token_headroom = settings.ADAPTIVE_MAX_TOKENS_HEADROOM
+        self.min_timeout = settings.ADAPTIVE_TIMEOUT_MIN
+        self.max_timeout = settings.ADAPTIVE_TIMEOUT_MAX
+        self.timeout_percentile = settings.ADAPTIVE_TIMEOUT_PERCENTILE
+        self.timeout_multiplier = settings.ADAPTIVE_TIMEOUT_MULTIPLIER
+        self.save_interval = settings.ADAPTIVE_LIMITS_SAVE_INTERVAL
+        self.save_every = settings.ADAPTIVE_LIMITS_SAVE_EVERY
+
+        # The tracker's rolling percentiles serve for token counts as well as latencies
+        self.completion_tokens = LatencyTracker()
+        self.attempt_latency = LatencyTracker()
+        self._truncations: Dict[str, int] = {}
+
+        # Samples recorded since the last save
+        self._unsaved = 0
+        self._save_requested: Optional[asyncio.Event] = None
+        self._saver: Optional[asyncio.Task] = None
+        self._saves = 0
+
+    @staticmethod
+    def make_budget_key(document_type: str, output_schema: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Build the key token history is kept under
+
+        Args:
+            document_type: Document type
+            output_schema: JSON schema of the output, if any
+
+        Returns:
+            Document type, followed by a digest of the schema if there is one
+        """
+        if not output_schema:
+            return document_type
+        digest = hashlib.sha256(json.dumps(output_schema, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        return f"{document_type}:{digest}"
+
+    def _clamp_max_tokens(self, max_tokens: float) -> int:
+        """Keep a token budget within the configured bounds"""
+        return int(min(max(max_tokens, self.min_max_tokens), self.max_max_tokens))
+
+    def get_max_tokens(
+        self,
+        document_type: str,
+        default_max_tokens: int,
+        output_schema: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """
+        Get the max_tokens for an extraction
+
+        Args:
+            document_type: Document type
+            default_max_tokens: Budget of the document type's template
+            output_schema: JSON schema of the output, if any
+
+        Returns:
+            Maximum tokens to generate
+        """
+        if output_schema:
+            estimate = estimate_schema_tokens(output_schema) * self.token_headroom
+        else:
+            estimate = default_max_tokens
+
+        if self.enabled:
+            observed = self.completion_tokens.percentile(self.make_budget_key(document_type, output_schema), 0.95)
+            if observed is not None:
+                estimate = observed * self.token_headroom
+
+        return self._clamp_max_tokens(estimate)
+
+    def record_completion(self, budget_key: str, usage: Optional[Dict[str, Any]], truncated: bool = False) -> None:
+        """
+        Record the tokens an extraction generated
+
+        Args:
+            budget_key: Key from make_budget_key
+            usage: Usage reported with the extraction result
+            truncated: Whether the output was cut off by max_tokens
+        """
+        if not usage or not usage.get("completion_tokens"):
+            return
+
+        # A batched call reports the tokens of all its documents
+        completion_tokens = usage["completion_tokens"] / usage.get("batch_size", 1)
+
+        if truncated:
+            # The output needed more than it got; overshoot so the next budget is large enough
+            self._truncations[budget_key] = self._truncations.get(budget_key, 0) + 1
+            completion_tokens *= 2
+        self.completion_tokens.record(budget_key, completion_tokens)
+        self._record_unsaved()
+
+    @staticmethod
+    def make_timeout_key(model: str, max_tokens: Optional[int] = None) -> str:
+        """
+        Build the key attempt latencies are kept under
+
+        Long extractions take longer, so latencies are kept per model and
+        per token budget, rounded up to a power of two to bound the keys.
+
+        Args:
+            model: Model name
+            max_tokens: Token budget of the request, if known
+
+        Returns:
+            Model name, followed by the rounded budget if there is one
+        """
+        if not max_tokens:
+            return model
+        return f"{model}@{1 << (int(max_tokens) - 1).bit_length()}"
+
+    def _get_key_timeout(self, key: str, default_timeout: float) -> float:
+        """Get the timeout learned under a timeout key"""
+        latency = self.attempt_latency.percentile(key, self.timeout_percentile)
+        if latency is None:
+            return default_timeout
+
+        return min(max(latency * self.timeout_multiplier, self.min_timeout), self.max_timeout)
+
+    def get_timeout(self, model: str, default_timeout: float, max_tokens: Optional[int] = None) -> float:
+        """
+        Get the timeout of one attempt to a model
+
+        Args:
+            model: Model name
+            default_timeout: Timeout used until the model has enough samples
+            max_tokens: Token budget of the request, if known
+
+        Returns:
+            Timeout in seconds
+        """
+        if not self.enabled:
+            return default_timeout
+
+        return self._get_key_timeout(self.make_timeout_key(model, max_tokens), default_timeout)
+
+    def record_latency(self, model: str, seconds: float, max_tokens: Optional[int] = None) -> None:
+        """
+        Record the latency of an attempt
+
+        Args:
+            model: Model name
+            seconds: Time the attempt took, or the timeout it ran into
+            max_tokens: Token budget of the request, if known
+        """
+        self.attempt_latency.record(self.make_timeout_key(model, max_tokens), seconds)
+        self._record_unsaved()
+
+    def record_timeout(self, model: str, timeout: float, max_tokens: Optional[int] = None) -> None:
+        """
+        Record an attempt that ran into its timeout
+
+        The attempt took at least the timeout, so it is recorded at that value;
+        otherwise a timeout learned from short documents could never grow.
+
+        Args:
+            model: Model name
+            timeout: Timeout of the attempt in seconds
+            max_tokens: Token budget of the request, if known
+        """
+        self.record_latency(model, timeout, max_tokens)
+
+    def _record_unsaved(self) -> None:
+        """Count a new sample, waking the saver once enough have accumulated"""
+        self._unsaved += 1
+        if self._save_requested is not None and 0 < self.save_every <= self._unsaved:
+            self._save_requested.set()
+
+    def load(self) -> None:
+        """Load the history saved by a previous run (called on application startup)"""
+        if not self.enabled or not os.path.exists(self.state_file):
+            return
+
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+            self.completion_tokens.load(state.get("completion_tokens", {}))
+            self.attempt_latency.load(state.get("attempt_latency", {}))
+            logger.info(f"Loaded adaptive limits history from {self.state_file}")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable adaptive limits history {self.state_file}: {e}")
+
+    def _dump_state(self) -> Dict[str, Any]:
+        """Snapshot the history (on the event loop, where it is recorded)"""
+        self._unsaved = 0
+        return {
+            "completion_tokens": self.completion_tokens.dump(),
+            "attempt_latency": self.attempt_latency.dump(),
+        }
+
+    def _write_state(self, state: Dict[str, Any]) -> None:
+        """Write a history snapshot to the state file"""
+        try:
+            directory = os.path.dirname(self.state_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            # Write to a temporary file and rename so a crash never leaves a partial file;
+            # API workers in other processes write their own temporary file
+            tmp_path = f"{self.state_file}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_file)
+            self._saves += 1
+        except OSError as e:
+            logger.error(f"Error saving adaptive limits history to {self.state_file}: {e}")
+
+    def save(self) -> None:
+        """Save the history for the next run"""
+        if not self.enabled:
+            return
+        self._write_state(self._dump_state())
+
+    async def start(self) -> None:
+        """Load the saved history and start saving it periodically (called on application startup)"""
+        if not self.enabled:
+            return
+
+        self.load()
+        if self._saver is None:
+            self._save_requested = asyncio.Event()
+            self._saver = asyncio.ensure_future(self._save_forever())
+
+    async def close(self) -> None:
+        """Stop the periodic saver and save the history (called on application shutdown)"""
+        if self._saver is not None:
+            self._saver.cancel()
+            try:
+                await self._saver
+            except asyncio.CancelledError:
+                pass
+            self._saver = None
+            self._save_requested = None
+        self.save()
+
+    async def _save_forever(self) -> None:
+        """Save new samples every save_interval seconds, or once save_every have been recorded"""
+        while True:
+            try:
+                await asyncio.wait_for(self._save_requested.wait(), self.save_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._save_requested.clear()
+
+            if self._unsaved:
+                await asyncio.to_thread(self._write_state, self._dump_state())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the learned limits
+
+        Returns:
+            Dictionary with per-model timeouts and per-budget-key token statistics
+        """
+        token_stats = self.completion_tokens.get_stats()
+        return {
+            "enabled": self.enabled,
+            "saves": self._saves,
+            "unsaved_samples": self._unsaved,
+            "timeouts": {
+                key: {**stats, "timeout": self._get_key_timeout(key, settings.API_TIMEOUT)}
+                for key, stats in self.attempt_latency.get_stats().items()
+            },
+            "max_tokens": {
+                key: {
+                    "samples": stats["samples"],
+                    "p50": stats["p50"],
+                    "p95": stats["p95"],
+                    "truncations": self._truncations.get(key, 0),
+                }
+                for key, stats in token_stats.items()
+            },
+        }
+
+# Create a singleton instance
+adaptive_limits = AdaptiveLimits()
@@ -0,0 +1,112 @@
+"""
+Circuit breaker for outbound model endpoints
+"""
+import time
+from typing import Dict, Any, Optional
+from loguru import logger
+
+
+class CircuitOpenError(Exception):
+    """Raised when a request is refused because the circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for a single endpoint
+
+    After failure_threshold consecutive failures the circuit opens and requests
+    fail fast. Once recovery_time has passed, one trial request is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_time: float = 30.0):
+        """
+        Initialize circuit breaker
+
+        Args:
+            name: Name of the protected endpoint
+            failure_threshold: Consecutive failures before the circuit opens
+            recovery_time: Seconds to wait before a trial request
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+
+        self.state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+        # Statistics
+        self._total_failures = 0
+        self._times_opened = 0
+        self._rejected = 0
+
+    def before_request(self) -> None:
+        """
+        Check whether a request may be sent
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.recovery_time:
+                self._rejected += 1
+                raise CircuitOpenError(f"Circuit for {self.name} is open")
+            self.state = self.HALF_OPEN
+            logger.info(f"Circuit for {self.name} is half-open, sending a trial request")
+
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                self._rejected += 1
+                raise CircuitOpenError(f"Circuit for {self.name} is half-open, trial request in flight")
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        """Record a request that reached a healthy endpoint"""
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit for {self.name} closed")
+        self.state = self.CLOSED
+        self._consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Record a request that failed because the endpoint is unhealthy"""
+        self._consecutive_failures += 1
+        self._total_failures += 1
+        self._trial_in_flight = False
+
+        if self.state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit for {self.name} opened after {self._consecutive_failures} failures")
+                self._times_opened += 1
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def record_cancelled(self) -> None:
+        """Record a request that was cancelled before its outcome was known"""
+        self._trial_in_flight = False
+
+    def get_state(self) -> Dict[str, Any]:
+        """
+        Get the circuit state
+
+        Returns:
+            Dictionary with state and counters
+        """
+        retry_in = None
+        if self.state == self.OPEN:
+            retry_in = max(self.recovery_time - (time.monotonic() - self._opened_at), 0.0)
+
+        return {
+            "state": self.state,
+            "consecutive_failures": self._consecutive_failures,
+            "total_failures": self._total_failures,
+            "times_opened": self._times_opened,
+            "rejected": self._rejected,
+            "retry_in_seconds": retry_in,
+        }
@@ -0,0 +1,193 @@
+"""
+Adaptive (AIMD) concurrency limiter for outbound model endpoints
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Any, Optional
+from loguru import logger
+
+# Latency differences below this are noise, not a sign of overload
+MIN_BASELINE_LATENCY = 0.1  # seconds
+
+# Weight of each healthy response in the moving average of latency
+LATENCY_EWMA_WEIGHT = 0.05
+
+
+class ConcurrencyQueueFullError(Exception):
+    """Raised when too many requests are already waiting for a concurrency slot"""
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limits the requests in flight to a single endpoint
+
+    The limit grows by one every time a full window of requests succeeds at
+    normal latency (additive increase) and is cut by backoff_ratio only on
+    explicit overload: rate limiting, server errors or timeouts
+    (multiplicative decrease). LLM latency varies a lot with output length,
+    so a slow response only holds the limit where it is. Requests beyond the
+    limit wait in a bounded FIFO queue.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        queue_size: int = 256,
+        backoff_ratio: float = 0.5,
+        latency_tolerance: float = 2.0,
+    ):
+        """
+        Initialize concurrency limiter
+
+        Args:
+            name: Name of the protected endpoint
+            initial_limit: Requests allowed in flight at start
+            min_limit: Lowest limit backoff can reach
+            max_limit: Highest limit ramp up can reach
+            queue_size: Maximum number of requests waiting for a slot
+            backoff_ratio: Factor the limit is multiplied by on overload
+            latency_tolerance: Latency above the average times this holds the limit instead of raising it
+        """
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._baseline_latency: Optional[float] = None
+        self._last_decrease = 0.0
+
+        # Statistics
+        self._increases = 0
+        self._decreases = 0
+        self._slow = 0
+        self._rejected = 0
+        self._timeouts = 0
+
+    def _has_free_slot(self) -> bool:
+        """Whether another request may be sent now"""
+        return self._in_flight < int(self.limit)
+
+    def _wake_waiters(self) -> None:
+        """Hand free slots to waiting requests in arrival order"""
+        while self._waiters and self._has_free_slot():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self, timeout: Optional[float] = None) -> float:
+        """
+        Wait for a concurrency slot
+
+        Args:
+            timeout: Maximum seconds to wait for a slot
+
+        Returns:
+            Monotonic time the slot was granted, to pass to release()
+
+        Raises:
+            ConcurrencyQueueFullError: If the wait queue is full
+            TimeoutError: If no slot was granted within the timeout
+        """
+        if not self._waiters and self._has_free_slot():
+            self._in_flight += 1
+            return time.monotonic()
+
+        if len(self._waiters) >= self.queue_size:
+            self._rejected += 1
+            raise ConcurrencyQueueFullError(
+                f"Too many requests waiting for {self.name}: {len(self._waiters)} queued"
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted while we gave up; pass it on
+                self._in_flight -= 1
+                self._wake_waiters()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+
+            if isinstance(e, asyncio.TimeoutError):
+                self._timeouts += 1
+                raise TimeoutError(f"Timed out waiting for a concurrency slot for {self.name}")
+            raise
+
+        return time.monotonic()
+
+    def release(self, started_at: float, overloaded: bool = False, succeeded: bool = True) -> None:
+        """
+        Release a slot and adapt the limit to the outcome of the request
+
+        Args:
+            started_at: Time returned by acquire()
+            overloaded: Whether the endpoint signalled overload (429, 5xx, timeout)
+            succeeded: Whether the request succeeded
+        """
+        self._in_flight -= 1
+        now = time.monotonic()
+        latency = now - started_at
+
+        slow = False
+        if succeeded and not overloaded:
+            if self._baseline_latency is None:
+                self._baseline_latency = latency
+            slow = latency > max(self._baseline_latency, MIN_BASELINE_LATENCY) * self.latency_tolerance
+            self._baseline_latency += LATENCY_EWMA_WEIGHT * (latency - self._baseline_latency)
+            if slow:
+                self._slow += 1
+
+        if overloaded:
+            # Requests sent before the last decrease reflect the old limit; count them once
+            if started_at >= self._last_decrease:
+                self._decrease(now)
+        elif succeeded and not slow and self.limit < self.max_limit:
+            previous = int(self.limit)
+            self.limit = min(self.limit + 1 / self.limit, float(self.max_limit))
+            if int(self.limit) > previous:
+                self._increases += 1
+
+        self._wake_waiters()
+
+    def _decrease(self, now: float) -> None:
+        """Cut the limit after an overload signal"""
+        previous = self.limit
+        self.limit = max(self.limit * self.backoff_ratio, float(self.min_limit))
+        self._last_decrease = now
+        self._decreases += 1
+        logger.warning(f"Concurrency limit for {self.name} lowered from {previous:.1f} to {self.limit:.1f}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get limiter statistics
+
+        Returns:
+            Dictionary with current limit, in-flight requests, queue depth and counters
+        """
+        return {
+            "limit": int(self.limit),
+            "in_flight": self._in_flight,
+            "queued": len(self._waiters),
+            "baseline_latency": self._baseline_latency,
+            "increases": self._increases,
+            "decreases": self._decreases,
+            "slow": self._slow,
+            "rejected": self._rejected,
+            "timeouts": self._timeouts,
+        }
@@ -0,0 +1,127 @@
+"""
+Time-bucketed index of when stored artifacts expire
+"""
+import os
+from typing import Any, Dict, List, Tuple
+import aiofiles
+from loguru import logger
+
+BUCKET_SUFFIX = ".log"
+
+
+class ExpiryIndex:
+    """
+    Append-only manifest of stored artifacts by expiry time
+
+    Each artifact is appended as a "kind<TAB>id" line to the file of the time
+    bucket it expires in, named after the bucket's start in epoch seconds.
+    A sweep lists the bucket files, which are few, reads only the buckets that
+    have ended and removes each bucket once its artifacts are deleted, so it
+    never scans the storage directories.
+    """
+
+    def __init__(self, index_dir: str, bucket_seconds: int):
+        """
+        Initialize the index
+
+        Args:
+            index_dir: Directory holding the bucket files
+            bucket_seconds: Width of a bucket; artifacts are deleted up to this long after they expire
+        """
+        self.index_dir = index_dir
+        self.bucket_seconds = max(int(bucket_seconds), 1)
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    def _bucket_path(self, bucket: int) -> str:
+        """Get the file of a bucket"""
+        return os.path.join(self.index_dir, f"{bucket}{BUCKET_SUFFIX}")
+
+    def _list_buckets(self) -> List[int]:
+        """Get the start of every bucket with pending entries, oldest first"""
+        buckets = []
+        for name in os.listdir(self.index_dir):
+            if name.endswith(BUCKET_SUFFIX) and name[:-len(BUCKET_SUFFIX)].isdigit():
+                buckets.append(int(name[:-len(BUCKET_SUFFIX)]))
+        return sorted(buckets)
+
+    async def add(self, kind: str, item_id: str, expires_at: float) -> None:
+        """
+        Record when an artifact expires
+
+        Args:
+            kind: Artifact type, e.g. "upload" or "result"
+            item_id: ID the artifact is stored under
+            expires_at: Expiry time in epoch seconds
+        """
+        bucket = int(expires_at // self.bucket_seconds) * self.bucket_seconds
+
+        # Short appends are atomic, so several workers can share a bucket file
+        async with aiofiles.open(self._bucket_path(bucket), "a") as f:
+            await f.write(f"{kind}\t{item_id}\n")
+
+    def expired_buckets(self, now: float) -> List[int]:
+        """
+        Get the buckets whose every entry has expired
+
+        Args:
+            now: Current time in epoch seconds
+
+        Returns:
+            Bucket starts, oldest first
+        """
+        return [bucket for bucket in self._list_buckets() if bucket + self.bucket_seconds <= now]
+
+    async def read_bucket(self, bucket: int) -> List[Tuple[str, str]]:
+        """
+        Read the entries of a bucket
+
+        Args:
+            bucket: Bucket start
+
+        Returns:
+            (kind, item_id) pairs
+        """
+        try:
+            async with aiofiles.open(self._bucket_path(bucket), "r") as f:
+                content = await f.read()
+        except FileNotFoundError:
+            # Already swept by another worker
+            return []
+
+        entries = []
+        for line in content.splitlines():
+            kind, _, item_id = line.partition("\t")
+            if item_id:
+                entries.append((kind, item_id))
+        return entries
+
+    def drop_bucket(self, bucket: int) -> None:
+        """
+        Remove a swept bucket
+
+        Args:
+            bucket: Bucket start
+        """
+        try:
+            os.remove(self._bucket_path(bucket))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Error removing expiry bucket {bucket}: {e}")
+
+    def get_stats(self, now: float) -> Dict[str, Any]:
+        """
+        Get the size of the index
+
+        Args:
+            now: Current time in epoch seconds
+
+        Returns:
+            Dictionary with the number of pending and expired buckets
+        """
+        buckets = self._list_buckets()
+        return {
+            "buckets": len(buckets),
+            "expired_buckets": sum(1 for bucket in buckets if bucket + self.bucket_seconds <= now),
+            "bucket_seconds": self.bucket_seconds,
+        }
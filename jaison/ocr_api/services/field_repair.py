@@ -0,0 +1,162 @@
+"""
+Targeted re-extraction of the fields an extraction missed or got wrong
+"""
+import re
+from typing import Dict, Any, List, Optional, Callable, Awaitable, NamedTuple
+from loguru import logger
+
+from jaison.ocr_api.config.settings import settings
+from jaison.ocr_api.services.openrouter_client import ExtractionResult
+from jaison.ocr_api.utils.json_parser import REPAIR_TRUNCATED
+from jaison.ocr_api.utils.schema_validator import validate_json
+
+
+class RepairRequest(NamedTuple):
+    """Follow-up extraction asking only for the fields that need repair"""
+    fields: List[str]  # Top-level keys to replace in the result
+    prompt: str
+    output_schema: Optional[Dict[str, Any]]  # Schema restricted to the requested fields
+
+
+def _top_level_key(path: str) -> str:
+    """Get the top-level key of a field path such as items[0].price"""
+    return re.split(r"[.\[]", path, maxsplit=1)[0]
+
+
+class FieldRepairer:
+    """
+    Asks the model again for only the fields a result is missing or got wrong
+
+    Only fields the output schema requires are repaired, when they are absent
+    or fail validation; a null the schema allows is a legitimate answer.
+    Errors are grouped by top-level key: the follow-up prompt asks for those
+    keys only (with the matching part of the output schema), and their values
+    in the answer replace the ones in the result. Results that are not JSON,
+    were truncated or are invalid as a whole need a full rerun instead.
+    """
+
+    def __init__(self):
+        """Initialize field repairer"""
+        self.enabled = settings.FIELD_REPAIR_ENABLED
+        self.max_fields = settings.FIELD_REPAIR_MAX_FIELDS
+
+        # Statistics
+        self._attempts = 0
+        self._fields_requested = 0
+        self._fields_repaired = 0
+        self._completed = 0
+        self._too_many_fields = 0
+        self._errors = 0
+
+    def plan(self, data: Dict[str, Any], output_schema: Optional[Dict[str, Any]] = None) -> Optional[RepairRequest]:
+        """
+        Build the follow-up extraction for a result
+
+        Args:
+            data: Parsed extraction result
+            output_schema: JSON schema the result must follow
+
+        Returns:
+            Follow-up extraction, or None if the result needs no targeted repair
+        """
+        if not output_schema:
+            return None
+
+        errors = validate_json(data, output_schema)
+        if any(not error.path for error in errors):
+            return None
+
+        required = set(output_schema.get("required", []))
+        errors = [error for error in errors if _top_level_key(error.path) in required]
+        if not errors:
+            return None
+
+        problems = [f"- {error.path}: {error.message}" for error in errors]
+        fields = list(dict.fromkeys(_top_level_key(error.path) for error in errors))
+        properties = output_schema.get("properties", {})
+        schema = {
+            "type": "object",
+            "properties": {field: properties[field] for field in fields if field in properties},
+            "required": [field for field in output_schema["required"] if field in fields],
+        }
+
+        keys = ", ".join(f'"{field}"' for field in fields)
+        prompt = (
+            "A previous extraction of this document had problems with these fields:\n"
+            + "\n".join(problems)
+            + f"\n\nExtract only these fields from the document and return them as a JSON object "
+            f"with exactly these keys: {keys}. If a field does not appear in the document, use null."
+        )
+        return RepairRequest(fields, prompt, schema)
+
+    async def repair(
+        self,
+        result: ExtractionResult,
+        extract: Callable[[str, Optional[Dict[str, Any]]], Awaitable[ExtractionResult]],
+        output_schema: Optional[Dict[str, Any]] = None,
+    ) -> ExtractionResult:
+        """
+        Re-extract the fields a result is missing or got wrong and merge them back
+
+        Args:
+            result: Extraction result to repair
+            extract: Runs an extraction of the same document with the given
+                prompt and output schema
+            output_schema: JSON schema the result must follow
+
+        Returns:
+            Result with the re-extracted fields merged in, or the original result
+        """
+        if "raw_content" in result.data or REPAIR_TRUNCATED in result.repairs:
+            return result
+
+        request = self.plan(result.data, output_schema)
+        if request is None:
+            return result
+        if len(request.fields) > self.max_fields:
+            # So much is wrong that a full rerun (or the next cascade stage) is the better remedy
+            self._too_many_fields += 1
+            return result
+
+        self._attempts += 1
+        self._fields_requested += len(request.fields)
+        try:
+            answer = await extract(request.prompt, request.output_schema)
+        except Exception as e:
+            self._errors += 1
+            logger.warning(f"Field repair of {', '.join(request.fields)} failed: {e}")
+            return result
+
+        data = dict(result.data)
+        repaired = [field for field in request.fields if answer.data.get(field) is not None]
+        for field in repaired:
+            data[field] = answer.data[field]
+        self._fields_repaired += len(repaired)
+
+        if self.plan(data, output_schema) is None:
+            self._completed += 1
+        logger.info(f"Field repair returned {len(repaired)} of {len(request.fields)} requested fields")
+
+        return result.model_copy(update={"data": data})
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get field repair statistics
+
+        Returns:
+            Dictionary with repair attempts, fields requested and repaired, and
+            how many results were complete afterwards
+        """
+        return {
+            "enabled": self.enabled,
+            "attempts": self._attempts,
+            "fields_requested": self._fields_requested,
+            "fields_repaired": self._fields_repaired,
+            "completed": self._completed,
+            "completion_ratio": self._completed / self._attempts if self._attempts else 0.0,
+            "too_many_fields": self._too_many_fields,
+            "errors": self._errors,
+        }
+
+# Create a singleton instance
+field_repairer = FieldRepairer()
@@ -0,0 +1,365 @@
+"""
+Image preprocessing stage running in a process pool
+"""
+import zlib
+import struct
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from io import BytesIO
+from typing import Dict, Any, Optional, Tuple
+from loguru import logger
+from PIL import Image, ImageChops
+
+from jaison.ocr_api.config.settings import settings
+from jaison.ocr_api.services.image_profiles import ImageProfile, DEFAULT_IMAGE_PROFILE
+
+
+# Fraction of a tile an edge may spill over before it is shrunk back onto the tile grid
+TILE_SLACK = 0.125
+
+# Side of the square blocks compared when verifying a near-duplicate
+VERIFY_BLOCK_SIZE = 4
+
+# Largest relative difference of width or height between images that are compared
+VERIFY_MAX_SIZE_DIFF = 0.1
+
+IMAGE_MIME_TYPES = {
+    b"\xff\xd8\xff": "image/jpeg",
+    b"\x89PNG": "image/png",
+    b"RIFF": "image/webp",
+}
+
+
+def get_target_size(size: Tuple[int, int], profile: ImageProfile) -> Tuple[int, int]:
+    """
+    Get the size an image should be sent at for a profile
+
+    The image is scaled down (never up) to the model's effective resolution.
+    For tiled models, an edge that spills into a new tile by only a sliver is
+    shrunk back onto the tile grid, saving a whole row or column of tiles.
+
+    Args:
+        size: Original (width, height)
+        profile: Image profile of the target model
+
+    Returns:
+        Target (width, height)
+    """
+    width, height = size
+    scale = min(1.0, profile.max_long_edge / max(width, height))
+    if profile.max_short_edge:
+        scale = min(scale, profile.max_short_edge / min(width, height))
+
+    if profile.tile_size:
+        long_edge = max(width, height) * scale
+        overflow = long_edge % profile.tile_size
+        if long_edge > profile.tile_size and 0 < overflow <= profile.tile_size * TILE_SLACK:
+            scale *= (long_edge - overflow) / long_edge
+
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def get_image_mime_type(image_data: bytes) -> str:
+    """
+    Get the MIME type of encoded image bytes
+
+    Args:
+        image_data: Encoded image bytes
+
+    Returns:
+        MIME type, defaulting to image/jpeg
+    """
+    for magic, mime_type in IMAGE_MIME_TYPES.items():
+        if image_data.startswith(magic):
+            return mime_type
+    return "image/jpeg"
+
+
+def encode_image(img: Image.Image, profile: ImageProfile) -> bytes:
+    """
+    Resize and encode a decoded image for a profile
+
+    Args:
+        img: Decoded image
+        profile: Image profile of the target model
+
+    Returns:
+        Smallest encoding of the image among the profile's formats
+    """
+    # Convert to RGB if needed (e.g., for PNG with transparency)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    # Resize to the model's effective resolution
+    target_size = get_target_size(img.size, profile)
+    if target_size != img.size:
+        img = img.resize(target_size, Image.LANCZOS)
+
+    # Encode in every candidate format and keep the smallest payload
+    smallest = None
+    for image_format in profile.formats:
+        buffer = BytesIO()
+        if image_format.upper() == "PNG":
+            img.save(buffer, format="PNG", optimize=True)
+        else:
+            img.save(buffer, format=image_format.upper(), quality=profile.quality)
+        if smallest is None or buffer.tell() < len(smallest):
+            smallest = buffer.getvalue()
+
+    return smallest
+
+
+def normalize_image(image_data: bytes, profile: Optional[ImageProfile] = None) -> bytes:
+    """
+    Normalize an image for upload to a multimodal LLM
+
+    An image already at the target size, in one of the profile's formats, is
+    sent as it is when re-encoding it would not make it smaller, since every
+    re-encode also loses quality.
+
+    Runs in a worker process, so it must stay a module-level function.
+
+    Args:
+        image_data: Raw image bytes
+        profile: Image profile of the target model
+
+    Returns:
+        Smallest encoding of the image among the profile's formats, or the original bytes
+    """
+    profile = profile or DEFAULT_IMAGE_PROFILE
+    img = Image.open(BytesIO(image_data))
+    unchanged = (
+        img.mode == "RGB"
+        and img.format in {image_format.upper() for image_format in profile.formats}
+        and get_target_size(img.size, profile) == img.size
+    )
+
+    encoded = encode_image(img, profile)
+    if unchanged and len(image_data) <= len(encoded):
+        return image_data
+    return encoded
+
+
+def compute_dhash(image_data: bytes, hash_size: int = 8) -> int:
+    """
+    Compute the difference hash (dHash) of an image
+
+    Each bit tells whether a pixel of the downscaled grayscale image is
+    brighter than its right neighbour, so re-compressions and re-scans of the
+    same document get hashes a few bits apart.
+
+    Runs in a worker process, so it must stay a module-level function.
+
+    Args:
+        image_data: Image bytes
+        hash_size: Hash width and height in bits (8 gives a 64-bit hash)
+
+    Returns:
+        Perceptual hash
+    """
+    img = Image.open(BytesIO(image_data))
+    img.draft("L", (hash_size * 4, hash_size * 4))
+    pixels = img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS).tobytes()
+
+    image_hash = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            image_hash = (image_hash << 1) | (left > right)
+    return image_hash
+
+
+def compute_fingerprint(image_data: bytes, hash_size: int = 16) -> Tuple[int, bytes]:
+    """
+    Compute the perceptual hash and the verification pixels of a normalized image
+
+    The hash only shortlists candidates: documents printed from the same
+    template hash alike whatever their content. The verification pixels are
+    the full-resolution grayscale image, quantized to 16 levels so that it
+    compresses well, for images_match to compare before a result is reused.
+
+    Runs in a worker process, so it must stay a module-level function.
+
+    Args:
+        image_data: Normalized image bytes
+        hash_size: dHash width and height in bits (16 gives a 256-bit hash)
+
+    Returns:
+        (perceptual hash, compressed verification pixels)
+    """
+    image_hash = compute_dhash(image_data, hash_size)
+    img = Image.open(BytesIO(image_data)).convert("L").point(lambda p: p & 0xF0)
+    return image_hash, struct.pack(">II", *img.size) + zlib.compress(img.tobytes(), 6)
+
+
+def _decode_pixels(pixels: bytes) -> Image.Image:
+    """Decode verification pixels from compute_fingerprint"""
+    size = struct.unpack(">II", pixels[:8])
+    return Image.frombytes("L", size, zlib.decompress(pixels[8:]))
+
+
+def images_match(pixels: bytes, other: bytes, tolerance: float) -> bool:
+    """
+    Check whether two normalized images show the same document
+
+    Images of slightly different sizes (re-scans, re-photographs) are compared
+    at the smaller of the two sizes, the larger one scaled down with the filter
+    the images were normalized with. A fixed thumbnail size would blur away a
+    changed digit. The mean pixel difference of every VERIFY_BLOCK_SIZE block
+    is then compared, so re-encoding and rescaling noise spread over the page
+    passes while a single changed character (a different total, date or name)
+    fails.
+
+    Runs in a worker process, so it must stay a module-level function.
+
+    Args:
+        pixels: Verification pixels from compute_fingerprint
+        other: Verification pixels of the candidate
+        tolerance: Largest mean difference of a block, as a fraction of full scale
+
+    Returns:
+        True if the images match; images whose sizes differ by more than
+        VERIFY_MAX_SIZE_DIFF never do
+    """
+    size = struct.unpack(">II", pixels[:8])
+    other_size = struct.unpack(">II", other[:8])
+    if any(abs(a - b) > VERIFY_MAX_SIZE_DIFF * max(a, b) for a, b in zip(size, other_size)):
+        return False
+
+    common_size = (min(size[0], other_size[0]), min(size[1], other_size[1]))
+    images = []
+    for img in (_decode_pixels(pixels), _decode_pixels(other)):
+        if img.size != common_size:
+            img = img.resize(common_size, Image.LANCZOS)
+        images.append(img)
+
+    diff = ImageChops.difference(*images)
+    blocks = (max(1, diff.width // VERIFY_BLOCK_SIZE), max(1, diff.height // VERIFY_BLOCK_SIZE))
+    return diff.resize(blocks, Image.BOX).getextrema()[1] <= tolerance * 255
+
+
+class ImageQueueFullError(Exception):
+    """Raised when the image preprocessing queue is full"""
+
+
+class ImageProcessor:
+    """Runs CPU-bound image normalization off the event loop"""
+
+    def __init__(self):
+        """Initialize image processor"""
+        self.max_workers = settings.IMAGE_WORKERS
+        self.queue_size = settings.IMAGE_QUEUE_SIZE
+
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        # Statistics
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._rejected = 0
+
+    def _create_executor(self) -> Optional[Executor]:
+        """Create the worker pool (None means the loop's default thread pool)"""
+        if self.max_workers <= 0:
+            return None
+        # Spawn instead of fork: the API process runs threads we must not copy
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    async def start(self) -> None:
+        """Start the worker pool (called on application startup)"""
+        if self._executor is None:
+            self._executor = self._create_executor()
+            logger.info(f"Image processor started with {self.max_workers} workers, queue size {self.queue_size}")
+
+    async def close(self) -> None:
+        """Stop the worker pool and drop queued work (called on application shutdown)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Image processor stopped")
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        """Get the semaphore bounding the number of images in the workers"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(max(self.max_workers, 1))
+        return self._slots
+
+    async def run(self, func, *args):
+        """
+        Run a picklable function in the worker pool
+
+        Jobs beyond the worker count wait on the event loop, never inside the pool,
+        so cancelling a waiting job is free and a running job's result is discarded.
+
+        Args:
+            func: Module-level function to run
+            *args: Picklable arguments
+
+        Returns:
+            Result of the function
+
+        Raises:
+            ImageQueueFullError: If the bounded queue is full
+        """
+        if self._pending >= max(self.max_workers, 1) + self.queue_size:
+            self._rejected += 1
+            raise ImageQueueFullError("Image preprocessing queue is full")
+
+        if self._executor is None and self.max_workers > 0:
+            await self.start()
+
+        self._pending += 1
+        try:
+            async with self._get_slots():
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self._executor, func, *args)
+            self._completed += 1
+            return result
+        except asyncio.CancelledError:
+            self._cancelled += 1
+            raise
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._pending -= 1
+
+    async def normalize(self, image_data: bytes, profile: Optional[ImageProfile] = None) -> bytes:
+        """
+        Normalize an image in the worker pool
+
+        Args:
+            image_data: Raw image bytes
+            profile: Image profile of the target model
+
+        Returns:
+            Encoded image bytes
+        """
+        return await self.run(normalize_image, image_data, profile)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get image processor statistics
+
+        Returns:
+            Dictionary with pool configuration and job counters
+        """
+        return {
+            "workers": self.max_workers,
+            "queue_size": self.queue_size,
+            "pending": self._pending,
+            "completed": self._completed,
+            "failed": self._failed,
+            "cancelled": self._cancelled,
+            "rejected": self._rejected,
+        }
+
+# Create a singleton instance
+image_processor = ImageProcessor()
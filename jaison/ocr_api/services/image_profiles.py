@@ -0,0 +1,82 @@
+"""
+Per-model image resolution and compression profiles
+"""
+import json
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+from loguru import logger
+
+from jaison.ocr_api.config.settings import settings
+
+
+class ImageProfile(BaseModel):
+    """How images are resized and encoded for a model"""
+    max_long_edge: int = 2000
+    max_short_edge: Optional[int] = None
+    tile_size: Optional[int] = None
+    quality: int = 85
+    formats: List[str] = Field(default_factory=lambda: ["JPEG"])
+
+
+# Default profile, matching the historical fixed behaviour
+DEFAULT_IMAGE_PROFILE = ImageProfile()
+
+# Profiles keyed by model name prefix. The longest matching prefix wins.
+# Sizes follow the resolution each model family works at internally,
+# so anything larger is downscaled by the provider anyway.
+MODEL_IMAGE_PROFILES: Dict[str, ImageProfile] = {
+    "openai/gpt-4o": ImageProfile(max_long_edge=2048, max_short_edge=768, tile_size=512, quality=80, formats=["JPEG", "WEBP"]),
+    "openai/gpt-4.1": ImageProfile(max_long_edge=2048, max_short_edge=768, tile_size=512, quality=80, formats=["JPEG", "WEBP"]),
+    "anthropic/claude": ImageProfile(max_long_edge=1568, quality=80, formats=["JPEG", "WEBP"]),
+    "google/gemini": ImageProfile(max_long_edge=1536, tile_size=768, quality=80, formats=["JPEG", "WEBP"]),
+    "meta-llama/llama-4": ImageProfile(max_long_edge=1344, tile_size=336, quality=80, formats=["JPEG"]),
+    "meta-llama/llama-3.2": ImageProfile(max_long_edge=1120, tile_size=560, quality=80, formats=["JPEG"]),
+    "qwen/qwen2.5-vl": ImageProfile(max_long_edge=1792, tile_size=28, quality=80, formats=["JPEG", "WEBP"]),
+    "mistralai/pixtral": ImageProfile(max_long_edge=1024, tile_size=16, quality=80, formats=["JPEG", "WEBP"]),
+}
+
+
+def _load_profile_overrides() -> Dict[str, ImageProfile]:
+    """Load profile overrides from the IMAGE_PROFILES setting (JSON object keyed by model prefix)"""
+    if not settings.IMAGE_PROFILES:
+        return {}
+
+    try:
+        overrides = json.loads(settings.IMAGE_PROFILES)
+        return {prefix: ImageProfile(**profile) for prefix, profile in overrides.items()}
+    except Exception as e:
+        logger.error(f"Ignoring invalid IMAGE_PROFILES setting: {e}")
+        return {}
+
+
+_profiles: Dict[str, ImageProfile] = {**MODEL_IMAGE_PROFILES, **_load_profile_overrides()}
+
+
+def get_image_profile(model: Optional[str]) -> ImageProfile:
+    """
+    Get the image profile for a model
+
+    Args:
+        model: Model name
+
+    Returns:
+        Profile registered for the longest matching model prefix, or the default profile
+    """
+    if not model:
+        return DEFAULT_IMAGE_PROFILE
+
+    matches = [prefix for prefix in _profiles if model.startswith(prefix)]
+    if not matches:
+        return DEFAULT_IMAGE_PROFILE
+
+    return _profiles[max(matches, key=len)]
+
+
+def get_all_image_profiles() -> Dict[str, ImageProfile]:
+    """
+    Get every registered image profile
+
+    Returns:
+        Dictionary of model prefix to profile, including "default"
+    """
+    return {"default": DEFAULT_IMAGE_PROFILE, **_profiles}
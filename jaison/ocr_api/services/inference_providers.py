@@ -0,0 +1,103 @@
+"""
+Inference providers and the routing of models to them
+"""
+import json
+from typing import Dict, Optional
+from pydantic import BaseModel, Field
+from loguru import logger
+
+from jaison.ocr_api.config.settings import settings
+
+# Provider of models without a route
+OPENROUTER_PROVIDER = "openrouter"
+
+
+class InferenceProvider(BaseModel):
+    """OpenAI-compatible chat completions endpoint"""
+    name: str
+    base_url: str  # e.g. http://vllm.internal:8000/v1
+    api_key: str = ""
+    headers: Dict[str, str] = Field(default_factory=dict)  # Sent in addition to the API key
+
+
+class ModelRoute(BaseModel):
+    """Where and how requests for a model are sent"""
+    provider: str = OPENROUTER_PROVIDER
+    upstream_model: Optional[str] = None  # Name the provider serves the model under, if different
+    timeout: Optional[float] = None  # Attempt timeout until latencies are learned (defaults to API_TIMEOUT)
+    concurrency_initial: Optional[int] = None
+    concurrency_max: Optional[int] = None
+
+
+def _load_providers() -> Dict[str, InferenceProvider]:
+    """Load OpenRouter and the providers of the INFERENCE_PROVIDERS setting (JSON object keyed by name)"""
+    providers = {
+        OPENROUTER_PROVIDER: InferenceProvider(
+            name=OPENROUTER_PROVIDER,
+            base_url=settings.OPENROUTER_API_URL,
+            api_key=settings.OPENROUTER_API_KEY,
+            headers={"HTTP-Referer": "https://jaison.app"},  # Replace with your actual domain
+        ),
+    }
+    if not settings.INFERENCE_PROVIDERS:
+        return providers
+
+    try:
+        for name, provider in json.loads(settings.INFERENCE_PROVIDERS).items():
+            providers[name] = InferenceProvider(name=name, **provider)
+    except Exception as e:
+        logger.error(f"Ignoring invalid INFERENCE_PROVIDERS setting: {e}")
+    return providers
+
+
+def _load_routes() -> Dict[str, ModelRoute]:
+    """Load routes from the MODEL_ROUTES setting (JSON object keyed by model name prefix)"""
+    if not settings.MODEL_ROUTES:
+        return {}
+
+    try:
+        routes = {prefix: ModelRoute(**route) for prefix, route in json.loads(settings.MODEL_ROUTES).items()}
+    except Exception as e:
+        logger.error(f"Ignoring invalid MODEL_ROUTES setting: {e}")
+        return {}
+
+    for prefix, route in list(routes.items()):
+        if route.provider not in _providers:
+            logger.error(f"Ignoring route for {prefix}: unknown provider {route.provider}")
+            del routes[prefix]
+    return routes
+
+
+_providers: Dict[str, InferenceProvider] = _load_providers()
+_routes: Dict[str, ModelRoute] = _load_routes()
+DEFAULT_ROUTE = ModelRoute()
+
+
+def get_route(model: str) -> ModelRoute:
+    """
+    Get the route of a model
+
+    Args:
+        model: Model name
+
+    Returns:
+        Route registered for the longest matching model prefix, or the OpenRouter default
+    """
+    matches = [prefix for prefix in _routes if model.startswith(prefix)]
+    if not matches:
+        return DEFAULT_ROUTE
+
+    return _routes[max(matches, key=len)]
+
+
+def get_provider(name: str) -> InferenceProvider:
+    """
+    Get a provider by name
+
+    Args:
+        name: Provider name
+
+    Returns:
+        Provider configuration
+    """
+    return _providers[name]
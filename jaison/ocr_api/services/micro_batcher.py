@@ -0,0 +1,208 @@
+"""
+Micro-batching of small documents into multi-image model calls
+"""
+import asyncio
+import json
+from typing import Dict, Any, List, NamedTuple, Optional, Set, Tuple
+from loguru import logger
+
+from jaison.ocr_api.config.settings import settings
+from jaison.ocr_api.services.openrouter_client import openrouter_client, ExtractionResult
+
+
+class _BatchJob(NamedTuple):
+    """Document waiting to be sent in a batch"""
+    image_data: bytes
+    deadline: Optional[float]
+    max_tokens: int
+    future: asyncio.Future
+
+
+class MicroBatcher:
+    """
+    Collects small documents for a few milliseconds and sends them together
+
+    Documents are only batched with others from the same API key, for the
+    same model, prompts and output schema (the prompts already carry the
+    document type), so a misplaced answer never crosses tenants. A
+    batch is sent when it is full or when its first document has waited
+    max_wait seconds. Documents missing from the batch answer are extracted
+    on their own.
+    """
+
+    def __init__(self):
+        """Initialize micro-batcher"""
+        self.enabled = settings.MICRO_BATCH_ENABLED
+        self.max_batch_size = settings.MICRO_BATCH_SIZE
+        self.max_wait = settings.MICRO_BATCH_MAX_WAIT_MS / 1000
+        self.max_image_bytes = settings.MICRO_BATCH_MAX_IMAGE_BYTES
+
+        self._pending: Dict[Tuple[str, str, str, str, str], List[_BatchJob]] = {}
+        self._timers: Dict[Tuple[str, str, str, str, str], asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+        # Statistics
+        self._batches = 0
+        self._batched_jobs = 0
+        self._single_jobs = 0
+        self._split_failures = 0
+
+    def accepts(self, image_data: bytes) -> bool:
+        """
+        Check whether a document may be batched
+
+        Args:
+            image_data: Normalized image bytes
+
+        Returns:
+            True if batching is enabled and the image is small enough
+        """
+        return self.enabled and self.max_batch_size > 1 and len(image_data) <= self.max_image_bytes
+
+    async def submit(
+        self,
+        image_data: bytes,
+        prompt: str,
+        model: str,
+        deadline: Optional[float] = None,
+        output_schema: Optional[Dict[str, Any]] = None,
+        max_tokens: int = 1000,
+        system_prompt: Optional[str] = None,
+        api_key_id: Optional[str] = None,
+    ) -> ExtractionResult:
+        """
+        Extract data from a document as part of a batch
+
+        Args:
+            image_data: Normalized image bytes
+            prompt: Final prompt
+            model: Model to use
+            deadline: Monotonic time by which retries must be finished
+            output_schema: JSON schema the output must follow
+            max_tokens: Maximum tokens to generate for this document
+            system_prompt: Static instructions sent as a system message
+            api_key_id: API key of the request; documents of other keys are never in the same batch
+
+        Returns:
+            Extraction result of this document
+        """
+        schema = json.dumps(output_schema, sort_keys=True) if output_schema else ""
+        key = (api_key_id or "", model, system_prompt or "", prompt, schema)
+        loop = asyncio.get_running_loop()
+        job = _BatchJob(image_data, deadline, max_tokens, loop.create_future())
+
+        jobs = self._pending.setdefault(key, [])
+        jobs.append(job)
+        if len(jobs) >= self.max_batch_size:
+            self._flush(key)
+        elif len(jobs) == 1:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+
+        return await job.future
+
+    def _flush(self, key: Tuple[str, str, str, str, str]) -> None:
+        """Send the documents collected for a key"""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        jobs = [job for job in self._pending.pop(key, []) if not job.future.done()]
+        if not jobs:
+            return
+
+        task = asyncio.ensure_future(self._run_batch(key, jobs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, key: Tuple[str, str, str, str, str], jobs: List[_BatchJob]) -> None:
+        """Send one batch and hand each document its result"""
+        _, model, system_prompt, prompt, schema = key
+        output_schema = json.loads(schema) if schema else None
+        deadlines = [job.deadline for job in jobs if job.deadline is not None]
+        deadline = min(deadlines) if deadlines else None
+
+        try:
+            if len(jobs) == 1:
+                self._single_jobs += 1
+                results: List[Optional[ExtractionResult]] = [await openrouter_client.extract_image(
+                    image_data=jobs[0].image_data,
+                    prompt=prompt,
+                    model=model,
+                    max_tokens=jobs[0].max_tokens,
+                    preprocessed=True,
+                    deadline=deadline,
+                    output_schema=output_schema,
+                    system_prompt=system_prompt or None,
+                )]
+            else:
+                self._batches += 1
+                self._batched_jobs += len(jobs)
+                results = await openrouter_client.extract_batch(
+                    [job.image_data for job in jobs],
+                    prompt=prompt,
+                    model=model,
+                    max_tokens=max(job.max_tokens for job in jobs),
+                    deadline=deadline,
+                    output_schema=output_schema,
+                    system_prompt=system_prompt or None,
+                )
+
+                # Documents the batch answer left out are extracted on their own
+                missing = [index for index, result in enumerate(results) if result is None]
+                if missing:
+                    logger.warning(f"Batch answer missed {len(missing)} of {len(jobs)} documents, extracting them separately")
+                    self._split_failures += len(missing)
+                    retried = await asyncio.gather(*(
+                        openrouter_client.extract_image(
+                            image_data=jobs[index].image_data,
+                            prompt=prompt,
+                            model=model,
+                            max_tokens=jobs[index].max_tokens,
+                            preprocessed=True,
+                            deadline=jobs[index].deadline,
+                            output_schema=output_schema,
+                            system_prompt=system_prompt or None,
+                        )
+                        for index in missing
+                    ), return_exceptions=True)
+                    for index, result in zip(missing, retried):
+                        results[index] = result
+        except asyncio.CancelledError:
+            for job in jobs:
+                job.future.cancel()
+            raise
+        except Exception as e:
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+
+        for job, result in zip(jobs, results):
+            if job.future.done():
+                continue
+            if isinstance(result, BaseException):
+                job.future.set_exception(result)
+            else:
+                job.future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get micro-batching statistics
+
+        Returns:
+            Dictionary with batches sent, documents batched and documents pending
+        """
+        return {
+            "enabled": self.enabled,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self._batches,
+            "batched_jobs": self._batched_jobs,
+            "single_jobs": self._single_jobs,
+            "mean_batch_size": self._batched_jobs / self._batches if self._batches else 0.0,
+            "split_failures": self._split_failures,
+            "pending": sum(len(jobs) for jobs in self._pending.values()),
+        }
+
+# Create a singleton instance
+micro_batcher = MicroBatcher()
@@ -0,0 +1,63 @@
+"""
+Per-model API capabilities
+"""
+import json
+from typing import Dict, Optional
+from pydantic import BaseModel
+from loguru import logger
+
+from jaison.ocr_api.config.settings import settings
+
+
+class ModelCapabilities(BaseModel):
+    """API features a model supports"""
+    structured_outputs: bool = False  # response_format of type json_schema
+    cache_control: bool = False  # Prompt caching needs explicit cache_control breakpoints
+
+
+# Capabilities of models not in the table: assume only the basics
+DEFAULT_MODEL_CAPABILITIES = ModelCapabilities()
+
+# Capabilities keyed by model name prefix. The longest matching prefix wins.
+MODEL_CAPABILITIES: Dict[str, ModelCapabilities] = {
+    "openai/gpt-4o": ModelCapabilities(structured_outputs=True),
+    "openai/gpt-4.1": ModelCapabilities(structured_outputs=True),
+    "google/gemini": ModelCapabilities(structured_outputs=True),
+    "anthropic/claude": ModelCapabilities(cache_control=True),
+}
+
+
+def _load_capability_overrides() -> Dict[str, ModelCapabilities]:
+    """Load capability overrides from the MODEL_CAPABILITIES setting (JSON object keyed by model prefix)"""
+    if not settings.MODEL_CAPABILITIES:
+        return {}
+
+    try:
+        overrides = json.loads(settings.MODEL_CAPABILITIES)
+        return {prefix: ModelCapabilities(**capabilities) for prefix, capabilities in overrides.items()}
+    except Exception as e:
+        logger.error(f"Ignoring invalid MODEL_CAPABILITIES setting: {e}")
+        return {}
+
+
+_capabilities: Dict[str, ModelCapabilities] = {**MODEL_CAPABILITIES, **_load_capability_overrides()}
+
+
+def get_model_capabilities(model: Optional[str]) -> ModelCapabilities:
+    """
+    Get the capabilities of a model
+
+    Args:
+        model: Model name
+
+    Returns:
+        Capabilities registered for the longest matching model prefix, or the defaults
+    """
+    if not model:
+        return DEFAULT_MODEL_CAPABILITIES
+
+    matches = [prefix for prefix in _capabilities if model.startswith(prefix)]
+    if not matches:
+        return DEFAULT_MODEL_CAPABILITIES
+
+    return _capabilities[max(matches, key=len)]
@@ -0,0 +1,165 @@
+"""
+Model cascade: try cheap models first and escalate when the result does not validate
+"""
+import json
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+from loguru import logger
+
+from jaison.ocr_api.config.settings import settings
+from jaison.ocr_api.services.openrouter_client import ExtractionResult
+from jaison.ocr_api.utils.json_parser import REPAIR_TRUNCATED
+from jaison.ocr_api.utils.schema_validator import validate_json, find_missing_fields, get_fill_ratio
+
+# Cascade configuration key applying to document types without their own entry
+DEFAULT_CASCADE = "default"
+
+
+def _load_cascades() -> Dict[str, List[str]]:
+    """Load cascades from the CASCADE_MODELS setting (JSON object of document type to model list)"""
+    if not settings.CASCADE_MODELS:
+        return {}
+
+    try:
+        cascades = json.loads(settings.CASCADE_MODELS)
+        return {document_type: list(models) for document_type, models in cascades.items() if models}
+    except Exception as e:
+        logger.error(f"Ignoring invalid CASCADE_MODELS setting: {e}")
+        return {}
+
+
+class ModelCascade:
+    """Runs an extraction through a per-document-type chain of models, cheapest first"""
+
+    def __init__(self):
+        """Initialize model cascade"""
+        self.enabled = settings.CASCADE_ENABLED
+        self.min_fill_ratio = settings.CASCADE_MIN_FILL_RATIO
+        self.cascades = _load_cascades()
+
+        # Statistics: document type -> model -> counters
+        self._stats: Dict[str, Dict[str, Dict[str, int]]] = {}
+
+    def get_models(self, document_type: str) -> List[str]:
+        """
+        Get the cascade of a document type
+
+        Args:
+            document_type: Document type
+
+        Returns:
+            Models to try in order, empty if no cascade is configured
+        """
+        return self.cascades.get(document_type) or self.cascades.get(DEFAULT_CASCADE, [])
+
+    def check(
+        self,
+        result: ExtractionResult,
+        output_schema: Optional[Dict[str, Any]] = None,
+        expected_fields: Optional[List[str]] = None,
+    ) -> Optional[str]:
+        """
+        Check whether a result is good enough to stop the cascade
+
+        Args:
+            result: Extraction result of a stage
+            output_schema: JSON schema the result must follow
+            expected_fields: Template fields to look for when there is no schema
+
+        Returns:
+            Reason to escalate, or None if the result is accepted
+        """
+        if "raw_content" in result.data:
+            return "invalid_json"
+        if REPAIR_TRUNCATED in result.repairs:
+            return "truncated"
+
+        if output_schema:
+            if validate_json(result.data, output_schema):
+                return "schema_invalid"
+        elif expected_fields and find_missing_fields(result.data, expected_fields):
+            return "missing_fields"
+
+        fill_ratio = get_fill_ratio(result.data)
+        if fill_ratio is not None and fill_ratio < self.min_fill_ratio:
+            return "low_confidence"
+
+        return None
+
+    def _count(self, document_type: str, model: str, outcome: str) -> None:
+        """Count the outcome of a stage"""
+        counters = self._stats.setdefault(document_type, {}).setdefault(model, {"attempts": 0, "accepted": 0})
+        counters["attempts"] += 1
+        counters[outcome] = counters.get(outcome, 0) + 1
+
+    async def run(
+        self,
+        document_type: str,
+        extract: Callable[[str], Awaitable[ExtractionResult]],
+        output_schema: Optional[Dict[str, Any]] = None,
+        expected_fields: Optional[List[str]] = None,
+    ) -> Tuple[ExtractionResult, List[str]]:
+        """
+        Extract with each model of the cascade until a result is accepted
+
+        Args:
+            document_type: Document type
+            extract: Runs the extraction with the given model
+            output_schema: JSON schema the result must follow
+            expected_fields: Template fields to look for when there is no schema
+
+        Returns:
+            Accepted result (or the last stage's result) and the models tried
+        """
+        models = self.get_models(document_type)
+        if not models:
+            raise ValueError(f"No model cascade configured for {document_type}")
+
+        tried: List[str] = []
+        result: Optional[ExtractionResult] = None
+
+        for stage, model in enumerate(models):
+            is_last = stage == len(models) - 1
+            try:
+                result = await extract(model)
+            except Exception as e:
+                if is_last:
+                    raise
+                logger.warning(f"Cascade stage {model} failed for {document_type}, escalating: {e}")
+                tried.append(model)
+                self._count(document_type, model, "error")
+                continue
+
+            tried.append(model)
+            reason = self.check(result, output_schema, expected_fields)
+            if reason is None:
+                self._count(document_type, model, "accepted")
+                return result, tried
+
+            self._count(document_type, model, reason)
+            if not is_last:
+                logger.info(f"Cascade stage {model} result rejected for {document_type} ({reason}), escalating")
+
+        return result, tried
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get per-stage hit rates
+
+        Returns:
+            Dictionary of document type to per-model attempts, acceptances,
+            escalation reasons and hit rate
+        """
+        return {
+            "enabled": self.enabled,
+            "cascades": self.cascades,
+            "stages": {
+                document_type: {
+                    model: {**counters, "hit_rate": counters["accepted"] / counters["attempts"]}
+                    for model, counters in models.items()
+                }
+                for document_type, models in self._stats.items()
+            },
+        }
+
+# Create a singleton instance
+model_cascade = ModelCascade()
@@ -2,44 +2,413 @@
 OpenRouter API client for multimodal LLM access
 """
 import base64
+import importlib.util
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import httpx
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+from pydantic import BaseModel, Field
 from loguru import logger
 import json
 import asyncio
-from io import BytesIO
-from PIL import Image
 
 from jaison.ocr_api.config.settings import settings
+from jaison.ocr_api.services.adaptive_limits import adaptive_limits
+from jaison.ocr_api.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from jaison.ocr_api.services.concurrency_limiter import AdaptiveConcurrencyLimiter, ConcurrencyQueueFullError
+from jaison.ocr_api.services.image_processor import image_processor, get_image_mime_type, ImageQueueFullError
+from jaison.ocr_api.services.image_profiles import get_image_profile
+from jaison.ocr_api.services.inference_providers import InferenceProvider, get_route, get_provider
+from jaison.ocr_api.services.model_capabilities import get_model_capabilities
+from jaison.ocr_api.services.prompt_service import build_schema_instruction
+from jaison.ocr_api.utils.json_parser import IncrementalJSONParser, extract_json
+from jaison.ocr_api.utils.latency import LatencyTracker
+
+# Appended to the prompt when several documents are sent in one request
+BATCH_INSTRUCTIONS = """
+
+The following {count} images are separate documents, numbered from 0. Apply the
+instructions above to each document on its own. Respond with a JSON object of the form
+{{"results": [{{"index": 0, "data": {{...}}}}, {{"index": 1, "data": {{...}}}}, ...]}}
+with exactly one entry per document, where "data" is the JSON you would return for
+that document alone."""
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when the caller's deadline runs out, which says nothing about the model's health"""
+
+
+class ExtractionResult(BaseModel):
+    """Result of an extraction call"""
+    data: Dict[str, Any]
+    model: str
+    usage: Optional[Dict[str, Any]] = None
+    repairs: List[str] = Field(default_factory=list)
+
 
 class OpenRouterClient:
-    """Client for OpenRouter API"""
+    """
+    Client for OpenRouter API
 
-    API_URL = "https://openrouter.ai/api/v1"
+    Models can also be routed (MODEL_ROUTES) to any other OpenAI-compatible
+    provider, such as a self-hosted vLLM or llama.cpp server; each model keeps
+    its own circuit breaker, concurrency limit and timeouts.
+    """
 
     def __init__(self):
-        self.api_key = settings.OPENROUTER_API_KEY
         self.default_model = settings.OPENROUTER_MODEL
         self.timeout = settings.API_TIMEOUT
+        self.fallback_models = settings.OPENROUTER_FALLBACK_MODELS
+        self.max_retries = settings.OPENROUTER_MAX_RETRIES
+
+        # Circuit breakers per model endpoint
+        self.circuit_breakers: Dict[str, CircuitBreaker] = {}
+        self._retries = 0
+
+        # Adaptive concurrency limits per model endpoint
+        self.concurrency_limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+
+        # Recent latencies per model, used to decide when to hedge
+        self.latency_tracker = LatencyTracker(min_samples=settings.OPENROUTER_HEDGE_MIN_SAMPLES)
+        self._hedges = 0
+        self._failovers = 0
+        self._fallback_answers = 0
+
+        # Repairs needed to parse model output, by kind
+        self._json_repairs: Dict[str, int] = {}
+
+        # How output schemas were sent: as response format or in the prompt
+        self._schema_modes: Dict[str, int] = {}
+
+        # Prompt tokens served from provider prompt caches, per model
+        self._prompt_cache: Dict[str, Dict[str, float]] = {}
+
+        # Shared HTTP client, created at application startup
+        self._client: Optional[httpx.AsyncClient] = None
+        self._http2 = False
+
+        # Connection pool statistics
+        self._provider_requests: Dict[str, int] = {}
+        self._requests_sent = 0
+        self._connections_opened = 0
+        self._http_versions: Dict[str, int] = {}
+
+    def _create_client(self) -> httpx.AsyncClient:
+        """Create the pooled HTTP client used for all OpenRouter requests"""
+        self._http2 = settings.OPENROUTER_HTTP2
+        if self._http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed, falling back to HTTP/1.1")
+            self._http2 = False
 
-    async def _make_request(self, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-        """Make a request to OpenRouter API"""
-        url = f"{self.API_URL}/{endpoint}"
+        limits = httpx.Limits(
+            max_connections=settings.OPENROUTER_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENROUTER_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENROUTER_KEEPALIVE_EXPIRY,
+        )
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://jaison.app",  # Replace with your actual domain
+        return httpx.AsyncClient(timeout=self.timeout, http2=self._http2, limits=limits)
+
+    async def start(self) -> None:
+        """Open the shared HTTP client (called on application startup)"""
+        if self._client is None:
+            self._client = self._create_client()
+            logger.info(f"OpenRouter client started (HTTP/2: {self._http2})")
+
+    async def close(self) -> None:
+        """Close the shared HTTP client (called on application shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("OpenRouter client closed")
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the shared HTTP client, creating it if the app did not start it"""
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """httpcore trace hook used to count newly opened connections"""
+        if event_name == "connection.connect_tcp.complete":
+            self._connections_opened += 1
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """
+        Get connection pool statistics
+
+        Returns:
+            Dictionary with pool configuration and connection reuse counters
+        """
+        reused = max(self._requests_sent - self._connections_opened, 0)
+        return {
+            "started": self._client is not None,
+            "http2": self._http2,
+            "max_connections": settings.OPENROUTER_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.OPENROUTER_MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry": settings.OPENROUTER_KEEPALIVE_EXPIRY,
+            "requests": self._requests_sent,
+            "provider_requests": dict(self._provider_requests),
+            "connections_opened": self._connections_opened,
+            "connections_reused": reused,
+            "reuse_ratio": reused / self._requests_sent if self._requests_sent else 0.0,
+            "http_versions": dict(self._http_versions),
         }
 
+    @staticmethod
+    def _get_headers(provider: InferenceProvider) -> Dict[str, str]:
+        """Get the headers sent with every request to a provider"""
+        headers = {"Content-Type": "application/json", **provider.headers}
+        if provider.api_key:
+            headers["Authorization"] = f"Bearer {provider.api_key}"
+        return headers
+
+    def _prepare_request(self, endpoint: str, payload: Dict[str, Any]) -> Tuple[str, InferenceProvider, Dict[str, Any]]:
+        """Get the URL, provider and payload of a request according to the model's route"""
+        model = payload.get("model", self.default_model)
+        route = get_route(model)
+        provider = get_provider(route.provider)
+        return f"{provider.base_url.rstrip('/')}/{endpoint}", provider, {**payload, "model": route.upstream_model or model}
+
+    def _get_circuit_breaker(self, model: str) -> CircuitBreaker:
+        """Get the circuit breaker of a model endpoint"""
+        if model not in self.circuit_breakers:
+            self.circuit_breakers[model] = CircuitBreaker(
+                name=model,
+                failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                recovery_time=settings.CIRCUIT_BREAKER_RECOVERY_TIME,
+            )
+        return self.circuit_breakers[model]
+
+    def _get_concurrency_limiter(self, model: str) -> AdaptiveConcurrencyLimiter:
+        """Get the concurrency limiter of a model endpoint"""
+        if model not in self.concurrency_limiters:
+            route = get_route(model)
+            self.concurrency_limiters[model] = AdaptiveConcurrencyLimiter(
+                name=model,
+                initial_limit=route.concurrency_initial or settings.OPENROUTER_CONCURRENCY_INITIAL,
+                min_limit=settings.OPENROUTER_CONCURRENCY_MIN,
+                max_limit=route.concurrency_max or settings.OPENROUTER_CONCURRENCY_MAX,
+                queue_size=settings.OPENROUTER_CONCURRENCY_QUEUE_SIZE,
+                backoff_ratio=settings.OPENROUTER_CONCURRENCY_BACKOFF,
+                latency_tolerance=settings.OPENROUTER_CONCURRENCY_LATENCY_TOLERANCE,
+            )
+        return self.concurrency_limiters[model]
+
+    def get_concurrency_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the concurrency limit and queue depth of every model
+
+        Returns:
+            Dictionary of model name to limiter statistics
+        """
+        return {model: limiter.get_stats() for model, limiter in self.concurrency_limiters.items()}
+
+    def get_circuit_breaker_states(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the state of every model circuit breaker
+
+        Returns:
+            Dictionary of model name to circuit state
+        """
+        return {model: breaker.get_state() for model, breaker in self.circuit_breakers.items()}
+
+    @staticmethod
+    def _is_retryable_error(error: BaseException) -> bool:
+        """Whether an error is transient (5xx, 429, timeouts, connection errors, open circuits, full queues)"""
+        if isinstance(error, DeadlineExceededError):
+            return False
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code == 429 or error.response.status_code >= 500
+        return isinstance(error, (TimeoutError, httpx.TransportError, CircuitOpenError, ConcurrencyQueueFullError))
+
+    @staticmethod
+    def _is_overload_error(error: BaseException) -> bool:
+        """Whether an error means the provider is overloaded (429, 5xx, timeouts)"""
+        if isinstance(error, DeadlineExceededError):
+            return False
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code == 429 or error.response.status_code >= 500
+        return isinstance(error, (TimeoutError, httpx.TimeoutException))
+
+    @staticmethod
+    def _get_retry_after(error: BaseException) -> Optional[float]:
+        """Get the Retry-After delay in seconds sent with an error response"""
+        if not isinstance(error, httpx.HTTPStatusError):
+            return None
+
+        retry_after = error.response.headers.get("Retry-After")
+        if not retry_after:
+            return None
+
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(url, json=payload, headers=headers)
-                response.raise_for_status()
-                return response.json()
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+
+        try:
+            retry_at = parsedate_to_datetime(retry_after)
+            return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    def _get_retry_delay(self, error: BaseException, attempt: int, deadline: Optional[float]) -> Optional[float]:
+        """
+        Get how long to wait before retrying a failed request
+
+        Args:
+            error: Error of the failed attempt
+            attempt: Number of retries already made
+            deadline: Monotonic time by which the job must be finished
+
+        Returns:
+            Delay in seconds, or None if the request must not be retried
+        """
+        if isinstance(error, (CircuitOpenError, ConcurrencyQueueFullError)) or not self._is_retryable_error(error):
+            return None
+        if attempt >= self.max_retries:
+            return None
+
+        # Exponential backoff with full jitter, but never sooner than the server asked
+        delay = random.uniform(0, min(settings.OPENROUTER_RETRY_MAX_DELAY, settings.OPENROUTER_RETRY_BASE_DELAY * 2 ** attempt))
+        retry_after = self._get_retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        # Leave time for the retry itself within the deadline
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+
+        return delay
+
+    def _get_attempt_timeout(self, model: str, deadline: Optional[float], max_tokens: Optional[int] = None) -> float:
+        """Get the timeout of one attempt, learned from the model's latencies and bounded by the job deadline"""
+        timeout = adaptive_limits.get_timeout(model, get_route(model).timeout or self.timeout, max_tokens)
+        if deadline is None:
+            return timeout
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError("Job deadline exceeded before the request to OpenRouter was sent")
+
+        return min(timeout, remaining)
+
+    async def _with_retries(
+        self,
+        model: str,
+        send_once: Callable[[float], Awaitable[Dict[str, Any]]],
+        deadline: Optional[float] = None,
+        can_retry: Optional[Callable[[], bool]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Send a request through the model's circuit breaker and concurrency limiter,
+        retrying transient errors
+
+        Args:
+            model: Model the request is sent to
+            send_once: Sends one attempt with the given timeout
+            deadline: Monotonic time by which the job must be finished
+            can_retry: Optional check that a failed attempt may be repeated
+            max_tokens: Token budget of the request, which attempt timeouts are learned per
+
+        Returns:
+            Response of the first successful attempt
+        """
+        breaker = self._get_circuit_breaker(model)
+        limiter = self._get_concurrency_limiter(model)
+        attempt = 0
+
+        while True:
+            breaker.before_request()
+            try:
+                started_at = await limiter.acquire(self._get_attempt_timeout(model, deadline, max_tokens))
+            except BaseException:
+                breaker.record_cancelled()
+                raise
+
+            try:
+                timeout = self._get_attempt_timeout(model, deadline, max_tokens)
+                sent_at = time.monotonic()
+                response = await send_once(timeout)
+            except asyncio.CancelledError:
+                limiter.release(started_at, succeeded=False)
+                breaker.record_cancelled()
+                raise
+            except Exception as e:
+                timed_out = isinstance(e, (TimeoutError, httpx.TimeoutException))
+                if timed_out and deadline is not None and time.monotonic() >= deadline:
+                    # Cut short by the caller's deadline, not by a slow model: neither trip
+                    # the circuit nor lower the concurrency limit
+                    limiter.release(started_at, succeeded=False)
+                    breaker.record_cancelled()
+                    if isinstance(e, DeadlineExceededError):
+                        raise
+                    raise DeadlineExceededError("Job deadline exceeded while waiting for OpenRouter") from e
+
+                if timed_out:
+                    # The attempt took at least its timeout; without this sample a timeout
+                    # learned from short documents would never grow
+                    adaptive_limits.record_timeout(model, timeout, max_tokens)
+
+                limiter.release(started_at, overloaded=self._is_overload_error(e), succeeded=False)
+                if self._is_retryable_error(e):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+
+                delay = self._get_retry_delay(e, attempt, deadline)
+                if delay is None or (can_retry is not None and not can_retry()):
+                    raise
+
+                attempt += 1
+                self._retries += 1
+                logger.warning(f"Request to {model} failed ({e!r}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            else:
+                limiter.release(started_at)
+                breaker.record_success()
+                adaptive_limits.record_latency(model, time.monotonic() - sent_at, max_tokens)
+                return response
+
+    async def _make_request(
+        self,
+        endpoint: str,
+        payload: Dict[str, Any],
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Make a request to the model's provider (OpenRouter unless routed elsewhere)"""
+        url, provider, body = self._prepare_request(endpoint, payload)
+
+        async def send_once(timeout: float) -> Dict[str, Any]:
+            client = self._get_client()
+            self._requests_sent += 1
+            self._provider_requests[provider.name] = self._provider_requests.get(provider.name, 0) + 1
+            response = await client.post(
+                url,
+                json=body,
+                headers=self._get_headers(provider),
+                timeout=timeout,
+                extensions={"trace": self._trace},
+            )
+            self._http_versions[response.http_version] = self._http_versions.get(response.http_version, 0) + 1
+            response.raise_for_status()
+            return response.json()
+
+        try:
+            return await self._with_retries(
+                payload.get("model", self.default_model),
+                send_once,
+                deadline,
+                max_tokens=payload.get("max_tokens"),
+            )
         except httpx.TimeoutException:
-            logger.error(f"Request to OpenRouter timed out after {self.timeout} seconds")
-            raise TimeoutError(f"Request to OpenRouter timed out after {self.timeout} seconds")
+            timeout = adaptive_limits.get_timeout(
+                payload.get("model", self.default_model), self.timeout, payload.get("max_tokens")
+            )
+            logger.error(f"Request to OpenRouter timed out after {timeout:.1f} seconds")
+            raise TimeoutError(f"Request to OpenRouter timed out after {timeout:.1f} seconds")
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error from OpenRouter: {e.response.status_code} - {e.response.text}")
             raise
@@ -47,98 +416,465 @@ class OpenRouterClient:
             logger.error(f"Error making request to OpenRouter: {e}")
             raise
 
-    async def process_image(
+    async def _stream_request(
+        self,
+        endpoint: str,
+        payload: Dict[str, Any],
+        on_content: Callable[[str], Awaitable[None]],
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Make a streaming request to the model's provider (OpenRouter unless routed elsewhere)
+
+        Args:
+            endpoint: API endpoint
+            payload: Request payload (sent with stream enabled)
+            on_content: Called with each chunk of generated content
+            deadline: Monotonic time by which the job must be finished
+
+        Returns:
+            Response assembled in the non-streaming format
+        """
+        url, provider, body = self._prepare_request(endpoint, payload)
+        content_parts: List[str] = []
+
+        async def stream_once(timeout: float) -> Dict[str, Any]:
+            response_model = payload.get("model")
+            usage = None
+
+            client = self._get_client()
+            self._requests_sent += 1
+            self._provider_requests[provider.name] = self._provider_requests.get(provider.name, 0) + 1
+            async with client.stream(
+                "POST",
+                url,
+                json={**body, "stream": True},
+                headers=self._get_headers(provider),
+                timeout=timeout,
+                extensions={"trace": self._trace},
+            ) as response:
+                self._http_versions[response.http_version] = self._http_versions.get(response.http_version, 0) + 1
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
+
+                async for line in response.aiter_lines():
+                    # Skip blank lines and SSE comments (keep-alive messages)
+                    if not line.startswith("data:"):
+                        continue
+
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+
+                    chunk = json.loads(data)
+                    if "error" in chunk:
+                        raise ValueError(f"Error from OpenRouter stream: {chunk['error']}")
+
+                    response_model = chunk.get("model", response_model)
+                    usage = chunk.get("usage") or usage
+                    for choice in chunk.get("choices", []):
+                        delta = choice.get("delta", {}).get("content")
+                        if delta:
+                            content_parts.append(delta)
+                            await on_content(delta)
+
+            return {
+                "model": response_model,
+                "usage": usage,
+                "choices": [{"message": {"role": "assistant", "content": "".join(content_parts)}}],
+            }
+
+        try:
+            # A stream can only be retried before any content was passed on
+            return await self._with_retries(
+                payload.get("model", self.default_model),
+                stream_once,
+                deadline,
+                can_retry=lambda: not content_parts,
+                max_tokens=payload.get("max_tokens"),
+            )
+        except httpx.TimeoutException:
+            timeout = adaptive_limits.get_timeout(
+                payload.get("model", self.default_model), self.timeout, payload.get("max_tokens")
+            )
+            logger.error(f"Streaming request to OpenRouter timed out after {timeout:.1f} seconds")
+            raise TimeoutError(f"Request to OpenRouter timed out after {timeout:.1f} seconds")
+        except httpx.HTTPStatusError as e:
+            logger.error(f"HTTP error from OpenRouter: {e.response.status_code} - {e.response.text}")
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming from OpenRouter: {e}")
+            raise
+
+    async def prepare_image(self, image_data: bytes, model: Optional[str] = None) -> bytes:
+        """
+        Normalize an image for upload to the model
+
+        Args:
+            image_data: Raw image bytes
+            model: Model the image will be sent to (selects the image profile)
+
+        Returns:
+            Normalized image bytes
+        """
+        try:
+            # Validate and resize the image to the model's profile in the worker pool
+            profile = get_image_profile(model or self.default_model)
+            return await image_processor.normalize(image_data, profile)
+        except ImageQueueFullError:
+            raise
+        except Exception as e:
+            logger.error(f"Error processing image: {e}")
+            raise ValueError(f"Invalid image data: {e}")
+
+    def _get_model_chain(self, model: str) -> List[str]:
+        """Get the requested model followed by its fallback models"""
+        return [model] + [fallback for fallback in self.fallback_models if fallback != model]
+
+    def _get_hedge_delay(self, model: str) -> Optional[float]:
+        """Get how long to wait for a model before firing a hedged request"""
+        if not settings.OPENROUTER_HEDGE_ENABLED:
+            return None
+
+        latency = self.latency_tracker.percentile(model, settings.OPENROUTER_HEDGE_PERCENTILE)
+        if latency is None:
+            return None
+
+        return max(latency, settings.OPENROUTER_HEDGE_MIN_DELAY)
+
+    async def _send_to_model(
+        self,
+        send: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        payload: Dict[str, Any],
+        model: str,
+    ) -> Dict[str, Any]:
+        """Send a payload to one model and record its latency and prompt cache use"""
+        start_time = time.monotonic()
+        response = await send({**payload, "model": model})
+        latency = time.monotonic() - start_time
+        self.latency_tracker.record(model, latency)
+        self._record_prompt_cache(model, response.get("usage"), latency)
+        return response
+
+    def _record_prompt_cache(self, model: str, usage: Optional[Dict[str, Any]], latency: float) -> None:
+        """Record the prompt tokens a provider served from its prompt cache"""
+        if not usage or not usage.get("prompt_tokens"):
+            return
+
+        cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        stats = self._prompt_cache.setdefault(model, {
+            "requests": 0,
+            "cache_hits": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "hit_latency": 0.0,
+            "miss_latency": 0.0,
+        })
+        stats["requests"] += 1
+        stats["prompt_tokens"] += usage["prompt_tokens"]
+        stats["cached_tokens"] += cached_tokens
+        if cached_tokens:
+            stats["cache_hits"] += 1
+            stats["hit_latency"] += latency
+        else:
+            stats["miss_latency"] += latency
+
+    def get_prompt_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get provider prompt cache use per model
+
+        Returns:
+            Dictionary of model name to prompt tokens, cached tokens and the
+            mean latency of requests with and without cache hits
+        """
+        stats = {}
+        for model, counters in self._prompt_cache.items():
+            misses = counters["requests"] - counters["cache_hits"]
+            stats[model] = {
+                "requests": counters["requests"],
+                "cache_hits": counters["cache_hits"],
+                "prompt_tokens": counters["prompt_tokens"],
+                "cached_tokens": counters["cached_tokens"],
+                "cached_ratio": counters["cached_tokens"] / counters["prompt_tokens"],
+                "mean_hit_latency": counters["hit_latency"] / counters["cache_hits"] if counters["cache_hits"] else None,
+                "mean_miss_latency": counters["miss_latency"] / misses if misses else None,
+            }
+        return stats
+
+    async def _complete(
+        self,
+        payload: Dict[str, Any],
+        send: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        hedge: bool = True,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Get a completion, hedging slow requests and failing over between models
+
+        If the requested model is slower than its learned latency percentile, a
+        duplicate request is fired at the next model and the first good answer
+        wins; the other request is cancelled. On 5xx, 429, timeouts or an open
+        circuit the next model in the chain is tried.
+
+        Args:
+            payload: Request payload
+            send: Sends a payload and returns the response
+            hedge: Whether hedged duplicate requests are allowed
+
+        Returns:
+            Tuple of the model that answered and its response
+        """
+        chain = self._get_model_chain(payload["model"])
+        hedge_delay = self._get_hedge_delay(chain[0]) if hedge else None
+        pending: Dict[asyncio.Future, str] = {}
+        next_index = 0
+        last_error: Optional[BaseException] = None
+
+        def launch() -> None:
+            nonlocal next_index
+            model = chain[next_index]
+            next_index += 1
+            pending[asyncio.ensure_future(self._send_to_model(send, payload, model))] = model
+
+        launch()
+        try:
+            while pending:
+                wait_timeout = hedge_delay if next_index < len(chain) else None
+                done, _ = await asyncio.wait(
+                    list(pending), timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    # The primary is slower than usual: fire a hedged duplicate
+                    logger.info(f"Hedging request to {chain[next_index]} after {wait_timeout:.2f}s")
+                    self._hedges += 1
+                    hedge_delay = None
+                    launch()
+                    continue
+
+                for task in done:
+                    model = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if model != chain[0]:
+                            self._fallback_answers += 1
+                        return model, task.result()
+
+                    last_error = error
+                    if self._is_retryable_error(error) and next_index < len(chain) and not pending:
+                        logger.warning(f"Model {model} failed ({error}), failing over to {chain[next_index]}")
+                        self._failovers += 1
+                        hedge_delay = None
+                        launch()
+
+            raise last_error
+        finally:
+            # Cancel the losing requests
+            for task in pending:
+                task.cancel()
+
+    def get_routing_stats(self) -> Dict[str, Any]:
+        """
+        Get model routing statistics
+
+        Returns:
+            Dictionary with fallback chain, hedging counters and per-model latencies
+        """
+        return {
+            "fallback_models": self.fallback_models,
+            "hedging_enabled": settings.OPENROUTER_HEDGE_ENABLED,
+            "hedges": self._hedges,
+            "failovers": self._failovers,
+            "retries": self._retries,
+            "json_repairs": dict(self._json_repairs),
+            "output_schema_modes": dict(self._schema_modes),
+            "fallback_answers": self._fallback_answers,
+            "prompt_cache": self.get_prompt_cache_stats(),
+            "latency": self.latency_tracker.get_stats(),
+        }
+
+    def _apply_output_schema(self, payload: Dict[str, Any], output_schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Ask the payload's model for output following a JSON schema
+
+        Models with structured output support get the schema as a json_schema
+        response format; for the others it is appended to the prompt.
+
+        Args:
+            payload: Request payload for one model
+            output_schema: JSON schema the output must follow
+
+        Returns:
+            Payload requesting the schema
+        """
+        if not output_schema:
+            return payload
+
+        if get_model_capabilities(payload["model"]).structured_outputs:
+            self._schema_modes["response_format"] = self._schema_modes.get("response_format", 0) + 1
+            return {
+                **payload,
+                "response_format": {
+                    "type": "json_schema",
+                    "json_schema": {"name": "extraction", "strict": False, "schema": output_schema},
+                },
+            }
+
+        self._schema_modes["prompt"] = self._schema_modes.get("prompt", 0) + 1
+        messages = [dict(message) for message in payload["messages"]]
+        content = list(messages[-1]["content"])
+        content[0] = {**content[0], "text": content[0]["text"] + build_schema_instruction(output_schema)}
+        messages[-1]["content"] = content
+        return {**payload, "messages": messages}
+
+    @staticmethod
+    def _apply_cache_control(payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Mark the system prompt as cacheable for models that need explicit cache breakpoints
+
+        Args:
+            payload: Request payload for one model
+
+        Returns:
+            Payload with a cache breakpoint after the system prompt, if the model needs one
+        """
+        messages = payload["messages"]
+        if messages[0]["role"] != "system" or not get_model_capabilities(payload["model"]).cache_control:
+            return payload
+
+        system = {"type": "text", "text": messages[0]["content"], "cache_control": {"type": "ephemeral"}}
+        return {**payload, "messages": [{"role": "system", "content": [system]}, *messages[1:]]}
+
+    @staticmethod
+    def _build_messages(system_prompt: Optional[str], content: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Build the messages of a request: the static system prompt first, so providers can cache it"""
+        messages: List[Dict[str, Any]] = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": content})
+        return messages
+
+    @staticmethod
+    def _image_content(image_data: bytes) -> Dict[str, Any]:
+        """Build the message content part carrying an image"""
+        base64_image = base64.b64encode(image_data).decode("utf-8")
+        mime_type = get_image_mime_type(image_data)
+        return {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{base64_image}"}}
+
+    def _parse_content(self, content: str) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Parse the JSON content of a completion
+
+        Args:
+            content: Completion text
+
+        Returns:
+            Parsed data and the repairs that were needed to parse it
+        """
+        extraction = extract_json(content)
+        if extraction is None or not isinstance(extraction.value, dict):
+            logger.warning("Response is not valid JSON, returning raw content")
+            return {"raw_content": content}, []
+
+        if extraction.repairs:
+            logger.warning(f"Repaired JSON in model response: {', '.join(extraction.repairs)}")
+            for repair in extraction.repairs:
+                self._json_repairs[repair] = self._json_repairs.get(repair, 0) + 1
+
+        return extraction.value, extraction.repairs
+
+    async def extract_image(
         self,
         image_data: bytes,
         prompt: str,
         model: Optional[str] = None,
         max_tokens: int = 1000,
-    ) -> Dict[str, Any]:
+        preprocessed: bool = False,
+        on_partial: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        deadline: Optional[float] = None,
+        output_schema: Optional[Dict[str, Any]] = None,
+        system_prompt: Optional[str] = None,
+    ) -> "ExtractionResult":
         """
-        Process an image with a multimodal LLM
+        Extract data from an image with a multimodal LLM
 
         Args:
             image_data: Raw image bytes
             prompt: Text prompt describing what to extract from the image
             model: Model to use (defaults to settings.OPENROUTER_MODEL)
             max_tokens: Maximum tokens to generate
+            preprocessed: Whether image_data was already returned by prepare_image
+            on_partial: If given, stream the completion and call this with
+                snapshots of the fields completed so far
+            deadline: Monotonic time by which retries must be finished
+            output_schema: JSON schema the output must follow; sent as a
+                json_schema response format to models that support it and
+                added to the prompt for the others
+            system_prompt: Static instructions sent before the prompt as a
+                system message, so providers can cache them
 
         Returns:
-            Dictionary with the model's response
+            Extraction result with the parsed data and the model that answered
         """
-        # Encode image to base64
-        try:
-            # Validate and potentially resize the image
-            img = Image.open(BytesIO(image_data))
-
-            # Convert to RGB if needed (e.g., for PNG with transparency)
-            if img.mode != "RGB":
-                img = img.convert("RGB")
-
-            # Resize if too large (many models have size limits)
-            max_dimension = 2000  # Example limit
-            if max(img.size) > max_dimension:
-                ratio = max_dimension / max(img.size)
-                new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
-                img = img.resize(new_size, Image.LANCZOS)
-
-            # Convert back to bytes in memory
-            buffer = BytesIO()
-            img.save(buffer, format="JPEG", quality=85)
-            processed_image_data = buffer.getvalue()
-
-            # Encode to base64
-            base64_image = base64.b64encode(processed_image_data).decode("utf-8")
-        except Exception as e:
-            logger.error(f"Error processing image: {e}")
-            raise ValueError(f"Invalid image data: {e}")
+        model = model or self.default_model
+
+        if not preprocessed:
+            image_data = await self.prepare_image(image_data, model)
 
         # Prepare the message with the image
-        messages = [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                ]
-            }
-        ]
+        messages = self._build_messages(system_prompt, [
+            {"type": "text", "text": prompt},
+            self._image_content(image_data),
+        ])
 
         # Prepare the payload
         payload = {
-            #"model": model or self.default_model,
-            "model": self.default_model,
+            "model": model,
             "messages": messages,
             "max_tokens": max_tokens,
             "response_format": {"type": "json_object"}
         }
 
+        if on_partial is None:
+            async def send(attempt_payload: Dict[str, Any]) -> Dict[str, Any]:
+                attempt_payload = self._apply_cache_control(self._apply_output_schema(attempt_payload, output_schema))
+                return await self._make_request("chat/completions", attempt_payload, deadline=deadline)
+        else:
+            async def send(attempt_payload: Dict[str, Any]) -> Dict[str, Any]:
+                attempt_payload = self._apply_cache_control(self._apply_output_schema(attempt_payload, output_schema))
+
+                # Each attempt parses its own stream
+                parser = IncrementalJSONParser()
+                last_published = 0.0
+
+                async def on_content(delta: str) -> None:
+                    nonlocal last_published
+                    parser.feed(delta)
+                    now = time.monotonic()
+                    if parser.has_new_data and now - last_published >= settings.STREAM_PUBLISH_INTERVAL:
+                        partial = parser.snapshot()
+                        if isinstance(partial, dict):
+                            last_published = now
+                            await on_partial(partial)
+
+                return await self._stream_request("chat/completions", attempt_payload, on_content, deadline=deadline)
+
         # Make the request
         try:
-            logger.info(f"Sending request to OpenRouter with model: {model or self.default_model}")
-            response = await self._make_request("chat/completions", payload)
+            logger.info(f"Sending request to OpenRouter with model: {model}")
+            # Streams cannot be hedged: two streams would interleave partial results
+            model_used, response = await self._complete(payload, send, hedge=on_partial is None)
 
             # Extract the content from the response
             if "choices" in response and len(response["choices"]) > 0:
                 content = response["choices"][0]["message"]["content"]
-
-                # Try to parse as JSON
-                try:
-                    return json.loads(content)
-                except json.JSONDecodeError:
-                    # Check if content is wrapped in markdown code block
-                    if content.startswith("```json\n") and content.endswith("\n```"):
-                        # Extract JSON from markdown code block
-                        json_content = content[8:-4]  # Remove ```json\n and \n```
-                        try:
-                            logger.info("Extracting JSON from markdown code block")
-                            return json.loads(json_content)
-                        except json.JSONDecodeError:
-                            logger.warning("Failed to parse JSON from markdown code block")
-
-                    # If we reach here, either it's not a markdown code block or parsing failed
-                    logger.warning("Response is not valid JSON, returning raw content")
-                    return {"raw_content": content}
+                data, repairs = self._parse_content(content)
+                return ExtractionResult(
+                    data=data,
+                    model=model_used,
+                    usage=response.get("usage"),
+                    repairs=repairs,
+                )
 
             logger.error(f"Unexpected response format from OpenRouter: {response}")
             raise ValueError("Unexpected response format from OpenRouter")
@@ -146,5 +882,116 @@ class OpenRouterClient:
             logger.error(f"Error processing image with OpenRouter: {e}")
             raise
 
+    async def extract_batch(
+        self,
+        images: List[bytes],
+        prompt: str,
+        model: Optional[str] = None,
+        max_tokens: int = 1000,
+        deadline: Optional[float] = None,
+        output_schema: Optional[Dict[str, Any]] = None,
+        system_prompt: Optional[str] = None,
+    ) -> List[Optional["ExtractionResult"]]:
+        """
+        Extract data from several documents with one multi-image request
+
+        Args:
+            images: Normalized image bytes, one per document
+            prompt: Text prompt describing what to extract from each image
+            model: Model to use (defaults to settings.OPENROUTER_MODEL)
+            max_tokens: Maximum tokens to generate per document
+            deadline: Monotonic time by which retries must be finished
+            output_schema: JSON schema each document's data must follow; always
+                added to the prompt, as the answer wraps the documents in a list
+            system_prompt: Static instructions sent before the prompt as a system message
+
+        Returns:
+            Extraction result per image, in order; None where the answer had no entry for the image
+        """
+        model = model or self.default_model
+
+        if output_schema:
+            prompt += build_schema_instruction(output_schema)
+
+        content: List[Dict[str, Any]] = [{"type": "text", "text": prompt + BATCH_INSTRUCTIONS.format(count=len(images))}]
+        for index, image_data in enumerate(images):
+            content.append({"type": "text", "text": f"Document {index}:"})
+            content.append(self._image_content(image_data))
+
+        payload = {
+            "model": model,
+            "messages": self._build_messages(system_prompt, content),
+            "max_tokens": max_tokens * len(images),
+            "response_format": {"type": "json_object"}
+        }
+
+        async def send(attempt_payload: Dict[str, Any]) -> Dict[str, Any]:
+            attempt_payload = self._apply_cache_control(attempt_payload)
+            return await self._make_request("chat/completions", attempt_payload, deadline=deadline)
+
+        logger.info(f"Sending batch of {len(images)} documents to OpenRouter with model: {model}")
+        model_used, response = await self._complete(payload, send)
+
+        if not response.get("choices"):
+            logger.error(f"Unexpected response format from OpenRouter: {response}")
+            raise ValueError("Unexpected response format from OpenRouter")
+
+        data, repairs = self._parse_content(response["choices"][0]["message"]["content"])
+        entries = data.get("results")
+        results: List[Optional[ExtractionResult]] = [None] * len(images)
+        if not isinstance(entries, list):
+            logger.warning("Batch response has no results array")
+            return results
+
+        usage = response.get("usage")
+        for position, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                continue
+            index = entry.get("index", position)
+            entry_data = entry.get("data")
+            if isinstance(index, int) and 0 <= index < len(images) and isinstance(entry_data, dict):
+                results[index] = ExtractionResult(
+                    data=entry_data,
+                    model=model_used,
+                    usage={**usage, "batch_size": len(images)} if usage else None,
+                    repairs=repairs,
+                )
+
+        return results
+
+    async def process_image(
+        self,
+        image_data: bytes,
+        prompt: str,
+        model: Optional[str] = None,
+        max_tokens: int = 1000,
+        preprocessed: bool = False,
+        on_partial: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Process an image with a multimodal LLM
+
+        Args:
+            image_data: Raw image bytes
+            prompt: Text prompt describing what to extract from the image
+            model: Model to use (defaults to settings.OPENROUTER_MODEL)
+            max_tokens: Maximum tokens to generate
+            preprocessed: Whether image_data was already returned by prepare_image
+            on_partial: If given, stream the completion and call this with
+                snapshots of the fields completed so far
+
+        Returns:
+            Dictionary with the model's response
+        """
+        result = await self.extract_image(
+            image_data=image_data,
+            prompt=prompt,
+            model=model,
+            max_tokens=max_tokens,
+            preprocessed=preprocessed,
+            on_partial=on_partial,
+        )
+        return result.data
+
 # Create a singleton instance
 openrouter_client = OpenRouterClient()
@@ -0,0 +1,208 @@
+"""
+Multi-page PDF support: lazy page rasterization, concurrent extraction and result merging
+"""
+import asyncio
+import threading
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from loguru import logger
+
+from jaison.ocr_api.config.settings import settings
+from jaison.ocr_api.services.image_processor import image_processor, encode_image
+from jaison.ocr_api.services.image_profiles import ImageProfile
+
+# pdfium is not thread-safe; this only matters when workers are threads (IMAGE_WORKERS=0)
+_pdfium_lock = threading.Lock()
+
+
+def is_pdf(data: bytes) -> bool:
+    """
+    Check whether file content is a PDF document
+
+    Args:
+        data: File content
+
+    Returns:
+        True if the content starts with the PDF signature
+    """
+    return data[:1024].lstrip().startswith(b"%PDF")
+
+
+def _open_pdf(pdf_data: bytes):
+    """Open a PDF document with pdfium"""
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        raise ValueError("PDF support requires the 'pypdfium2' package")
+
+    return pdfium.PdfDocument(pdf_data)
+
+
+def count_pdf_pages(pdf_data: bytes) -> int:
+    """
+    Count the pages of a PDF document
+
+    Runs in a worker process, so it must stay a module-level function.
+
+    Args:
+        pdf_data: PDF file content
+
+    Returns:
+        Number of pages
+    """
+    with _pdfium_lock:
+        document = _open_pdf(pdf_data)
+        try:
+            return len(document)
+        finally:
+            document.close()
+
+
+def get_render_scale(page_size: tuple, profile: ImageProfile) -> float:
+    """
+    Get the pdfium render scale (DPI / 72) a page needs for a profile
+
+    Pages are rendered straight at the model's effective resolution instead of
+    at a fixed DPI and downscaled afterwards.
+
+    Args:
+        page_size: Page (width, height) in points
+        profile: Image profile of the target model
+
+    Returns:
+        Render scale
+    """
+    scale = profile.max_long_edge / max(page_size)
+    if profile.max_short_edge:
+        scale = min(scale, profile.max_short_edge / min(page_size))
+
+    return min(max(scale, settings.PDF_MIN_DPI / 72), settings.PDF_MAX_DPI / 72)
+
+
+def render_pdf_page(pdf_data: bytes, page_index: int, profile: ImageProfile) -> bytes:
+    """
+    Rasterize and encode a single PDF page
+
+    Runs in a worker process, so it must stay a module-level function.
+
+    Args:
+        pdf_data: PDF file content
+        page_index: Zero-based page index
+        profile: Image profile of the target model
+
+    Returns:
+        Encoded page image
+    """
+    with _pdfium_lock:
+        document = _open_pdf(pdf_data)
+        try:
+            page = document[page_index]
+            try:
+                scale = get_render_scale(page.get_size(), profile)
+                img = page.render(scale=scale).to_pil()
+            finally:
+                page.close()
+        finally:
+            document.close()
+
+    return encode_image(img, profile)
+
+
+def merge_page_results(results: List[Any]) -> Any:
+    """
+    Merge per-page extraction results into one result
+
+    Objects are merged key by key, lists are concatenated in page order and
+    for other values the first non-null page wins.
+
+    Args:
+        results: Page results in page order
+
+    Returns:
+        Merged result
+    """
+    merged = None
+    for result in results:
+        if merged is None:
+            merged = result
+        elif isinstance(merged, dict) and isinstance(result, dict):
+            merged = dict(merged)
+            for key, value in result.items():
+                merged[key] = merge_page_results([merged[key], value]) if key in merged else value
+        elif isinstance(merged, list) and isinstance(result, list):
+            merged = merged + result
+    return merged
+
+
+class PDFProcessor:
+    """Extracts data from multi-page PDF documents page by page"""
+
+    def __init__(self):
+        """Initialize PDF processor"""
+        self.page_concurrency = settings.PDF_PAGE_CONCURRENCY
+        self.max_pages = settings.PDF_MAX_PAGES
+
+    async def extract(
+        self,
+        pdf_data: bytes,
+        profile: ImageProfile,
+        extract_page: Callable[[bytes], Awaitable[Dict[str, Any]]],
+        on_progress: Optional[Callable[[int, int, Dict[str, Any]], Awaitable[None]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Extract data from every page of a PDF document
+
+        Pages are only rasterized when a concurrency slot frees up, so at most
+        page_concurrency page images are held in memory at once.
+
+        Args:
+            pdf_data: PDF file content
+            profile: Image profile of the target model
+            extract_page: Sends one encoded page image to the model
+            on_progress: Called with (pages done, pages total, merged result so far)
+
+        Returns:
+            Merged result of all pages
+        """
+        try:
+            page_count = await image_processor.run(count_pdf_pages, pdf_data)
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Error reading PDF: {e}")
+            raise ValueError(f"Invalid PDF data: {e}")
+
+        if page_count == 0:
+            raise ValueError("PDF document has no pages")
+        if page_count > self.max_pages:
+            raise ValueError(f"PDF document has {page_count} pages. Maximum pages: {self.max_pages}")
+
+        logger.info(f"Extracting {page_count} PDF pages, {self.page_concurrency} at a time")
+
+        semaphore = asyncio.Semaphore(self.page_concurrency)
+        page_results: List[Optional[Dict[str, Any]]] = [None] * page_count
+        pages_done = 0
+
+        async def process_page(page_index: int) -> None:
+            nonlocal pages_done
+            async with semaphore:
+                page_image = await image_processor.run(render_pdf_page, pdf_data, page_index, profile)
+                page_results[page_index] = await extract_page(page_image)
+
+            pages_done += 1
+            if on_progress is not None:
+                done_results = [result for result in page_results if result is not None]
+                await on_progress(pages_done, page_count, merge_page_results(done_results))
+
+        tasks = [asyncio.ensure_future(process_page(page_index)) for page_index in range(page_count)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # One failed page fails the document; stop the remaining pages
+            for task in tasks:
+                task.cancel()
+            raise
+
+        return merge_page_results(page_results)
+
+# Create a singleton instance
+pdf_processor = PDFProcessor()
@@ -0,0 +1,228 @@
+"""
+Perceptual hash index for finding near-duplicate documents
+"""
+import json
+import time
+import hashlib
+from collections import deque
+from typing import Deque, Dict, Any, List, Optional, Tuple
+
+from jaison.ocr_api.config.settings import settings
+
+
+class _ScopeIndex:
+    """Multi-index hash table over the hashes of one scope"""
+
+    def __init__(self, bands: List[Tuple[int, int]]):
+        """
+        Initialize scope index
+
+        Args:
+            bands: (shift, mask) of each band the hash is split into
+        """
+        self.bands = bands
+        self.values: Dict[int, Any] = {}
+        self.tables: List[Dict[int, List[int]]] = [{} for _ in bands]
+
+    def add(self, image_hash: int, value: Any) -> None:
+        """Add a hash, replacing the value of an identical hash"""
+        if image_hash not in self.values:
+            for table, (shift, mask) in zip(self.tables, self.bands):
+                table.setdefault((image_hash >> shift) & mask, []).append(image_hash)
+        self.values[image_hash] = value
+
+    def remove(self, image_hash: int) -> None:
+        """Remove a hash"""
+        if self.values.pop(image_hash, None) is None:
+            return
+        for table, (shift, mask) in zip(self.tables, self.bands):
+            band = (image_hash >> shift) & mask
+            bucket = table[band]
+            bucket.remove(image_hash)
+            if not bucket:
+                del table[band]
+
+    def find(self, image_hash: int, max_distance: int) -> List[Tuple[int, Any]]:
+        """Find the hashes within max_distance bits, closest first"""
+        matches: Dict[int, int] = {}
+        for table, (shift, mask) in zip(self.tables, self.bands):
+            for candidate in table.get((image_hash >> shift) & mask, ()):
+                if candidate not in matches:
+                    distance = bin(candidate ^ image_hash).count("1")
+                    if distance <= max_distance:
+                        matches[candidate] = distance
+        return sorted(
+            ((distance, self.values[candidate]) for candidate, distance in matches.items()),
+            key=lambda match: match[0],
+        )
+
+
+class PerceptualHashIndex:
+    """
+    Index of perceptual hashes of previously extracted documents
+
+    Lookups use multi-index hashing: the hash is split into max_distance + 1
+    bands, and any hash within max_distance bits must match at least one band
+    exactly (pigeonhole principle). Only the few hashes sharing a band are
+    compared bit by bit.
+
+    A hash match is only a candidate: documents printed from the same template
+    hash alike, so callers verify a candidate's pixels before reusing its result.
+    """
+
+    def __init__(self, hash_bits: int = 256, max_distance: Optional[int] = None, max_entries: Optional[int] = None):
+        """
+        Initialize perceptual hash index
+
+        Args:
+            hash_bits: Bits per hash
+            max_distance: Largest Hamming distance counted as a near-duplicate
+            max_entries: Maximum hashes kept; the oldest are evicted first
+        """
+        self.enabled = settings.PHASH_ENABLED
+        self.hash_bits = hash_bits
+        self.max_distance = settings.PHASH_MAX_DISTANCE if max_distance is None else max_distance
+        self.max_entries = settings.PHASH_MAX_ENTRIES if max_entries is None else max_entries
+        self.max_candidates = settings.PHASH_MAX_CANDIDATES
+        self.verify_tolerance = settings.PHASH_VERIFY_TOLERANCE
+
+        # Split the hash bits as evenly as possible over max_distance + 1 bands
+        band_count = self.max_distance + 1
+        self._bands: List[Tuple[int, int]] = []
+        shift = 0
+        for band in range(band_count):
+            width = hash_bits // band_count + (1 if band < hash_bits % band_count else 0)
+            self._bands.append((shift, (1 << width) - 1))
+            shift += width
+
+        self._scopes: Dict[str, _ScopeIndex] = {}
+        self._order: Deque[Tuple[str, int]] = deque()
+
+        # Statistics
+        self._lookups = 0
+        self._hits = 0
+        self._rejected = 0
+        self._lookup_seconds = 0.0
+
+    @staticmethod
+    def make_scope(
+        api_key_id: str,
+        document_type: str,
+        prompt: str,
+        model: str,
+        output_schema: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """
+        Build the scope near-duplicates are looked up in
+
+        Results are only shared within one API key and document type, and only
+        between requests with the same prompt, model and output schema.
+
+        Args:
+            api_key_id: API key of the request
+            document_type: Document type of the request
+            prompt: Final prompt
+            model: Model name
+            output_schema: JSON schema sent alongside the prompt, if any
+
+        Returns:
+            Scope key
+        """
+        schema = json.dumps(output_schema, sort_keys=True) if output_schema is not None else ""
+        digest = hashlib.sha256(f"{prompt}\0{model}\0{schema}".encode("utf-8")).hexdigest()[:16]
+        return f"{api_key_id}:{document_type}:{digest}"
+
+    def add(self, scope: str, image_hash: int, value: Any) -> None:
+        """
+        Add the hash of an extracted document
+
+        Args:
+            scope: Scope from make_scope
+            image_hash: Perceptual hash of the document
+            value: Value returned for near-duplicates (e.g. a result cache key and verification pixels)
+        """
+        index = self._scopes.get(scope)
+        if index is None:
+            index = self._scopes[scope] = _ScopeIndex(self._bands)
+
+        if image_hash not in index.values:
+            self._order.append((scope, image_hash))
+        index.add(image_hash, value)
+
+        while len(self._order) > self.max_entries:
+            old_scope, old_hash = self._order.popleft()
+            old_index = self._scopes[old_scope]
+            old_index.remove(old_hash)
+            if not old_index.values:
+                del self._scopes[old_scope]
+
+    def candidates(self, scope: str, image_hash: int) -> List[Any]:
+        """
+        Find the values of the closest near-duplicate candidates
+
+        Args:
+            scope: Scope from make_scope
+            image_hash: Perceptual hash of the document
+
+        Returns:
+            Values of up to max_candidates hashes within max_distance bits, closest first
+        """
+        start = time.perf_counter()
+        index = self._scopes.get(scope)
+        matches = index.find(image_hash, self.max_distance) if index is not None else []
+
+        self._lookups += 1
+        self._lookup_seconds += time.perf_counter() - start
+        return [value for _, value in matches[:self.max_candidates]]
+
+    def find(self, scope: str, image_hash: int) -> Optional[Any]:
+        """
+        Find the value of the closest near-duplicate candidate
+
+        Args:
+            scope: Scope from make_scope
+            image_hash: Perceptual hash of the document
+
+        Returns:
+            Value of the closest hash within max_distance bits, or None
+        """
+        candidates = self.candidates(scope, image_hash)
+        return candidates[0] if candidates else None
+
+    def record_verification(self, matched: bool) -> None:
+        """
+        Record the outcome of verifying a candidate
+
+        Args:
+            matched: Whether the candidate was confirmed and its result reused
+        """
+        if matched:
+            self._hits += 1
+        else:
+            self._rejected += 1
+
+    def __len__(self) -> int:
+        """Number of hashes in the index"""
+        return len(self._order)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get index statistics
+
+        Returns:
+            Dictionary with size, lookups, verified hits, rejected candidates and mean lookup time
+        """
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._order),
+            "scopes": len(self._scopes),
+            "max_distance": self.max_distance,
+            "lookups": self._lookups,
+            "hits": self._hits,
+            "rejected": self._rejected,
+            "hit_ratio": self._hits / self._lookups if self._lookups else 0.0,
+            "mean_lookup_us": self._lookup_seconds / self._lookups * 1_000_000 if self._lookups else 0.0,
+        }
+
+# Create a singleton instance
+phash_index = PerceptualHashIndex()
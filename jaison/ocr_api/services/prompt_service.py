@@ -1,12 +1,102 @@
 """
 Service for managing and generating prompts
 """
-from typing import Dict, Any, Optional, List
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, NamedTuple
 import json
+import hashlib
 from loguru import logger
 
 from jaison.ocr_api.api.models import DocumentType, PromptTemplate
 
+# Request-specific part of the prompt, sent after the template's instructions
+USER_MESSAGE_TEMPLATE = """Additional user instructions: {user_prompt}
+{output_schema_instruction}"""
+
+
+class GeneratedPrompt(NamedTuple):
+    """Prompt split into a static prefix and the request-specific instructions"""
+    system: Optional[str]  # Template instructions, identical for every request of a document type
+    user: str
+
+
+# Schema keywords that only matter to validators, left out of prompts
+SCHEMA_METADATA_KEYS = ("$schema", "$id", "$comment")
+
+# Rendered schema instructions kept, by schema content
+SCHEMA_INSTRUCTION_CACHE_SIZE = 256
+
+# Characters per token of English text and JSON, for prompt size estimates
+CHARS_PER_TOKEN = 4
+
+_schema_instructions: "OrderedDict[str, str]" = OrderedDict()
+_schema_instruction_stats = {"hits": 0, "misses": 0}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text
+
+    Args:
+        text: Prompt text
+
+    Returns:
+        Estimated token count
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def serialize_schema(output_schema: Dict[str, Any]) -> str:
+    """
+    Serialize a JSON schema for a prompt in as few tokens as possible
+
+    Args:
+        output_schema: JSON schema
+
+    Returns:
+        JSON without whitespace or validator metadata
+    """
+    def strip(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {key: strip(item) for key, item in value.items() if key not in SCHEMA_METADATA_KEYS}
+        if isinstance(value, list):
+            return [strip(item) for item in value]
+        return value
+
+    return json.dumps(strip(output_schema), separators=(",", ":"), ensure_ascii=False)
+
+
+def build_schema_instruction(output_schema: Dict[str, Any]) -> str:
+    """
+    Build the prompt instruction asking for output that follows a JSON schema
+
+    Instructions are kept in an LRU keyed by a digest of the schema's
+    content, so every request sending the same schema reuses one rendering.
+
+    Args:
+        output_schema: JSON schema for structuring the output
+
+    Returns:
+        Instruction text
+    """
+    key = hashlib.sha256(json.dumps(output_schema, sort_keys=True).encode("utf-8")).hexdigest()
+    instruction = _schema_instructions.get(key)
+    if instruction is not None:
+        _schema_instructions.move_to_end(key)
+        _schema_instruction_stats["hits"] += 1
+        return instruction
+
+    _schema_instruction_stats["misses"] += 1
+    instruction = f"""
+Use this JSON schema for the output and follow it strictly:
+{serialize_schema(output_schema)}
+"""
+    _schema_instructions[key] = instruction
+    _schema_instructions.move_to_end(key)
+    while len(_schema_instructions) > SCHEMA_INSTRUCTION_CACHE_SIZE:
+        _schema_instructions.popitem(last=False)
+    return instruction
+
 
 class PromptService:
     """Service for managing and generating prompts"""
@@ -15,6 +105,9 @@ class PromptService:
         """Initialize prompt service with default templates"""
         self.templates: Dict[DocumentType, PromptTemplate] = self._initialize_default_templates()
 
+        # Estimated prompt tokens per document type
+        self._prompt_sizes: Dict[str, Dict[str, int]] = {}
+
     def _initialize_default_templates(self) -> Dict[DocumentType, PromptTemplate]:
         """Initialize default prompt templates for each document type"""
         templates = {}
@@ -43,17 +136,14 @@ Extract the following information from the receipt image:
 10. Store address (if available)
 11. Store phone number (if available)
 
-Additional user instructions: {user_prompt}
-
 Format the output as a clean, structured JSON object with appropriate fields.
 If a piece of information is not found in the receipt, use null for that field.
 For the items list, create an array of objects with appropriate fields.
-
-{output_schema_instruction}
 """,
             description="Default template for extracting information from receipts",
             is_default=True,
-            parameters=["user_prompt", "output_schema_instruction"],
+            expected_fields=["merchant|store|vendor", "date", "total"],
+            max_tokens=800,
         )
 
         # Invoice template
@@ -82,17 +172,14 @@ Extract the following information from the invoice image:
 12. Shipping/handling fees (if applicable)
 13. Payment instructions (if available)
 
-Additional user instructions: {user_prompt}
-
 Format the output as a clean, structured JSON object with appropriate fields.
 If a piece of information is not found in the invoice, use null for that field.
 For the items list, create an array of objects with appropriate fields.
-
-{output_schema_instruction}
 """,
             description="Default template for extracting information from invoices",
             is_default=True,
-            parameters=["user_prompt", "output_schema_instruction"],
+            expected_fields=["vendor|company|seller|supplier", "invoice_number|invoice_no|invoice_id", "total"],
+            max_tokens=2000,
         )
 
         # ID Card template
@@ -114,19 +201,16 @@ Extract the following information from the ID card image:
 9. Document type (e.g., national ID, driver's license)
 10. Issuing authority
 
-Additional user instructions: {user_prompt}
-
 Format the output as a clean, structured JSON object with appropriate fields.
 If a piece of information is not found in the ID card, use null for that field.
 
 IMPORTANT: If this is a real ID card, DO NOT include any sensitive personal information in the response.
 Instead, replace actual values with placeholders like "REDACTED" while keeping the structure intact.
-
-{output_schema_instruction}
 """,
             description="Default template for extracting information from ID cards",
             is_default=True,
-            parameters=["user_prompt", "output_schema_instruction"],
+            expected_fields=["name", "number"],
+            max_tokens=500,
         )
 
         # Business Card template
@@ -148,17 +232,14 @@ Extract the following information from the business card image:
 9. Company logo description (if visible)
 10. Any additional information or services mentioned
 
-Additional user instructions: {user_prompt}
-
 Format the output as a clean, structured JSON object with appropriate fields.
 If a piece of information is not found in the business card, use null for that field.
 For multiple phone numbers, create an array with labeled types (e.g., mobile, office, fax).
-
-{output_schema_instruction}
 """,
             description="Default template for extracting information from business cards",
             is_default=True,
-            parameters=["user_prompt", "output_schema_instruction"],
+            expected_fields=["name", "email|phone"],
+            max_tokens=400,
         )
 
         # Ticket template
@@ -181,16 +262,13 @@ Extract the following information from the ticket image:
 10. Barcode/QR code presence (yes/no)
 11. Additional information (restrictions, policies, etc.)
 
-Additional user instructions: {user_prompt}
-
 Format the output as a clean, structured JSON object with appropriate fields.
 If a piece of information is not found in the ticket, use null for that field.
-
-{output_schema_instruction}
 """,
             description="Default template for extracting information from tickets",
             is_default=True,
-            parameters=["user_prompt", "output_schema_instruction"],
+            expected_fields=["event", "date"],
+            max_tokens=500,
         )
 
         # Coupon template
@@ -212,16 +290,13 @@ Extract the following information from the coupon image:
 9. Barcode/QR code presence (yes/no)
 10. Store location(s) where valid (if specified)
 
-Additional user instructions: {user_prompt}
-
 Format the output as a clean, structured JSON object with appropriate fields.
 If a piece of information is not found in the coupon, use null for that field.
-
-{output_schema_instruction}
 """,
             description="Default template for extracting information from discount coupons",
             is_default=True,
-            parameters=["user_prompt", "output_schema_instruction"],
+            expected_fields=["discount|offer", "expir|valid"],
+            max_tokens=400,
         )
 
         # Generic template
@@ -241,17 +316,13 @@ Extract the following information from the document image:
 7. Any numerical values with their context
 8. Any important notes, terms, or conditions
 
-Additional user instructions: {user_prompt}
-
 Format the output as a clean, structured JSON object with appropriate fields.
 If a piece of information is not found in the document, use null for that field.
 For tables, create arrays of objects with appropriate fields.
-
-{output_schema_instruction}
 """,
             description="Default template for extracting information from generic documents",
             is_default=True,
-            parameters=["user_prompt", "output_schema_instruction"],
+            max_tokens=1500,
         )
 
         return templates
@@ -261,42 +332,127 @@ For tables, create arrays of objects with appropriate fields.
         document_type: DocumentType,
         user_prompt: str,
         output_schema: Optional[Dict[str, Any]] = None,
-    ) -> str:
+        embed_schema: bool = True,
+    ) -> GeneratedPrompt:
         """
         Generate a prompt for the given document type and user prompt
 
+        The template's instructions become the system prompt, which is the
+        same for every request of a document type and can be cached by the
+        provider; the user's instructions and the schema follow in the user
+        message. Templates with placeholders are formatted into the user
+        message as a whole.
+
         Args:
             document_type: Type of document
             user_prompt: User's instructions for extraction
             output_schema: Optional JSON schema for structuring the output
+            embed_schema: Whether to paste the schema into the prompt; pass False
+                when the schema is sent to the model as a response format
 
         Returns:
-            Generated prompt
+            Generated system prompt and user message
         """
         # Get template for document type
         template = self.templates.get(document_type, self.templates[DocumentType.GENERIC])
 
         # Generate output schema instruction
         output_schema_instruction = ""
-        if output_schema:
-            output_schema_instruction = f"""
-Use the following JSON schema for the output:
-```json
-{json.dumps(output_schema, indent=2)}
-```
-Ensure that your response strictly follows this schema.
-"""
+        if output_schema and embed_schema:
+            output_schema_instruction = build_schema_instruction(output_schema)
 
-        # Format template with parameters
-        prompt = template.template.format(
-            user_prompt=user_prompt,
-            output_schema_instruction=output_schema_instruction,
-        )
+        parameters = {"user_prompt": user_prompt, "output_schema_instruction": output_schema_instruction}
+        if template.parameters:
+            prompt = GeneratedPrompt(system=None, user=template.template.format(**parameters))
+        else:
+            prompt = GeneratedPrompt(system=template.template, user=USER_MESSAGE_TEMPLATE.format(**parameters))
 
-        logger.debug(f"Generated prompt for {document_type}: {prompt[:100]}...")
+        self._record_prompt_size(document_type, prompt, output_schema_instruction)
 
         return prompt
 
+    def _record_prompt_size(
+        self,
+        document_type: DocumentType,
+        prompt: GeneratedPrompt,
+        schema_instruction: str,
+    ) -> None:
+        """Log and count the estimated token size of a generated prompt"""
+        system_tokens = estimate_tokens(prompt.system or "")
+        # Only a schema embedded in the prompt is counted; one sent as a response format is not part of it
+        schema_tokens = estimate_tokens(schema_instruction)
+        user_tokens = max(estimate_tokens(prompt.user) - schema_tokens, 0)
+
+        stats = self._prompt_sizes.setdefault(document_type.value, {
+            "prompts": 0,
+            "system_tokens": 0,
+            "user_tokens": 0,
+            "schema_tokens": 0,
+            "max_tokens": 0,
+        })
+        stats["prompts"] += 1
+        stats["system_tokens"] += system_tokens
+        stats["user_tokens"] += user_tokens
+        stats["schema_tokens"] += schema_tokens
+        stats["max_tokens"] = max(stats["max_tokens"], system_tokens + user_tokens + schema_tokens)
+
+        logger.debug(
+            f"Generated prompt for {document_type}: ~{system_tokens} system + {user_tokens} user "
+            f"+ {schema_tokens} schema tokens: {prompt.user[:100]}..."
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get prompt size statistics
+
+        Returns:
+            Dictionary with the mean estimated tokens of the prompt parts per
+            document type, and schema instruction cache counters
+        """
+        return {
+            "chars_per_token": CHARS_PER_TOKEN,
+            "document_types": {
+                document_type: {
+                    "prompts": stats["prompts"],
+                    "mean_system_tokens": stats["system_tokens"] / stats["prompts"],
+                    "mean_user_tokens": stats["user_tokens"] / stats["prompts"],
+                    "mean_schema_tokens": stats["schema_tokens"] / stats["prompts"],
+                    "max_tokens": stats["max_tokens"],
+                }
+                for document_type, stats in self._prompt_sizes.items()
+            },
+            "schema_instruction_cache": {
+                **_schema_instruction_stats,
+                "entries": len(_schema_instructions),
+            },
+        }
+
+    def get_expected_fields(self, document_type: DocumentType) -> List[str]:
+        """
+        Get the fields a result for the given document type is expected to contain
+
+        Args:
+            document_type: Type of document
+
+        Returns:
+            Expected fields of the document type's template
+        """
+        template = self.templates.get(document_type, self.templates[DocumentType.GENERIC])
+        return template.expected_fields
+
+    def get_max_tokens(self, document_type: DocumentType) -> int:
+        """
+        Get the default token budget of the output for the given document type
+
+        Args:
+            document_type: Type of document
+
+        Returns:
+            Maximum tokens to generate, before adjusting to previous extractions
+        """
+        template = self.templates.get(document_type, self.templates[DocumentType.GENERIC])
+        return template.max_tokens
+
     async def get_templates(self, document_type: Optional[DocumentType] = None) -> List[PromptTemplate]:
         """
         Get all templates or templates for a specific document type
@@ -0,0 +1,261 @@
+"""
+Content-addressed cache for extraction results
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import tempfile
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+import aiofiles
+from loguru import logger
+
+from jaison.ocr_api.config.settings import settings
+
+
+class ResultCache:
+    """Two-tier (memory LRU + disk) cache for extraction results"""
+
+    def __init__(self):
+        """Initialize result cache"""
+        self.enabled = settings.RESULT_CACHE_ENABLED
+        self.ttl = settings.RESULT_CACHE_TTL
+        self.max_memory_entries = settings.RESULT_CACHE_MAX_ENTRIES
+        self.max_disk_bytes = settings.RESULT_CACHE_MAX_DISK_BYTES
+        self.cache_dir = os.path.join(os.getcwd(), settings.RESULT_CACHE_DIR)
+
+        # Memory tier: key -> (expires_at, value), least recently used first
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+        # Disk tier index: key -> file size, least recently used first
+        self._disk_index: Optional["OrderedDict[str, int]"] = None
+        self._disk_bytes = 0
+
+        # Statistics
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    @staticmethod
+    def make_key(
+        image_data: bytes,
+        prompt: str,
+        model: str,
+        output_schema: Optional[Dict[str, Any]] = None,
+        system_prompt: Optional[str] = None,
+    ) -> str:
+        """
+        Build a cache key from the request content
+
+        Args:
+            image_data: Normalized image bytes sent to the model
+            prompt: Final prompt sent to the model
+            model: Model name
+            output_schema: JSON schema sent alongside the prompt, if any
+            system_prompt: System prompt sent before the prompt, if any
+
+        Returns:
+            Hex SHA-256 digest
+        """
+        parts = [image_data, prompt.encode("utf-8"), model.encode("utf-8")]
+        if output_schema is not None:
+            parts.append(json.dumps(output_schema, sort_keys=True).encode("utf-8"))
+        if system_prompt is not None:
+            parts.append(b"system:" + system_prompt.encode("utf-8"))
+
+        digest = hashlib.sha256()
+        for part in parts:
+            # Length-prefix each part so boundaries cannot be shifted
+            digest.update(len(part).to_bytes(8, "big"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _get_disk_path(self, key: str) -> str:
+        """Get the path of a disk tier entry"""
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _scan_disk_index(self) -> "OrderedDict[str, int]":
+        """Build the disk tier index from the cache directory, oldest entries first (blocking)"""
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for shard in os.scandir(self.cache_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(".json"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+
+        entries.sort()
+        return OrderedDict((key, size) for _, key, size in entries)
+
+    async def _load_disk_index(self) -> "OrderedDict[str, int]":
+        """Get the disk tier index, scanning the cache directory in a worker thread on first use"""
+        if self._disk_index is not None:
+            return self._disk_index
+
+        index = await asyncio.to_thread(self._scan_disk_index)
+        # Another caller may have finished loading while this one was scanning
+        if self._disk_index is None:
+            self._disk_index = index
+            self._disk_bytes = sum(index.values())
+            logger.debug(f"Loaded result cache index: {len(index)} entries, {self._disk_bytes} bytes")
+
+        return self._disk_index
+
+    async def start(self) -> None:
+        """Load the disk tier index (called on application startup)"""
+        if self.enabled:
+            await asyncio.to_thread(os.makedirs, self.cache_dir, exist_ok=True)
+            await self._load_disk_index()
+
+    def _remember(self, key: str, expires_at: float, value: Dict[str, Any]) -> None:
+        """Put an entry in the memory tier, evicting the least recently used"""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    @staticmethod
+    def _write_file(file_path: str, content: str) -> None:
+        """Write an entry to a temporary file and rename it into place (blocking)"""
+        directory = os.path.dirname(file_path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Each writer gets its own temporary file, so concurrent writes of a key
+        # (or writes from other worker processes) never replace a half-written one
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    @staticmethod
+    def _remove_file(file_path: str) -> None:
+        """Remove an entry file if it exists (blocking)"""
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+    async def _remove_disk_entry(self, key: str) -> None:
+        """Remove an entry from the disk tier"""
+        index = await self._load_disk_index()
+        size = index.pop(key, 0)
+        self._disk_bytes -= size
+
+        await asyncio.to_thread(self._remove_file, self._get_disk_path(key))
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached entry
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value if found and not expired, None otherwise
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+
+        # Memory tier
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self._memory_hits += 1
+                return value
+            del self._memory[key]
+
+        # Disk tier
+        index = await self._load_disk_index()
+        if key in index:
+            try:
+                async with aiofiles.open(self._get_disk_path(key), "r") as f:
+                    data = json.loads(await f.read())
+            except (OSError, ValueError) as e:
+                logger.warning(f"Dropping unreadable result cache entry {key}: {e}")
+                await self._remove_disk_entry(key)
+                data = None
+
+            if data is not None:
+                if data["expires_at"] > now:
+                    index.move_to_end(key)
+                    self._remember(key, data["expires_at"], data["value"])
+                    self._disk_hits += 1
+                    return data["value"]
+
+                self._expirations += 1
+                await self._remove_disk_entry(key)
+
+        self._misses += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        Store an entry in both tiers
+
+        Args:
+            key: Cache key
+            value: JSON-serializable value
+        """
+        if not self.enabled:
+            return
+
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, value)
+
+        # Write to a temporary file and rename so readers never see partial entries
+        content = json.dumps({"expires_at": expires_at, "value": value}, default=str)
+        await asyncio.to_thread(self._write_file, self._get_disk_path(key), content)
+
+        size = len(content.encode("utf-8"))
+        index = await self._load_disk_index()
+        self._disk_bytes += size - index.pop(key, 0)
+        index[key] = size
+
+        # Evict least recently used entries until the disk tier fits
+        while self._disk_bytes > self.max_disk_bytes and len(index) > 1:
+            oldest = next(iter(index))
+            await self._remove_disk_entry(oldest)
+            self._memory.pop(oldest, None)
+            self._evictions += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with tier sizes, hit counters and hit ratio
+        """
+        hits = self._memory_hits + self._disk_hits
+        lookups = hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self._disk_index) if self._disk_index is not None else None,
+            "disk_bytes": self._disk_bytes,
+            "memory_hits": self._memory_hits,
+            "disk_hits": self._disk_hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
+
+# Create a singleton instance
+result_cache = ResultCache()
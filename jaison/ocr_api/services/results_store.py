@@ -0,0 +1,198 @@
+"""
+Embedded store of processing responses
+"""
+import os
+import json
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional
+from loguru import logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS processing_responses (
+    request_id TEXT PRIMARY KEY,
+    user_id TEXT,
+    api_key_id TEXT,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    response TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_processing_responses_user ON processing_responses (user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_processing_responses_api_key ON processing_responses (api_key_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_processing_responses_status ON processing_responses (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_processing_responses_created ON processing_responses (created_at);
+"""
+
+
+def _column_value(value: Any) -> Optional[str]:
+    """Convert a response field to the text stored in its indexed column"""
+    if value is None:
+        return None
+    return str(getattr(value, "value", value))  # Enums are stored by value
+
+
+class ResultsStore:
+    """
+    Processing responses in an SQLite database
+
+    The database runs in WAL mode, so status polls read while a background task
+    writes, and every save is one transaction: a poll never sees a partial
+    response. Besides the request ID, responses are indexed by user, API key,
+    status and creation time. Methods block, up to busy_timeout while another
+    process holds the write lock, so async callers run them in a worker thread
+    (asyncio.to_thread); API workers in other processes share the file through
+    SQLite's locking.
+    """
+
+    def __init__(self, db_file: str):
+        """
+        Open the store, creating the database if needed
+
+        Args:
+            db_file: Path of the SQLite database file
+        """
+        directory = os.path.dirname(db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL with synchronous=NORMAL is durable across application crashes and only fsyncs on checkpoints
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+        logger.debug(f"Opened results store {db_file}")
+
+    def save(
+        self,
+        request_id: str,
+        response: Dict[str, Any],
+        user_id: Optional[str] = None,
+        api_key_id: Optional[str] = None,
+        replace: bool = True,
+    ) -> bool:
+        """
+        Insert or replace a processing response
+
+        Args:
+            request_id: Request ID
+            response: Response data
+            user_id: User the request belongs to (kept from the first save if omitted)
+            api_key_id: API key the request was made with (kept from the first save if omitted)
+            replace: Whether to replace a saved response, or keep it (used when importing old responses)
+
+        Returns:
+            True if the response was new, False if one was already saved
+        """
+        document = json.dumps(response, default=str)
+        status = _column_value(response.get("status")) or ""
+        updated_at = _column_value(response.get("updated_at")) or ""
+
+        row = (
+            request_id,
+            user_id,
+            api_key_id,
+            status,
+            _column_value(response.get("created_at")) or updated_at,
+            updated_at,
+            document,
+        )
+        insert = (
+            "INSERT{} INTO processing_responses"
+            " (request_id, user_id, api_key_id, status, created_at, updated_at, response)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)"
+        )
+
+        with self._lock, self._conn:
+            if not replace:
+                return self._conn.execute(insert.format(" OR IGNORE"), row).rowcount > 0
+
+            cursor = self._conn.execute(
+                "UPDATE processing_responses SET status = ?, updated_at = ?, response = ?,"
+                " user_id = COALESCE(?, user_id), api_key_id = COALESCE(?, api_key_id)"
+                " WHERE request_id = ?",
+                (status, updated_at, document, user_id, api_key_id, request_id),
+            )
+            if cursor.rowcount:
+                return False
+
+            self._conn.execute(insert.format(""), row)
+            return True
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a processing response
+
+        Args:
+            request_id: Request ID
+
+        Returns:
+            Response data if found, None otherwise
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM processing_responses WHERE request_id = ?", (request_id,)
+            ).fetchone()
+        return json.loads(row["response"]) if row else None
+
+    def delete(self, request_id: str) -> bool:
+        """
+        Delete a processing response
+
+        Args:
+            request_id: Request ID
+
+        Returns:
+            True if the response was deleted, False if it did not exist
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM processing_responses WHERE request_id = ?", (request_id,))
+        return cursor.rowcount > 0
+
+    def query(
+        self,
+        user_id: Optional[str] = None,
+        api_key_id: Optional[str] = None,
+        status: Optional[str] = None,
+        created_after: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """
+        Find processing responses, newest first
+
+        Args:
+            user_id: Only responses of this user
+            api_key_id: Only responses made with this API key
+            status: Only responses with this status
+            created_after: Only responses created after this timestamp (same format as created_at)
+            limit: Maximum number of responses
+
+        Returns:
+            Response data
+        """
+        conditions = []
+        params: List[Any] = []
+        for column, value in (("user_id", user_id), ("api_key_id", api_key_id), ("status", _column_value(status))):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if created_after is not None:
+            conditions.append("created_at > ?")
+            params.append(created_after)
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT response FROM processing_responses{where} ORDER BY created_at DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [json.loads(row["response"]) for row in rows]
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,425 @@
+"""
+Backends storing uploads and results on local disk or in S3-compatible object storage
+"""
+import os
+import uuid
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import aiofiles
+from loguru import logger
+
+from jaison.ocr_api.config.settings import settings
+
+# S3 rejects multipart parts below 5MB, except the last one
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+# Error codes S3-compatible services answer for a missing object
+S3_NOT_FOUND_CODES = {"404", "NoSuchKey", "NotFound"}
+
+# Suffix of local files still being written
+PART_SUFFIX = ".part"
+
+
+def is_part_file(name: str) -> bool:
+    """
+    Check whether a local file is an object still being written
+
+    Writers use <name>.<random hex>.part; older versions used <name>.part.
+
+    Args:
+        name: File name
+
+    Returns:
+        True for in-progress writes
+    """
+    return name.endswith(PART_SUFFIX)
+
+
+class ObjectWriter(ABC):
+    """Streaming write of one object, visible under its key only once committed"""
+
+    @abstractmethod
+    async def write(self, chunk: bytes) -> None:
+        """Append a chunk to the object"""
+
+    @abstractmethod
+    async def commit(self) -> None:
+        """Finish the object and make it visible"""
+
+    @abstractmethod
+    async def abort(self) -> None:
+        """Discard everything written"""
+
+
+class StorageBackend(ABC):
+    """
+    Object storage addressed by "/"-separated keys such as uploads/ab/cd/<id>
+    """
+    name = "base"
+
+    async def start(self) -> None:
+        """Open connections (called on application startup)"""
+
+    async def close(self) -> None:
+        """Release connections (called on application shutdown)"""
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        """Check whether an object exists"""
+
+    @abstractmethod
+    async def read(self, key: str, offset: int = 0, length: Optional[int] = None) -> Optional[bytes]:
+        """
+        Read an object or a byte range of it
+
+        Args:
+            key: Object key
+            offset: First byte to read
+            length: Number of bytes to read, None to read to the end
+
+        Returns:
+            Object content, or None if the object does not exist
+        """
+
+    @abstractmethod
+    async def write(self, key: str, data: bytes) -> None:
+        """Write a small object in one call, replacing any previous content"""
+
+    @abstractmethod
+    def open_writer(self, key: str) -> ObjectWriter:
+        """Start a streaming write of an object"""
+
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        """
+        Delete an object
+
+        Returns:
+            True if the object existed
+        """
+
+
+class _LocalWriter(ObjectWriter):
+    """Writes to a .part file of its own that is renamed into place on commit"""
+
+    def __init__(self, path: str):
+        self.path = path
+        # Concurrent writers of one key must not share a temporary file; the last commit wins
+        self.tmp_path = f"{path}.{uuid.uuid4().hex}{PART_SUFFIX}"
+        self._file = None
+
+    async def write(self, chunk: bytes) -> None:
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = await aiofiles.open(self.tmp_path, "wb")
+        await self._file.write(chunk)
+
+    async def commit(self) -> None:
+        if self._file is None:
+            # Empty object
+            await self.write(b"")
+        await self._file.close()
+        os.replace(self.tmp_path, self.path)
+
+    async def abort(self) -> None:
+        if self._file is not None:
+            await self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class LocalStorageBackend(StorageBackend):
+    """Objects as files under a root directory"""
+    name = "local"
+
+    def __init__(self, root_dir: str):
+        """
+        Initialize the backend
+
+        Args:
+            root_dir: Directory keys are resolved against
+        """
+        self.root_dir = root_dir
+
+    def path(self, key: str) -> str:
+        """Get the file of an object"""
+        return os.path.join(self.root_dir, *key.split("/"))
+
+    async def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    async def read(self, key: str, offset: int = 0, length: Optional[int] = None) -> Optional[bytes]:
+        try:
+            async with aiofiles.open(self.path(key), "rb") as f:
+                if offset:
+                    await f.seek(offset)
+                return await f.read(-1 if length is None else length)
+        except FileNotFoundError:
+            return None
+
+    async def write(self, key: str, data: bytes) -> None:
+        writer = self.open_writer(key)
+        try:
+            await writer.write(data)
+            await writer.commit()
+        except BaseException:
+            await writer.abort()
+            raise
+
+    def open_writer(self, key: str) -> ObjectWriter:
+        return _LocalWriter(self.path(key))
+
+    async def delete(self, key: str) -> bool:
+        try:
+            os.remove(self.path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+def _is_not_found(error: Exception) -> bool:
+    """Check whether an S3 client error means the object does not exist"""
+    response = getattr(error, "response", None) or {}
+    return str(response.get("Error", {}).get("Code")) in S3_NOT_FOUND_CODES
+
+
+class _S3MultipartWriter(ObjectWriter):
+    """
+    Streams an object to S3 in parts of part_size bytes
+
+    At most one part is buffered. Objects smaller than one part are sent with a
+    single PutObject when committed, without starting a multipart upload.
+    """
+
+    def __init__(self, backend: "S3StorageBackend", key: str):
+        self.backend = backend
+        self.key = backend.object_key(key)
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts: List[Dict[str, Any]] = []
+
+    async def _upload_part(self, data: bytes) -> None:
+        """Upload the next part, starting the multipart upload on the first one"""
+        if self._upload_id is None:
+            response = await self.backend.call(
+                "create_multipart_upload", Bucket=self.backend.bucket, Key=self.key
+            )
+            self._upload_id = response["UploadId"]
+
+        part_number = len(self._parts) + 1
+        response = await self.backend.call(
+            "upload_part",
+            Bucket=self.backend.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        self._parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+
+    async def write(self, chunk: bytes) -> None:
+        self._buffer.extend(chunk)
+        while len(self._buffer) >= self.backend.part_size:
+            part = bytes(self._buffer[:self.backend.part_size])
+            del self._buffer[:self.backend.part_size]
+            await self._upload_part(part)
+
+    async def commit(self) -> None:
+        if self._upload_id is None:
+            await self.backend.call("put_object", Bucket=self.backend.bucket, Key=self.key, Body=bytes(self._buffer))
+            return
+
+        if self._buffer:
+            await self._upload_part(bytes(self._buffer))
+            self._buffer.clear()
+        await self.backend.call(
+            "complete_multipart_upload",
+            Bucket=self.backend.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            MultipartUpload={"Parts": self._parts},
+        )
+
+    async def abort(self) -> None:
+        self._buffer.clear()
+        if self._upload_id is None:
+            return
+        try:
+            await self.backend.call(
+                "abort_multipart_upload", Bucket=self.backend.bucket, Key=self.key, UploadId=self._upload_id
+            )
+        except Exception as e:
+            # Bucket lifecycle rules clean up incomplete uploads that could not be aborted
+            logger.error(f"Error aborting multipart upload of {self.key}: {e}")
+
+
+class S3StorageBackend(StorageBackend):
+    """
+    Objects in an S3-compatible bucket (AWS S3, MinIO, Ceph, R2, ...)
+
+    One boto3 client with a connection pool of S3_MAX_CONNECTIONS is shared by
+    all requests. Its blocking calls run in a thread pool of the same size, so
+    every thread can hold a connection and S3 latency never occupies the
+    default thread pool used by file and database calls.
+    """
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        part_size: int = 8 * 1024 * 1024,
+        max_connections: int = 32,
+        client: Any = None,
+    ):
+        """
+        Initialize the backend
+
+        Args:
+            bucket: Bucket name
+            prefix: Prefix of every key, e.g. "jaison/"
+            endpoint_url: URL of an S3-compatible service, None for AWS
+            region: Bucket region
+            access_key_id: Access key, None to use the default credential chain
+            secret_access_key: Secret key, None to use the default credential chain
+            part_size: Size of multipart upload parts (at least 5MB)
+            max_connections: Size of the client's connection pool
+            client: S3 client to use instead of creating one (for tests)
+        """
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url or None
+        self.region = region or None
+        self.access_key_id = access_key_id or None
+        self.secret_access_key = secret_access_key or None
+        self.part_size = max(part_size, S3_MIN_PART_SIZE)
+        self.max_connections = max_connections
+        self._client = client
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _create_client(self) -> Any:
+        """Create the pooled boto3 client"""
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise ValueError("S3 storage requires the 'boto3' package")
+
+        config = Config(
+            max_pool_connections=self.max_connections,
+            retries={"max_attempts": 3, "mode": "standard"},
+            # Self-hosted services are usually addressed by path rather than by bucket subdomain
+            s3={"addressing_style": "path" if self.endpoint_url else "auto"},
+        )
+        return boto3.client(
+            "s3",
+            endpoint_url=self.endpoint_url,
+            region_name=self.region,
+            aws_access_key_id=self.access_key_id,
+            aws_secret_access_key=self.secret_access_key,
+            config=config,
+        )
+
+    async def start(self) -> None:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix="s3")
+        if self._client is None:
+            self._client = self._create_client()
+            logger.info(f"S3 storage client created for bucket {self.bucket} ({self.endpoint_url or 'AWS'})")
+
+    async def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._client is not None and hasattr(self._client, "close"):
+            self._client.close()
+        self._client = None
+
+    async def _run(self, func, *args) -> Any:
+        """Run a blocking function in the S3 thread pool"""
+        if self._executor is None or self._client is None:
+            await self.start()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def object_key(self, key: str) -> str:
+        """Get the bucket key of an object"""
+        return f"{self.prefix}{key}"
+
+    async def call(self, operation: str, **kwargs) -> Any:
+        """Run a client operation without blocking the event loop"""
+        return await self._run(lambda: getattr(self._client, operation)(**kwargs))
+
+    async def exists(self, key: str) -> bool:
+        try:
+            await self.call("head_object", Bucket=self.bucket, Key=self.object_key(key))
+            return True
+        except Exception as e:
+            if _is_not_found(e):
+                return False
+            raise
+
+    async def read(self, key: str, offset: int = 0, length: Optional[int] = None) -> Optional[bytes]:
+        kwargs = {"Bucket": self.bucket, "Key": self.object_key(key)}
+        if length is not None:
+            if length <= 0:
+                return b""
+            kwargs["Range"] = f"bytes={offset}-{offset + length - 1}"
+        elif offset:
+            kwargs["Range"] = f"bytes={offset}-"
+
+        def get_object() -> bytes:
+            response = self._client.get_object(**kwargs)
+            return response["Body"].read()
+
+        try:
+            return await self._run(get_object)
+        except Exception as e:
+            if _is_not_found(e):
+                return None
+            raise
+
+    async def write(self, key: str, data: bytes) -> None:
+        await self.call("put_object", Bucket=self.bucket, Key=self.object_key(key), Body=data)
+
+    def open_writer(self, key: str) -> ObjectWriter:
+        return _S3MultipartWriter(self, key)
+
+    async def delete(self, key: str) -> bool:
+        # DeleteObject succeeds for missing keys, so check first to report whether anything was deleted
+        if not await self.exists(key):
+            return False
+        await self.call("delete_object", Bucket=self.bucket, Key=self.object_key(key))
+        return True
+
+
+def create_storage_backend(root_dir: str) -> StorageBackend:
+    """
+    Create the backend selected by the STORAGE_BACKEND setting
+
+    Args:
+        root_dir: Root directory of the local backend
+
+    Returns:
+        Storage backend
+    """
+    if settings.STORAGE_BACKEND == "s3":
+        return S3StorageBackend(
+            bucket=settings.S3_BUCKET,
+            prefix=settings.S3_PREFIX,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            part_size=settings.S3_PART_SIZE,
+            max_connections=settings.S3_MAX_CONNECTIONS,
+        )
+
+    if settings.STORAGE_BACKEND != "local":
+        logger.error(f"Unknown STORAGE_BACKEND {settings.STORAGE_BACKEND}, using local storage")
+    return LocalStorageBackend(root_dir)
@@ -3,13 +3,100 @@ Service for managing file storage and processing results
 """
 import os
 import json
+import time
 import shutil
-from typing import Dict, Any, Optional
+import asyncio
+import hashlib
+from typing import Dict, Any, List, Optional, NamedTuple
 from fastapi import UploadFile
-import aiofiles
 from loguru import logger
 
 from jaison.ocr_api.config.settings import settings
+from jaison.ocr_api.services.image_processor import IMAGE_MIME_TYPES
+from jaison.ocr_api.services.pdf_processor import is_pdf
+from jaison.ocr_api.services.expiry_index import ExpiryIndex
+from jaison.ocr_api.services.results_store import ResultsStore
+from jaison.ocr_api.services.storage_backends import LocalStorageBackend, create_storage_backend
+
+
+# Characters of an ID used per directory level of the sharded layout
+SHARD_WIDTH = 2
+
+
+def shard_path(base_dir: str, item_id: str, filename: str, depth: int) -> str:
+    """
+    Get the path of an item in a fan-out layout keyed by ID prefix
+
+    Args:
+        base_dir: Root directory
+        item_id: ID the item is stored under, e.g. a UUID
+        filename: Name of the file
+        depth: Directory levels, 0 for a flat directory
+
+    Returns:
+        Path such as base_dir/ab/cd/filename for an ID starting with "abcd"
+    """
+    return os.path.join(base_dir, *_shard_parts(item_id, depth), filename)
+
+
+def shard_key(prefix: str, item_id: str, filename: str, depth: int) -> str:
+    """
+    Get the storage backend key of an item in the sharded layout
+
+    Args:
+        prefix: Key prefix of the artifact type, e.g. "uploads"
+        item_id: ID the item is stored under
+        filename: Name of the object
+        depth: Directory levels, 0 for a flat layout
+
+    Returns:
+        Key such as uploads/ab/cd/filename
+    """
+    return "/".join([prefix, *_shard_parts(item_id, depth), filename])
+
+
+def _shard_parts(item_id: str, depth: int) -> List[str]:
+    """Split the start of an ID into directory names"""
+    prefix = item_id.replace("-", "").lower()[:depth * SHARD_WIDTH]
+    if len(prefix) < depth * SHARD_WIDTH or not prefix.isalnum():
+        # IDs too short or unsafe to split stay in the root directory
+        return []
+
+    return [prefix[i:i + SHARD_WIDTH] for i in range(0, len(prefix), SHARD_WIDTH)]
+
+
+class FileTooLargeError(Exception):
+    """Raised when an upload exceeds the maximum size"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"File too large. Maximum size: {max_size} bytes")
+
+
+class SavedFile(NamedTuple):
+    """File written by a streaming upload"""
+    key: str  # Storage backend key
+    size: int
+    sha256: str
+    content_type: Optional[str]  # Sniffed from the content, None if unrecognized
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """
+    Detect the format of a file from its first bytes
+
+    Args:
+        head: Start of the file content
+
+    Returns:
+        MIME type, or None if the format is not recognized
+    """
+    if is_pdf(head):
+        return "application/pdf"
+    for magic, mime_type in IMAGE_MIME_TYPES.items():
+        if head.startswith(magic):
+            return mime_type
+    return None
 
 
 class StorageService:
@@ -19,50 +106,193 @@ class StorageService:
         """Initialize storage service"""
         self.upload_dir = os.path.join(os.getcwd(), "uploads")
         self.results_dir = os.path.join(os.getcwd(), "results")
-        
-        # Create directories if they don't exist
-        os.makedirs(self.upload_dir, exist_ok=True)
-        os.makedirs(self.results_dir, exist_ok=True)
-    
-    async def save_file(self, file_id: str, file: UploadFile) -> str:
+        self.chunk_size = settings.UPLOAD_CHUNK_SIZE
+        self.shard_depth = settings.STORAGE_SHARD_DEPTH
+
+        # Local disk, or object storage shared by every API node
+        self.backend = create_storage_backend(os.getcwd())
+        is_local = isinstance(self.backend, LocalStorageBackend)
+        if is_local:
+            # Create directories if they don't exist
+            os.makedirs(self.upload_dir, exist_ok=True)
+            os.makedirs(self.results_dir, exist_ok=True)
+
+        # Only local disk can hold files written before sharding
+        self.flat_fallback = is_local and self.shard_depth > 0
+
+        # Processing responses go to an indexed database unless configured to use one file each
+        self.results_store = None
+        if settings.RESULTS_STORE == "sqlite":
+            if is_local:
+                self.results_store = ResultsStore(settings.RESULTS_DB_FILE)
+            else:
+                # Every node must see the responses, and the database is local to one
+                logger.warning(f"RESULTS_STORE=sqlite is not shared between nodes; saving responses to {self.backend.name}")
+
+        # Retention of each artifact type in seconds, 0 to keep it forever
+        self.retention_enabled = settings.RETENTION_ENABLED
+        self.retention = {
+            "upload": settings.UPLOAD_RETENTION_HOURS * 3600,
+            "result": settings.RESULT_RETENTION_HOURS * 3600,
+        }
+        self.sweep_interval = settings.RETENTION_SWEEP_INTERVAL
+        self.max_deletes_per_second = settings.RETENTION_MAX_DELETES_PER_SECOND
+        self.expiry_index: Optional[ExpiryIndex] = None
+        if is_local:
+            self.expiry_index = ExpiryIndex(os.path.join(os.getcwd(), "retention"), settings.RETENTION_BUCKET_SECONDS)
+        elif self.retention_enabled:
+            # A node-local index would never sweep the objects of nodes that were replaced
+            logger.info(
+                f"Retention of {self.backend.name} objects is left to bucket lifecycle rules "
+                "on the uploads/ and results/ prefixes"
+            )
+        self._sweeper: Optional[asyncio.Task] = None
+        self._sweep_stats = {
+            "sweeps": 0,
+            "entries": 0,
+            "deleted": {kind: 0 for kind in self.retention},
+            "already_gone": 0,
+            "errors": 0,
+            "last_sweep_at": None,
+            "last_sweep_seconds": 0.0,
+        }
+
+    async def start(self) -> None:
+        """Open the storage backend and start the retention sweeper (called on application startup)"""
+        await self.backend.start()
+        if self.retention_enabled and self.expiry_index is not None and self._sweeper is None:
+            self._sweeper = asyncio.ensure_future(self._sweep_forever())
+            logger.info(f"Retention sweeper started, running every {self.sweep_interval}s")
+
+    async def close(self) -> None:
+        """Stop the retention sweeper and close the storage backend and results store (called on application shutdown)"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+            logger.info("Retention sweeper stopped")
+        await self.backend.close()
+        if self.results_store is not None:
+            await asyncio.to_thread(self.results_store.close)
+
+    async def _sweep_forever(self) -> None:
+        """Sweep expired artifacts every RETENTION_SWEEP_INTERVAL seconds"""
+        while True:
+            try:
+                await self.cleanup_old_files()
+            except Exception as e:
+                self._sweep_stats["errors"] += 1
+                logger.error(f"Error sweeping expired files: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    async def _index_expiry(self, kind: str, item_id: str) -> None:
+        """Record when a newly stored artifact expires"""
+        retention = self.retention[kind]
+        if not self.retention_enabled or self.expiry_index is None or retention <= 0:
+            return
+
+        try:
+            await self.expiry_index.add(kind, item_id, time.time() + retention)
+        except OSError as e:
+            # The artifact is stored; it is only kept longer than configured
+            logger.error(f"Error indexing expiry of {kind} {item_id}: {e}")
+
+    async def _find(self, prefix: str, item_id: str, filename: str) -> str:
+        """Get the key of an item, falling back to the flat layout of files written before sharding"""
+        key = shard_key(prefix, item_id, filename, self.shard_depth)
+        if not self.flat_fallback or await self.backend.exists(key):
+            return key
+
+        flat_key = f"{prefix}/{filename}"
+        if await self.backend.exists(flat_key):
+            return flat_key
+
+        # Also covers an item moved by an online migration between the two checks
+        return key
+
+    async def save_file(self, file_id: str, file: UploadFile, max_size: Optional[int] = None) -> SavedFile:
         """
-        Save an uploaded file
-        
+        Save an uploaded file in a single streaming pass
+
+        The file is read in chunks of UPLOAD_CHUNK_SIZE, hashed and written as it
+        arrives, so memory stays bounded by the chunk size. The size limit is
+        checked after every chunk and the partial file is removed as soon as it
+        is exceeded.
+
         Args:
             file_id: Unique identifier for the file
             file: Uploaded file
-            
+            max_size: Maximum size in bytes, if any
+
         Returns:
-            Path to the saved file
+            Path, size, SHA-256 digest and sniffed content type of the saved file
+
+        Raises:
+            FileTooLargeError: If the file is larger than max_size
         """
-        # Create file path
-        file_path = os.path.join(self.upload_dir, file_id)
-        
-        # Save file
-        async with aiofiles.open(file_path, "wb") as f:
-            # Read and write in chunks to handle large files
-            chunk_size = 1024 * 1024  # 1MB chunks
+        key = shard_key("uploads", file_id, file_id, self.shard_depth)
+        writer = self.backend.open_writer(key)
+
+        size = 0
+        digest = hashlib.sha256()
+        content_type = None
+        try:
             while True:
-                chunk = await file.read(chunk_size)
+                chunk = await file.read(self.chunk_size)
                 if not chunk:
                     break
-                await f.write(chunk)
-        
-        logger.debug(f"Saved file {file_id} to {file_path}")
-        
-        return file_path
-    
-    def get_file_path(self, file_id: str) -> str:
+                if size == 0:
+                    content_type = sniff_content_type(chunk)
+
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise FileTooLargeError(max_size)
+
+                digest.update(chunk)
+                await writer.write(chunk)
+
+            # Only complete uploads appear under the file ID
+            await writer.commit()
+        except BaseException:
+            await writer.abort()
+            raise
+
+        await self._index_expiry("upload", file_id)
+
+        logger.debug(f"Saved file {file_id} to {key} ({size} bytes)")
+
+        return SavedFile(key=key, size=size, sha256=digest.hexdigest(), content_type=content_type)
+
+    async def file_exists(self, file_id: str) -> bool:
         """
-        Get the path to a saved file
+        Check whether an uploaded file exists
         
         Args:
             file_id: File ID
             
         Returns:
-            Path to the file
+            True if the file exists
+        """
+        if await self.backend.exists(shard_key("uploads", file_id, file_id, self.shard_depth)):
+            return True
+        return self.flat_fallback and await self.backend.exists(f"uploads/{file_id}")
+
+    async def read_file(self, file_id: str, offset: int = 0, length: Optional[int] = None) -> Optional[bytes]:
+        """
+        Read an uploaded file, or a byte range of it
+
+        Args:
+            file_id: File ID
+            offset: First byte to read
+            length: Number of bytes to read, None to read to the end
+
+        Returns:
+            File content, or None if the file does not exist
         """
-        return os.path.join(self.upload_dir, file_id)
+        return await self.backend.read(await self._find("uploads", file_id, file_id), offset, length)
     
     async def delete_file(self, file_id: str) -> bool:
         """
@@ -74,32 +304,51 @@ class StorageService:
         Returns:
             True if file was deleted, False otherwise
         """
-        file_path = self.get_file_path(file_id)
-        
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        if await self.backend.delete(await self._find("uploads", file_id, file_id)):
             logger.debug(f"Deleted file {file_id}")
             return True
         
         return False
     
-    async def save_processing_response(self, request_id: str, response: Dict[str, Any]) -> str:
+    async def save_processing_response(
+        self,
+        request_id: str,
+        response: Dict[str, Any],
+        user_id: Optional[str] = None,
+        api_key_id: Optional[str] = None,
+    ) -> str:
         """
         Save a processing response
         
         Args:
             request_id: Request ID
             response: Response data
+            user_id: User the request belongs to, recorded on the first save
+            api_key_id: API key the request was made with, recorded on the first save
             
         Returns:
-            Path to the saved response
+            Key of the saved response, or path of the results database
         """
-        # Create file path
-        file_path = os.path.join(self.results_dir, f"{request_id}.json")
-        
-        # Save response
-        async with aiofiles.open(file_path, "w") as f:
-            await f.write(json.dumps(response, default=str))
+        if self.results_store is not None:
+            is_new = await asyncio.to_thread(
+                self.results_store.save, request_id, response, user_id=user_id, api_key_id=api_key_id
+            )
+            file_path = self.results_store.db_file
+        else:
+            file_path = shard_key("results", request_id, f"{request_id}.json", self.shard_depth)
+            is_new = not await self.backend.exists(file_path)
+
+            # Save response
+            await self.backend.write(file_path, json.dumps(response, default=str).encode("utf-8"))
+
+            # Drop a copy left in the flat layout so it cannot resurface once this one is deleted
+            flat_path = f"results/{request_id}.json"
+            if self.flat_fallback and flat_path != file_path:
+                await self.backend.delete(flat_path)
+
+        # A response is rewritten as processing progresses; its retention runs from the first write
+        if is_new:
+            await self._index_expiry("result", request_id)
         
         logger.debug(f"Saved processing response {request_id} to {file_path}")
         
@@ -115,16 +364,15 @@ class StorageService:
         Returns:
             Response data if found, None otherwise
         """
-        file_path = os.path.join(self.results_dir, f"{request_id}.json")
-        
-        if not os.path.exists(file_path):
-            return None
-        
-        # Load response
-        async with aiofiles.open(file_path, "r") as f:
-            content = await f.read()
-            return json.loads(content)
-    
+        if self.results_store is not None:
+            response = await asyncio.to_thread(self.results_store.get, request_id)
+            if response is not None:
+                return response
+            # Otherwise look for a file saved before the store was enabled
+
+        content = await self.backend.read(await self._find("results", request_id, f"{request_id}.json"))
+        return json.loads(content) if content is not None else None
+
     async def delete_processing_response(self, request_id: str) -> bool:
         """
         Delete a processing response
@@ -135,26 +383,92 @@ class StorageService:
         Returns:
             True if response was deleted, False otherwise
         """
-        file_path = os.path.join(self.results_dir, f"{request_id}.json")
-        
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        deleted = False
+        if self.results_store is not None:
+            deleted = await asyncio.to_thread(self.results_store.delete, request_id)
+
+        if await self.backend.delete(await self._find("results", request_id, f"{request_id}.json")):
+            deleted = True
+
+        if deleted:
             logger.debug(f"Deleted processing response {request_id}")
-            return True
         
-        return False
+        return deleted
     
-    async def cleanup_old_files(self, max_age_days: int = 7) -> int:
+    async def cleanup_old_files(self, now: Optional[float] = None) -> int:
         """
-        Clean up old files and responses
+        Delete uploads and results whose retention has passed
+
+        Only the expiry index buckets that have ended are read, so a sweep costs
+        the number of expired artifacts rather than the size of the storage
+        directories. File operations are limited to RETENTION_MAX_DELETES_PER_SECOND.
         
         Args:
-            max_age_days: Maximum age of files in days
+            now: Current time in epoch seconds (defaults to the current time)
             
         Returns:
             Number of files deleted
         """
-        # TODO: Implement cleanup logic
-        # This would scan the upload and results directories for files older than max_age_days
-        # and delete them
-        return 0
+        now = time.time() if now is None else now
+        start = time.monotonic()
+        window_start = start
+        window_operations = 0
+        deleted = 0
+
+        # Object storage expires objects itself (bucket lifecycle rules)
+        buckets = self.expiry_index.expired_buckets(now) if self.expiry_index is not None else []
+        for bucket in buckets:
+            for kind, item_id in await self.expiry_index.read_bucket(bucket):
+                if kind == "upload":
+                    removed = await self.delete_file(item_id)
+                elif kind == "result":
+                    removed = await self.delete_processing_response(item_id)
+                else:
+                    continue
+
+                self._sweep_stats["entries"] += 1
+                if removed:
+                    self._sweep_stats["deleted"][kind] += 1
+                    deleted += 1
+                else:
+                    self._sweep_stats["already_gone"] += 1
+
+                # Spread the deletions so a large backlog does not starve request I/O
+                window_operations += 1
+                if self.max_deletes_per_second > 0 and window_operations >= self.max_deletes_per_second:
+                    elapsed = time.monotonic() - window_start
+                    if elapsed < 1:
+                        await asyncio.sleep(1 - elapsed)
+                    window_start = time.monotonic()
+                    window_operations = 0
+
+            self.expiry_index.drop_bucket(bucket)
+
+        self._sweep_stats["sweeps"] += 1
+        self._sweep_stats["last_sweep_at"] = now
+        self._sweep_stats["last_sweep_seconds"] = round(time.monotonic() - start, 3)
+        if deleted:
+            logger.info(f"Retention sweep deleted {deleted} expired files")
+
+        return deleted
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get retention statistics
+
+        Returns:
+            Dictionary with the retention settings, sweep counters and expiry index size
+        """
+        return {
+            "enabled": self.retention_enabled,
+            "mode": "expiry_index" if self.expiry_index is not None else "bucket_lifecycle",
+            "retention_seconds": dict(self.retention),
+            "sweeper_running": self._sweeper is not None and not self._sweeper.done(),
+            **self._sweep_stats,
+            "deleted": dict(self._sweep_stats["deleted"]),
+            "index": self.expiry_index.get_stats(time.time()) if self.expiry_index is not None else None,
+        }
+
+
+# Create a singleton instance
+storage_service = StorageService()
@@ -0,0 +1,302 @@
+"""
+JSON parsing helpers for LLM output
+"""
+import json
+import re
+from typing import Any, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class IncrementalJSONParser:
+    """
+    Incremental parser for a JSON document arriving in chunks
+
+    Text is scanned once as it is fed. The parser remembers the last position
+    where the document could be cut and closed into valid JSON, so a snapshot
+    of all completed fields can be built at any time.
+    """
+
+    _CLOSERS = {"{": "}", "[": "]"}
+
+    def __init__(self):
+        """Initialize parser state"""
+        self.buffer = ""
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_is_key = False
+        self._in_primitive = False
+        self._expect_key = False
+        self._complete = False
+
+        # Last position where the document can be closed, and the closers needed
+        self._safe_end: Optional[int] = None
+        self._safe_closers = ""
+        self._snapshot_end: Optional[int] = None
+
+    @property
+    def complete(self) -> bool:
+        """Whether the top-level value has been closed"""
+        return self._complete
+
+    @property
+    def end(self) -> int:
+        """Position in the buffer up to which text has been scanned"""
+        return self._pos
+
+    @property
+    def has_new_data(self) -> bool:
+        """Whether more fields completed since the last snapshot"""
+        return self._safe_end is not None and self._safe_end != self._snapshot_end
+
+    def _mark_safe(self, end: int) -> None:
+        """Remember that the document can be closed at the given position"""
+        self._safe_end = end
+        self._safe_closers = "".join(self._CLOSERS[c] for c in reversed(self._stack))
+
+    def _end_value(self, end: int) -> None:
+        """Record the end of a value inside the current container"""
+        self._mark_safe(end)
+        if not self._stack:
+            self._complete = True
+
+    def feed(self, text: str) -> None:
+        """
+        Feed the next chunk of text
+
+        Args:
+            text: Next chunk of the model output
+        """
+        self.buffer += text
+        buffer = self.buffer
+
+        while self._pos < len(buffer) and not self._complete:
+            i = self._pos
+            char = buffer[i]
+            self._pos += 1
+
+            # Skip anything before the first object or array (prose, code fences)
+            if self._start is None:
+                if char in "{[":
+                    self._start = i
+                    self._stack.append(char)
+                    self._expect_key = char == "{"
+                    self._mark_safe(i + 1)
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if not self._string_is_key:
+                        self._end_value(i + 1)
+                continue
+
+            if self._in_primitive:
+                if char in ",}] \t\r\n":
+                    self._in_primitive = False
+                    self._end_value(i)
+                else:
+                    continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_is_key = self._expect_key
+                self._expect_key = False
+            elif char in "{[":
+                self._stack.append(char)
+                self._expect_key = char == "{"
+                self._mark_safe(i + 1)
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+                self._expect_key = False
+                self._end_value(i + 1)
+            elif char == ",":
+                self._expect_key = bool(self._stack) and self._stack[-1] == "{"
+            elif char == ":":
+                self._expect_key = False
+            elif not char.isspace():
+                self._in_primitive = True
+
+    def snapshot(self) -> Optional[Any]:
+        """
+        Build a value containing every field completed so far
+
+        Returns:
+            Parsed partial value, or None if nothing is complete yet
+        """
+        if self._start is None or self._safe_end is None:
+            return None
+
+        self._snapshot_end = self._safe_end
+        text = self.buffer[self._start:self._safe_end].rstrip().rstrip(",") + self._safe_closers
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return None
+
+
+# Repairs reported by extract_json
+REPAIR_STRIPPED_TEXT = "stripped_surrounding_text"
+REPAIR_TRAILING_COMMAS = "removed_trailing_commas"
+REPAIR_TRUNCATED = "closed_truncated_json"
+
+_FENCE = "```"
+_FENCE_OPEN = re.compile(r"(```[\w-]*)?")
+_FENCE_CLOSE = re.compile(r"(```)?")
+
+
+class JSONExtraction(NamedTuple):
+    """JSON value found in model output and the repairs needed to parse it"""
+    value: Any
+    repairs: List[str]
+
+
+def _candidate_starts(text: str) -> Iterator[int]:
+    """Yield where a JSON value may start: fenced code block bodies first, then every bracket in order"""
+    fenced = set()
+    fence = text.find(_FENCE)
+    while fence != -1:
+        # Skip the language tag, e.g. ```json
+        line_end = text.find("\n", fence + len(_FENCE))
+        body = len(text) if line_end == -1 else line_end + 1
+        stripped = text[body:].lstrip()
+        if stripped[:1] in ("{", "["):
+            start = len(text) - len(stripped)
+            fenced.add(start)
+            yield start
+        fence = text.find(_FENCE, fence + len(_FENCE))
+
+    for match in re.finditer(r"[{\[]", text):
+        if match.start() not in fenced:
+            yield match.start()
+
+
+def _remove_trailing_commas(text: str) -> str:
+    """Remove commas directly followed by a closing bracket, outside strings"""
+    result: List[str] = []
+    in_string = False
+    escape = False
+    pending_comma: Optional[int] = None
+
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == ",":
+            pending_comma = len(result)
+        elif char in "}]":
+            if pending_comma is not None:
+                del result[pending_comma]
+            pending_comma = None
+        elif not char.isspace():
+            in_string = char == '"'
+            pending_comma = None
+        result.append(char)
+
+    return "".join(result)
+
+
+def _has_surrounding_text(before: str, after: str) -> bool:
+    """Whether anything but a code fence surrounds the JSON value"""
+    return not (_FENCE_OPEN.fullmatch(before.strip()) and _FENCE_CLOSE.fullmatch(after.strip()))
+
+
+def extract_json(text: str) -> Optional[JSONExtraction]:
+    """
+    Find and parse the JSON value in model output
+
+    Handles bare JSON, JSON in a fenced code block anywhere in the text, prose
+    before or after the value, trailing commas and output cut off by the token
+    limit (completed fields are kept, the unfinished tail is dropped).
+
+    Args:
+        text: Model output
+
+    Returns:
+        Parsed value and the repairs applied, or None if no JSON value was found
+    """
+    stripped = text.strip()
+
+    # Fast path: the whole output is valid JSON
+    if stripped[:1] in ("{", "["):
+        try:
+            return JSONExtraction(json.loads(stripped), [])
+        except json.JSONDecodeError:
+            pass
+
+    # Brackets in the prose before the value do not start it: try each candidate in turn
+    skipped = range(0)
+    for start in _candidate_starts(text):
+        if start in skipped:
+            continue
+        extraction, end = _extract_at(text, start)
+        if extraction is not None:
+            return extraction
+        # A closed but invalid candidate, e.g. "{braces}" in prose, cannot contain the value
+        skipped = range(start, end)
+
+    return None
+
+
+def _extract_at(text: str, start: int) -> Tuple[Optional[JSONExtraction], int]:
+    """
+    Parse the JSON value starting at a position, repairing it if needed
+
+    Args:
+        text: Model output
+        start: Position of the opening bracket
+
+    Returns:
+        Parsed value and repairs (or None if it does not parse), and where the
+        candidate ends when it was closed (start otherwise)
+    """
+    repairs: List[str] = []
+    decoder = json.JSONDecoder()
+
+    # A complete value followed or preceded by other text
+    try:
+        value, end = decoder.raw_decode(text, start)
+        if _has_surrounding_text(text[:start], text[end:]):
+            repairs.append(REPAIR_STRIPPED_TEXT)
+        return JSONExtraction(value, repairs), end
+    except json.JSONDecodeError:
+        pass
+
+    # Scan once to find where the value ends, or where it can be closed if truncated
+    parser = IncrementalJSONParser()
+    parser.feed(text[start:])
+    end = start + parser.end if parser.complete else len(text)
+    body = text[start:end]
+
+    if _has_surrounding_text(text[:start], text[end:]):
+        repairs.append(REPAIR_STRIPPED_TEXT)
+
+    cleaned = _remove_trailing_commas(body)
+    if cleaned != body:
+        repairs.append(REPAIR_TRAILING_COMMAS)
+
+    if parser.complete:
+        try:
+            return JSONExtraction(json.loads(cleaned), repairs), end
+        except json.JSONDecodeError:
+            return None, end
+
+    # Truncated output: keep every field that was completed
+    truncated = IncrementalJSONParser()
+    truncated.feed(cleaned)
+    value = truncated.snapshot()
+    if value is None:
+        return None, start
+
+    repairs.append(REPAIR_TRUNCATED)
+    return JSONExtraction(value, repairs), start
@@ -0,0 +1,91 @@
+"""
+Rolling latency statistics
+"""
+from collections import deque
+from typing import Deque, Dict, Any, List, Optional
+
+
+class LatencyTracker:
+    """Keeps the most recent latencies per key and answers percentile queries"""
+
+    def __init__(self, window_size: int = 200, min_samples: int = 20):
+        """
+        Initialize latency tracker
+
+        Args:
+            window_size: Number of recent samples kept per key
+            min_samples: Samples required before percentiles are reported
+        """
+        self.window_size = window_size
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, key: str, seconds: float) -> None:
+        """
+        Record a latency sample
+
+        Args:
+            key: Key the sample belongs to (e.g. model name)
+            seconds: Latency in seconds
+        """
+        if key not in self._samples:
+            self._samples[key] = deque(maxlen=self.window_size)
+        self._samples[key].append(seconds)
+
+    def dump(self) -> Dict[str, List[float]]:
+        """
+        Get the samples kept for every key
+
+        Returns:
+            Dictionary of key to samples, oldest first
+        """
+        return {key: list(samples) for key, samples in self._samples.items()}
+
+    def load(self, samples: Dict[str, List[float]]) -> None:
+        """
+        Replace the samples with previously dumped ones
+
+        Args:
+            samples: Dictionary of key to samples, oldest first
+        """
+        self._samples = {key: deque(values, maxlen=self.window_size) for key, values in samples.items()}
+
+    def count(self, key: str) -> int:
+        """Get the number of samples kept for a key"""
+        return len(self._samples.get(key, ()))
+
+    def percentile(self, key: str, percentile: float) -> Optional[float]:
+        """
+        Get a latency percentile
+
+        Args:
+            key: Key to query
+            percentile: Percentile between 0 and 1
+
+        Returns:
+            Latency in seconds, or None if there are not enough samples
+        """
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+
+        ordered = sorted(samples)
+        index = min(int(percentile * len(ordered)), len(ordered) - 1)
+        return ordered[index]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get latency statistics per key
+
+        Returns:
+            Dictionary of key to sample count and p50/p95/p99 latencies
+        """
+        return {
+            key: {
+                "samples": len(samples),
+                "p50": self.percentile(key, 0.5),
+                "p95": self.percentile(key, 0.95),
+                "p99": self.percentile(key, 0.99),
+            }
+            for key, samples in self._samples.items()
+        }
@@ -0,0 +1,151 @@
+"""
+Validation of extraction results against JSON schemas and template fields
+"""
+import re
+from typing import Any, Dict, List, NamedTuple, Optional
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+class SchemaError(NamedTuple):
+    """A field that is missing or does not match the schema"""
+    path: str
+    message: str
+
+
+def _join_path(path: str, key: Any) -> str:
+    """Append an object key or array index to a field path"""
+    if isinstance(key, int):
+        return f"{path}[{key}]"
+    return f"{path}.{key}" if path else str(key)
+
+
+def _matches_type(value: Any, expected: str) -> bool:
+    """Check a value against a single JSON schema type"""
+    if expected == "integer":
+        return isinstance(value, int) and not isinstance(value, bool)
+    if expected == "number":
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    python_type = _JSON_TYPES.get(expected)
+    return python_type is None or isinstance(value, python_type)
+
+
+def validate_json(value: Any, schema: Dict[str, Any], path: str = "") -> List[SchemaError]:
+    """
+    Validate a value against a JSON schema
+
+    Supports the subset of JSON Schema used for output schemas: type (single
+    or list), properties, required, items, enum, minimum and maximum.
+
+    Args:
+        value: Value to validate
+        schema: JSON schema
+        path: Path of the value, used in error messages
+
+    Returns:
+        Errors found, empty if the value is valid
+    """
+    errors: List[SchemaError] = []
+
+    expected_types = schema.get("type")
+    if expected_types is not None:
+        if isinstance(expected_types, str):
+            expected_types = [expected_types]
+        if not any(_matches_type(value, expected) for expected in expected_types):
+            errors.append(SchemaError(path, f"expected {' or '.join(expected_types)}"))
+            return errors
+
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(SchemaError(path, f"expected one of {schema['enum']}"))
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if "minimum" in schema and value < schema["minimum"]:
+            errors.append(SchemaError(path, f"must be at least {schema['minimum']}"))
+        if "maximum" in schema and value > schema["maximum"]:
+            errors.append(SchemaError(path, f"must be at most {schema['maximum']}"))
+
+    if isinstance(value, dict):
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(SchemaError(_join_path(path, key), "missing"))
+        for key, property_schema in schema.get("properties", {}).items():
+            if key in value and isinstance(property_schema, dict):
+                errors.extend(validate_json(value[key], property_schema, _join_path(path, key)))
+
+    if isinstance(value, list) and isinstance(schema.get("items"), dict):
+        for index, item in enumerate(value):
+            errors.extend(validate_json(item, schema["items"], _join_path(path, index)))
+
+    return errors
+
+
+def _normalize_key(key: str) -> str:
+    """Lowercase a key and drop separators so merchant_name matches merchantName"""
+    return re.sub(r"[^a-z0-9]", "", key.lower())
+
+
+def find_missing_fields(value: Any, expected_fields: List[str]) -> List[str]:
+    """
+    Find template fields that are absent or null in a result
+
+    Model output keys are free-form, so each expected field is a list of
+    alternative name fragments separated by "|" (e.g. "merchant|store"). A
+    field is present if any key of the result or of its nested objects
+    contains one of the fragments and has a non-null value.
+
+    Args:
+        value: Extraction result
+        expected_fields: Expected fields of the template
+
+    Returns:
+        Expected fields not found in the result
+    """
+    keys: List[str] = []
+    pending: List[Any] = [value]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, dict):
+            for key, item in current.items():
+                if item not in (None, "", [], {}):
+                    keys.append(_normalize_key(str(key)))
+                pending.append(item)
+        elif isinstance(current, list):
+            pending.extend(current)
+
+    missing = []
+    for field in expected_fields:
+        fragments = [_normalize_key(fragment) for fragment in field.split("|")]
+        if not any(fragment in key for fragment in fragments for key in keys):
+            missing.append(field)
+    return missing
+
+
+def get_fill_ratio(value: Any) -> Optional[float]:
+    """
+    Get the share of leaf values in a result that are not null or empty
+
+    Args:
+        value: Extraction result
+
+    Returns:
+        Ratio between 0 and 1, or None if the result has no leaf values
+    """
+    filled = total = 0
+    pending: List[Any] = [value]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, dict):
+            pending.extend(current.values())
+        elif isinstance(current, list) and current:
+            pending.extend(current)
+        else:
+            total += 1
+            if current not in (None, "", []):
+                filled += 1
+    return filled / total if total else None
@@ -0,0 +1,69 @@
+"""
+Coalescing of identical concurrent calls
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time
+
+    Callers arriving while a call for their key is in flight await that call
+    instead of starting their own, and all of them receive its result or error.
+    """
+
+    def __init__(self):
+        """Initialize single-flight group"""
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+        # Statistics
+        self._calls = 0
+        self._coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run a call, or join the identical call already in flight
+
+        The call runs in its own task, so a caller that is cancelled does not
+        cancel it for the others.
+
+        Args:
+            key: Key identifying identical calls
+            func: Starts the call
+
+        Returns:
+            Result of the call
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self._calls += 1
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self._coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        """Forget a finished call"""
+        self._in_flight.pop(key, None)
+        # Mark the error as retrieved even if every caller gave up waiting
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get single-flight statistics
+
+        Returns:
+            Dictionary with calls made, calls coalesced and calls in flight
+        """
+        total = self._calls + self._coalesced
+        return {
+            "calls": self._calls,
+            "coalesced": self._coalesced,
+            "in_flight": len(self._in_flight),
+            "coalesced_ratio": self._coalesced / total if total else 0.0,
+        }
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Benchmark image profiles for Jaison.
+
+This script encodes every image of a corpus with each model image profile
+and reports the payload size and encode time per profile.
+
+Usage:
+    python scripts/benchmark_image_profiles.py [--corpus tests] [--profile default ...]
+"""
+import sys
+import time
+import base64
+import argparse
+import statistics
+from pathlib import Path
+from typing import Dict, List
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jaison.ocr_api.services.image_processor import normalize_image
+from jaison.ocr_api.services.image_profiles import get_all_image_profiles
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def load_corpus(corpus_dir: Path) -> Dict[str, bytes]:
+    """Load every image of the corpus directory."""
+    return {
+        path.name: path.read_bytes()
+        for path in sorted(corpus_dir.rglob("*"))
+        if path.suffix.lower() in IMAGE_SUFFIXES
+    }
+
+
+def benchmark_profile(images: Dict[str, bytes], profile, repeat: int) -> Dict[str, float]:
+    """Encode the corpus with one profile and collect size and timing figures."""
+    payload_bytes: List[int] = []
+    encode_ms: List[float] = []
+
+    for image_data in images.values():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            encoded = normalize_image(image_data, profile)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        encode_ms.append(min(timings))
+        payload_bytes.append(len(base64.b64encode(encoded)))
+
+    return {
+        "mean_payload_kb": statistics.mean(payload_bytes) / 1024,
+        "max_payload_kb": max(payload_bytes) / 1024,
+        "mean_encode_ms": statistics.mean(encode_ms),
+        "p95_encode_ms": sorted(encode_ms)[int(0.95 * (len(encode_ms) - 1))],
+    }
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark per-model image profiles")
+    parser.add_argument("--corpus", default=str(Path(__file__).resolve().parent.parent / "tests"),
+                        help="Directory with sample documents")
+    parser.add_argument("--profile", action="append", help="Profile (model prefix) to benchmark, repeatable")
+    parser.add_argument("--repeat", type=int, default=3, help="Encodes per image, the fastest is kept")
+    args = parser.parse_args()
+
+    images = load_corpus(Path(args.corpus))
+    if not images:
+        print(f"No images found in {args.corpus}")
+        sys.exit(1)
+
+    profiles = get_all_image_profiles()
+    if args.profile:
+        profiles = {name: profiles[name] for name in args.profile}
+
+    original_kb = statistics.mean(len(base64.b64encode(data)) for data in images.values()) / 1024
+    print(f"Corpus: {len(images)} images, mean original base64 payload {original_kb:.1f} KB\n")
+    print(f"{'profile':<24} {'mean KB':>10} {'max KB':>10} {'mean ms':>10} {'p95 ms':>10}")
+
+    for name, profile in profiles.items():
+        result = benchmark_profile(images, profile, args.repeat)
+        print(
+            f"{name:<24} {result['mean_payload_kb']:>10.1f} {result['max_payload_kb']:>10.1f} "
+            f"{result['mean_encode_ms']:>10.1f} {result['p95_encode_ms']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Benchmark JSON extraction from model output for Jaison.
+
+This script parses every output of a corpus with the previous strict parser
+(raw JSON or an exact ```json fence) and with the tolerant extractor, and
+reports how many outputs each recovers and how long parsing takes.
+
+Usage:
+    python scripts/benchmark_json_extraction.py [--corpus tests/llm_outputs.jsonl] [--repeat 200]
+"""
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jaison.ocr_api.utils.json_parser import extract_json
+
+
+def strict_parse(content: str) -> Optional[Any]:
+    """Parse output the way the client did before the tolerant extractor."""
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        if content.startswith("```json\n") and content.endswith("\n```"):
+            try:
+                return json.loads(content[8:-4])
+            except json.JSONDecodeError:
+                pass
+    return None
+
+
+def tolerant_parse(content: str) -> Optional[Any]:
+    """Parse output with the tolerant extractor."""
+    extraction = extract_json(content)
+    return extraction.value if extraction is not None else None
+
+
+def load_corpus(corpus_path: Path) -> List[Dict[str, Any]]:
+    """Load the corpus of model outputs."""
+    with open(corpus_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def benchmark_parser(outputs: List[str], parse: Callable[[str], Optional[Any]], repeat: int) -> Dict[str, float]:
+    """Parse the corpus with one parser and collect recovery and timing figures."""
+    recovered = sum(1 for output in outputs if parse(output) is not None)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for output in outputs:
+            parse(output)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "recovered": recovered,
+        "mean_us": elapsed / (repeat * len(outputs)) * 1_000_000,
+    }
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark JSON extraction from model output")
+    parser.add_argument("--corpus", default=str(Path(__file__).resolve().parent.parent / "tests" / "llm_outputs.jsonl"),
+                        help="JSON lines file with an 'output' field per model output")
+    parser.add_argument("--repeat", type=int, default=200, help="Passes over the corpus for timing")
+    args = parser.parse_args()
+
+    corpus = load_corpus(Path(args.corpus))
+    outputs = [case["output"] for case in corpus]
+    if not outputs:
+        print(f"No outputs found in {args.corpus}")
+        sys.exit(1)
+
+    print(f"Corpus: {len(outputs)} outputs, mean length {sum(map(len, outputs)) / len(outputs):.0f} chars\n")
+    print(f"{'parser':<12} {'recovered':>10} {'mean us':>10}")
+
+    for name, parse in (("strict", strict_parse), ("tolerant", tolerant_parse)):
+        result = benchmark_parser(outputs, parse, args.repeat)
+        print(f"{name:<12} {result['recovered']:>7}/{len(outputs):<2} {result['mean_us']:>10.1f}")
+
+    repairs = Counter(repair for output in outputs for repair in (extract_json(output) or (None, []))[1])
+    if repairs:
+        print("\nRepairs: " + ", ".join(f"{repair}={count}" for repair, count in repairs.most_common()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Benchmark the perceptual hash index for Jaison.
+
+This script fills the near-duplicate index with random 64-bit hashes and
+reports insert time, lookup latency for near-duplicates and for unknown
+documents, and the memory used.
+
+Usage:
+    python scripts/benchmark_phash_index.py [--entries 1000000] [--lookups 10000] [--max-distance 4]
+"""
+import sys
+import time
+import random
+import argparse
+import resource
+from pathlib import Path
+from typing import List
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jaison.ocr_api.services.phash_index import PerceptualHashIndex
+
+
+def flip_bits(value: int, count: int, rng: random.Random) -> int:
+    """Flip count random bits of a 64-bit value."""
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+def time_lookups(index: PerceptualHashIndex, scope: str, hashes: List[int]) -> List[float]:
+    """Look up every hash and return the latencies in microseconds."""
+    timings = []
+    for image_hash in hashes:
+        start = time.perf_counter()
+        index.find(scope, image_hash)
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    return sorted(timings)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate index lookups")
+    parser.add_argument("--entries", type=int, default=1_000_000, help="Hashes in the index")
+    parser.add_argument("--lookups", type=int, default=10_000, help="Lookups per query kind")
+    parser.add_argument("--max-distance", type=int, default=4, help="Hamming distance counted as a near-duplicate")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    scope = "benchmark:receipt"
+    index = PerceptualHashIndex(max_distance=args.max_distance, max_entries=args.entries)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    hashes = [rng.getrandbits(64) for _ in range(args.entries)]
+
+    start = time.perf_counter()
+    for i, image_hash in enumerate(hashes):
+        index.add(scope, image_hash, f"{i:064x}")
+    insert_seconds = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    near = [flip_bits(rng.choice(hashes), rng.randint(0, args.max_distance), rng) for _ in range(args.lookups)]
+    unknown = [rng.getrandbits(64) for _ in range(args.lookups)]
+
+    print(f"Index: {len(index)} entries, max distance {args.max_distance}")
+    print(f"Insert: {insert_seconds:.1f}s total, {insert_seconds / args.entries * 1_000_000:.2f} us per entry")
+    print(f"Memory: ~{(rss_after - rss_before) / 1024:.0f} MB (max RSS growth)\n")
+    print(f"{'query':<16} {'mean us':>10} {'p50 us':>10} {'p99 us':>10}")
+
+    for name, queries in (("near-duplicate", near), ("unknown", unknown)):
+        timings = time_lookups(index, scope, queries)
+        print(
+            f"{name:<16} {sum(timings) / len(timings):>10.1f} "
+            f"{timings[len(timings) // 2]:>10.1f} {timings[int(0.99 * (len(timings) - 1))]:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
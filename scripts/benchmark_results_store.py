@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Benchmark the results store against one JSON file per request.
+
+This script saves the same processing responses through the storage service
+with RESULTS_STORE=files and with RESULTS_STORE=sqlite, then reports the
+latency of creating and updating responses and the throughput of status polls
+(get_processing_response on random request IDs).
+
+Usage:
+    python scripts/benchmark_results_store.py [--requests 100000] [--polls 20000] [--dir /tmp]
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Dict, Any, List
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jaison.ocr_api.config.settings import settings
+from jaison.ocr_api.services.results_store import ResultsStore
+from jaison.ocr_api.services.storage_service import StorageService
+
+
+def make_response(request_id: str, status: str) -> Dict[str, Any]:
+    """Build a processing response of typical size."""
+    now = datetime.now(timezone.utc)
+    return {
+        "request_id": request_id,
+        "status": status,
+        "created_at": now,
+        "updated_at": now,
+        "result": {"merchant": "Mock Market", "total": 42.5, "items": [{"name": "Coffee", "price": 3.5}] * 5},
+        "model_used": "mock/vision",
+    }
+
+
+def summarize(name: str, timings: List[float]) -> str:
+    """Format throughput and percentiles of timings in seconds."""
+    timings = sorted(timings)
+    return (
+        f"{name:<18} {len(timings) / sum(timings):>12.0f} "
+        f"{timings[len(timings) // 2] * 1_000_000:>10.1f} {timings[int(0.99 * (len(timings) - 1))] * 1_000_000:>10.1f}"
+    )
+
+
+async def run_backend(storage: StorageService, ids: List[str], polls: List[str]) -> None:
+    """Create, update and poll responses and print the figures."""
+    for name, status in (("create", "pending"), ("update", "completed")):
+        timings = []
+        for request_id in ids:
+            response = make_response(request_id, status)
+            start = time.perf_counter()
+            await storage.save_processing_response(request_id, response, user_id="benchmark")
+            timings.append(time.perf_counter() - start)
+        print(summarize(f"  {name}", timings))
+
+    timings = []
+    for request_id in polls:
+        start = time.perf_counter()
+        await storage.get_processing_response(request_id)
+        timings.append(time.perf_counter() - start)
+    print(summarize("  status poll", timings))
+
+
+async def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Compare the results store with one JSON file per request")
+    parser.add_argument("--requests", type=int, default=100_000, help="Responses saved per backend")
+    parser.add_argument("--polls", type=int, default=20_000, help="Status polls per backend")
+    parser.add_argument("--dir", default=None, help="Directory to store the responses under (on the disk to measure)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(args.requests)]
+    polls = [rng.choice(ids) for _ in range(args.polls)]
+
+    root = tempfile.mkdtemp(prefix="jaison-results-bench-", dir=args.dir)
+    cwd = os.getcwd()
+    try:
+        print(f"Responses: {args.requests}, polls: {args.polls}, under {root}\n")
+        print(f"{'operation':<18} {'ops/s':>12} {'p50 us':>10} {'p99 us':>10}")
+
+        for backend in ("files", "sqlite"):
+            os.chdir(root)
+            os.makedirs(backend)
+            os.chdir(backend)
+
+            storage = StorageService()
+            storage.retention_enabled = False
+            storage.results_store = ResultsStore(settings.RESULTS_DB_FILE) if backend == "sqlite" else None
+
+            print(f"{backend} (shard depth {storage.shard_depth})")
+            await run_backend(storage, ids, polls)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
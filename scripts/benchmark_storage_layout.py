@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Benchmark flat and sharded storage layouts for Jaison.
+
+This script creates the same number of files in a flat directory and in the
+sharded layout used for uploads and results, then reports create latency and
+the latency of existence checks for stored and unknown IDs.
+
+Usage:
+    python scripts/benchmark_storage_layout.py [--files 1000000] [--lookups 10000] [--dir /tmp]
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+from typing import List
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jaison.ocr_api.services.storage_service import shard_path
+
+
+def make_ids(count: int, rng: random.Random) -> List[str]:
+    """Generate reproducible UUID4 strings like the API's file and request IDs."""
+    return [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(count)]
+
+
+def create_files(base_dir: str, ids: List[str], depth: int) -> List[float]:
+    """Create an empty result file per ID and return the per-file latencies in microseconds."""
+    timings = []
+    for item_id in ids:
+        start = time.perf_counter()
+        path = shard_path(base_dir, item_id, f"{item_id}.json", depth)
+        if depth:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb"):
+            pass
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    return sorted(timings)
+
+
+def time_lookups(base_dir: str, ids: List[str], depth: int) -> List[float]:
+    """Time os.path.exists for each ID and return the latencies in microseconds."""
+    timings = []
+    for item_id in ids:
+        start = time.perf_counter()
+        os.path.exists(shard_path(base_dir, item_id, f"{item_id}.json", depth))
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    return sorted(timings)
+
+
+def summarize(name: str, timings: List[float]) -> str:
+    """Format mean and percentiles of sorted timings."""
+    return (
+        f"{name:<22} {sum(timings) / len(timings):>10.1f} "
+        f"{timings[len(timings) // 2]:>10.1f} {timings[int(0.99 * (len(timings) - 1))]:>10.1f}"
+    )
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark file creation and lookups in flat and sharded layouts")
+    parser.add_argument("--files", type=int, default=1_000_000, help="Files created per layout")
+    parser.add_argument("--lookups", type=int, default=10_000, help="Lookups per query kind")
+    parser.add_argument("--depth", type=int, default=2, help="Shard directory levels of the sharded layout")
+    parser.add_argument("--dir", default=None, help="Directory to create the files under (on the disk to measure)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ids = make_ids(args.files, rng)
+    stored = rng.sample(ids, min(args.lookups, len(ids)))
+    unknown = make_ids(args.lookups, rng)
+
+    root = tempfile.mkdtemp(prefix="jaison-storage-bench-", dir=args.dir)
+    try:
+        print(f"Files: {args.files} per layout under {root}\n")
+        print(f"{'operation':<22} {'mean us':>10} {'p50 us':>10} {'p99 us':>10}")
+
+        for layout, depth in (("flat", 0), (f"sharded/{args.depth}", args.depth)):
+            base_dir = os.path.join(root, layout.replace("/", "-"))
+            os.makedirs(base_dir)
+
+            print(summarize(f"{layout} create", create_files(base_dir, ids, depth)))
+            print(summarize(f"{layout} exists", time_lookups(base_dir, stored, depth)))
+            print(summarize(f"{layout} missing", time_lookups(base_dir, unknown, depth)))
+            shutil.rmtree(base_dir)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Add uploads and results stored before retention was enabled to the expiry index.
+
+The retention sweeper only deletes what the expiry index lists, and files are
+indexed when they are written. This one-off scan indexes older files by their
+modification time, so they expire like new ones. Running it twice only adds
+duplicate entries, which the sweeper skips.
+
+Usage:
+    python scripts/index_storage_expiry.py [--root .] [--dry-run]
+"""
+import os
+import sys
+import asyncio
+import argparse
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jaison.ocr_api.config.settings import settings
+from jaison.ocr_api.services.expiry_index import ExpiryIndex
+from jaison.ocr_api.services.storage_backends import is_part_file
+
+
+async def index_directory(index: ExpiryIndex, base_dir: str, kind: str, retention: float, dry_run: bool) -> int:
+    """Index every stored file of a directory and return the number indexed."""
+    indexed = 0
+    for directory, _, filenames in os.walk(base_dir):
+        for name in filenames:
+            if is_part_file(name) or (kind == "result" and not name.endswith(".json")):
+                continue
+
+            item_id = name[:-len(".json")] if kind == "result" else name
+            expires_at = os.path.getmtime(os.path.join(directory, name)) + retention
+            if not dry_run:
+                await index.add(kind, item_id, expires_at)
+            indexed += 1
+    return indexed
+
+
+async def main() -> None:
+    """Run the backfill."""
+    parser = argparse.ArgumentParser(description="Index the expiry of files stored before retention was enabled")
+    parser.add_argument("--root", default=os.getcwd(), help="Directory holding uploads/, results/ and retention/")
+    parser.add_argument("--dry-run", action="store_true", help="Count the files without indexing them")
+    args = parser.parse_args()
+
+    index = ExpiryIndex(os.path.join(args.root, "retention"), settings.RETENTION_BUCKET_SECONDS)
+    for directory, kind, hours in (
+        ("uploads", "upload", settings.UPLOAD_RETENTION_HOURS),
+        ("results", "result", settings.RESULT_RETENTION_HOURS),
+    ):
+        if hours <= 0:
+            print(f"{directory}: kept forever, skipped")
+            continue
+
+        indexed = await index_directory(index, os.path.join(args.root, directory), kind, hours * 3600, args.dry_run)
+        print(f"{directory}: {indexed} files indexed{' (dry run)' if args.dry_run else ''}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
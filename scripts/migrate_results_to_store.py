@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Import processing responses saved as JSON files into the results store.
+
+Until a response is imported, the storage service still serves it from its
+file, so the import can run while the API is serving. A response already in
+the store was saved after its file and is kept. Imported files are removed
+unless --keep-files is given.
+
+Usage:
+    python scripts/migrate_results_to_store.py [--results-dir results] [--db results/results.db] [--keep-files]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jaison.ocr_api.config.settings import settings
+from jaison.ocr_api.services.results_store import ResultsStore
+
+
+def main() -> None:
+    """Run the import."""
+    parser = argparse.ArgumentParser(description="Import JSON processing responses into the results store")
+    parser.add_argument("--results-dir", default=os.path.join(os.getcwd(), "results"), help="Directory of the JSON files")
+    parser.add_argument("--db", default=settings.RESULTS_DB_FILE, help="Results store database file")
+    parser.add_argument("--keep-files", action="store_true", help="Leave the JSON files in place after importing")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    counts = {"imported": 0, "newer_in_store": 0, "unreadable": 0}
+    start = time.perf_counter()
+
+    # Both the flat and the sharded layout
+    for directory, _, filenames in os.walk(args.results_dir):
+        for name in filenames:
+            if not name.endswith(".json"):
+                continue
+
+            path = os.path.join(directory, name)
+            try:
+                with open(path, "r") as f:
+                    response = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Skipping {path}: {e}")
+                counts["unreadable"] += 1
+                continue
+
+            if store.save(name[:-len(".json")], response, replace=False):
+                counts["imported"] += 1
+            else:
+                counts["newer_in_store"] += 1
+
+            if not args.keep_files:
+                os.remove(path)
+
+    seconds = time.perf_counter() - start
+    print(
+        f"{counts['imported']} imported, {counts['newer_in_store']} already in the store, "
+        f"{counts['unreadable']} unreadable in {seconds:.1f}s"
+    )
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
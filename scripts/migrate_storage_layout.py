@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Move uploads and results from flat directories into the sharded layout.
+
+Files written before STORAGE_SHARD_DEPTH was set sit directly in uploads/ and
+results/. The storage service still finds them there, so this migration can
+run while the API is serving: each file is hard-linked into its shard
+directory before its flat name is removed, and a flat result that was
+already rewritten in its shard is removed.
+
+Usage:
+    python scripts/migrate_storage_layout.py [--root .] [--depth 2] [--dry-run]
+"""
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jaison.ocr_api.config.settings import settings
+from jaison.ocr_api.services.storage_backends import is_part_file
+from jaison.ocr_api.services.storage_service import shard_path
+
+
+def upload_id(name: str) -> Optional[str]:
+    """Get the file ID of an upload, skipping uploads still being written."""
+    return None if is_part_file(name) else name
+
+
+def result_id(name: str) -> Optional[str]:
+    """Get the request ID of a result file."""
+    return name[:-len(".json")] if name.endswith(".json") else None
+
+
+def migrate_directory(base_dir: str, item_id: Callable[[str], Optional[str]], depth: int, dry_run: bool) -> Dict[str, int]:
+    """Move the files at the top of a directory into their shards."""
+    stats = {"moved": 0, "superseded": 0, "skipped": 0}
+    if not os.path.isdir(base_dir):
+        return stats
+
+    with os.scandir(base_dir) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+
+            name = entry.name
+            target = shard_path(base_dir, item_id(name) or "", name, depth)
+            if item_id(name) is None or target == entry.path:
+                stats["skipped"] += 1
+                continue
+
+            if dry_run:
+                stats["superseded" if os.path.exists(target) else "moved"] += 1
+                continue
+
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                # Unlike a rename, a link never replaces a sharded copy written since the exists check
+                os.link(entry.path, target)
+            except FileExistsError:
+                # The sharded copy was written after the flat one
+                stats["superseded"] += 1
+            except FileNotFoundError:
+                # Deleted or moved by the API meanwhile
+                stats["skipped"] += 1
+                continue
+            else:
+                stats["moved"] += 1
+
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    return stats
+
+
+def main() -> None:
+    """Run the migration."""
+    parser = argparse.ArgumentParser(description="Move flat uploads and results into shard directories")
+    parser.add_argument("--root", default=os.getcwd(), help="Directory holding uploads/ and results/")
+    parser.add_argument("--depth", type=int, default=settings.STORAGE_SHARD_DEPTH, help="Shard directory levels")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be moved without moving it")
+    args = parser.parse_args()
+
+    if args.depth < 1:
+        parser.error("--depth must be at least 1")
+
+    for directory, item_id in (("uploads", upload_id), ("results", result_id)):
+        start = time.perf_counter()
+        stats = migrate_directory(os.path.join(args.root, directory), item_id, args.depth, args.dry_run)
+        seconds = time.perf_counter() - start
+        print(
+            f"{directory}: {stats['moved']} moved, {stats['superseded']} superseded, "
+            f"{stats['skipped']} skipped in {seconds:.1f}s{' (dry run)' if args.dry_run else ''}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""
+Local stand-in for an OpenAI-compatible inference server.
+
+This script serves /v1/chat/completions with canned JSON extractions after a
+configurable latency, so the OCR API can be load tested without calling a
+real model. Route models to it with:
+
+    INFERENCE_PROVIDERS={"mock": {"base_url": "http://localhost:8900/v1"}}
+    MODEL_ROUTES={"mock/": {"provider": "mock"}}
+
+and request a model such as "mock/vision". Structured output schemas, multi-
+document batches and streaming are answered in the expected shape.
+
+Usage:
+    python scripts/mock_inference_server.py [--port 8900] [--latency 0.5] [--jitter 0.2] [--error-rate 0.0]
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+from typing import Any, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Extraction returned when the request has no schema
+SAMPLE_EXTRACTION = {
+    "merchant": "Mock Market",
+    "date": "2024-01-31",
+    "total": 42.5,
+    "currency": "EUR",
+    "items": [{"name": "Coffee", "price": 3.5}, {"name": "Sandwich", "price": 39.0}],
+}
+
+
+def sample_value(schema: Dict[str, Any]) -> Any:
+    """Build a value that follows a JSON schema."""
+    schema_type = schema.get("type")
+    if isinstance(schema_type, list):
+        schema_type = next((t for t in schema_type if t != "null"), "null")
+
+    if "enum" in schema:
+        return schema["enum"][0]
+    if schema_type == "object" or "properties" in schema:
+        return {key: sample_value(value) for key, value in schema.get("properties", {}).items()}
+    if schema_type == "array":
+        return [sample_value(schema.get("items", {})) for _ in range(2)]
+    if schema_type in ("number", "integer"):
+        return schema.get("minimum", 1)
+    if schema_type == "boolean":
+        return True
+    if schema_type == "null":
+        return None
+    return "mock"
+
+
+def build_content(payload: Dict[str, Any]) -> str:
+    """Build the assistant message answering a chat completions request."""
+    response_format = payload.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        data = sample_value(response_format["json_schema"]["schema"])
+    else:
+        data = SAMPLE_EXTRACTION
+
+    # Multi-document requests label each image "Document N:"
+    parts: List[Dict[str, Any]] = payload["messages"][-1]["content"]
+    if isinstance(parts, list):
+        documents = [part for part in parts if part.get("type") == "text" and part["text"].startswith("Document ")]
+        if documents:
+            return json.dumps({"results": [{"index": i, "data": data} for i in range(len(documents))]})
+    return json.dumps(data)
+
+
+def create_app(latency: float, jitter: float, error_rate: float, seed: int) -> FastAPI:
+    """Create the mock server application."""
+    app = FastAPI(title="Mock inference server")
+    rng = random.Random(seed)
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "mock/vision", "object": "model"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        await asyncio.sleep(max(latency + rng.uniform(-jitter, jitter), 0))
+
+        if rng.random() < error_rate:
+            return JSONResponse({"error": {"message": "mock overload"}}, status_code=503)
+
+        content = build_content(payload)
+        usage = {"prompt_tokens": 800, "completion_tokens": len(content) // 4, "total_tokens": 800 + len(content) // 4}
+        created = int(time.time())
+
+        if payload.get("stream"):
+            async def events():
+                for start in range(0, len(content), 16):
+                    chunk = {
+                        "model": payload["model"],
+                        "created": created,
+                        "choices": [{"index": 0, "delta": {"content": content[start:start + 16]}}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(0.005)
+                yield f"data: {json.dumps({'model': payload['model'], 'choices': [], 'usage': usage})}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        return {
+            "id": f"mock-{created}",
+            "object": "chat.completion",
+            "created": created,
+            "model": payload["model"],
+            "usage": usage,
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+            ],
+        }
+
+    return app
+
+
+def main() -> None:
+    """Run the mock server."""
+    parser = argparse.ArgumentParser(description="Serve canned extractions over the OpenAI chat completions API")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8900, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Maximum deviation from the mean latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    app = create_app(args.latency, args.jitter, args.error_rate, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
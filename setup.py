@@ -18,16 +18,20 @@ setup(
         "aiofiles>=23.1.0",
         "supabase>=0.7.1",
         "postgrest>=0.10.6",
-        "httpx>=0.24.0",
+        "httpx[http2]>=0.24.0",
         "python-jose[cryptography]>=3.3.0",
         "passlib[bcrypt]>=1.7.4",
         "pyjwt>=2.6.0",
         "loguru>=0.6.0",
         "sentry-sdk>=1.19.1",
         "pillow>=9.5.0",
+        "pypdfium2>=4.0.0",
         "cachetools>=5.3.0",
     ],
     extras_require={
+        "s3": [
+            "boto3>=1.26.0",
+        ],
         "dev": [
             "pytest>=7.3.1",
             "pytest-asyncio>=0.21.0",
@@ -0,0 +1,149 @@
+"""
+Tests for adaptive token budgets and timeouts
+run with venv/bin/activate && python -m pytest
+"""
+import pytest
+import os
+import json
+import asyncio
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.services.adaptive_limits import AdaptiveLimits, estimate_schema_tokens
+
+INVOICE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "vendor": {"type": "string"},
+        "total": {"type": "number"},
+        "lines": {
+            "type": "array",
+            "items": {"type": "object", "properties": {"description": {"type": "string"}, "amount": {"type": "number"}}},
+        },
+    },
+}
+
+def test_schema_estimate_grows_with_arrays():
+    """Test that array items weigh more than single fields"""
+    small = estimate_schema_tokens({"type": "object", "properties": {"total": {"type": "number"}}})
+    large = estimate_schema_tokens(INVOICE_SCHEMA)
+
+    assert small < 20
+    assert large > 10 * small
+    assert estimate_schema_tokens({**INVOICE_SCHEMA["properties"]["lines"], "maxItems": 1}) < large / 5
+
+def test_max_tokens_follows_history():
+    """Test that the budget starts from the template or schema and then follows observed completions"""
+    limits = AdaptiveLimits()
+    limits.completion_tokens.min_samples = 5
+
+    assert limits.get_max_tokens("receipt", 800) == 800
+    assert limits.get_max_tokens("invoice", 2000, INVOICE_SCHEMA) == int(estimate_schema_tokens(INVOICE_SCHEMA) * 1.5)
+
+    for _ in range(5):
+        limits.record_completion("receipt", {"completion_tokens": 200})
+    assert limits.get_max_tokens("receipt", 800) == 300
+
+    # A schema gets its own history
+    key = limits.make_budget_key("invoice", INVOICE_SCHEMA)
+    for _ in range(5):
+        limits.record_completion(key, {"completion_tokens": 3000, "batch_size": 2})
+    assert limits.get_max_tokens("invoice", 2000, INVOICE_SCHEMA) == 2250
+    assert limits.get_max_tokens("invoice", 2000) == 2000
+
+def test_truncations_raise_the_budget():
+    """Test that truncated outputs push the budget above the tokens they used"""
+    limits = AdaptiveLimits()
+    limits.completion_tokens.min_samples = 1
+
+    limits.record_completion("invoice", {"completion_tokens": 2000}, truncated=True)
+
+    assert limits.get_max_tokens("invoice", 2000) == 6000
+    assert limits.get_stats()["max_tokens"]["invoice"]["truncations"] == 1
+
+def test_timeout_follows_latency():
+    """Test that timeouts follow the model's latency percentile within bounds"""
+    limits = AdaptiveLimits()
+    limits.attempt_latency.min_samples = 5
+
+    assert limits.get_timeout("fast/model", 30) == 30
+
+    for _ in range(5):
+        limits.record_latency("fast/model", 1.0)
+        limits.record_latency("slow/model", 100.0)
+
+    assert limits.get_timeout("fast/model", 30) == limits.min_timeout
+    assert limits.get_timeout("slow/model", 30) == limits.max_timeout
+    limits.record_latency("fast/model", 4.0)
+    assert limits.get_timeout("fast/model", 30) == 8.0
+
+def test_timeout_grows_after_repeated_timeouts():
+    """Test that long extractions learn their own timeout, which grows while attempts time out"""
+    limits = AdaptiveLimits()
+    limits.enabled = True
+    limits.attempt_latency.min_samples = 5
+
+    for _ in range(50):
+        limits.record_latency("some/model", 4.0, max_tokens=500)
+    assert limits.get_timeout("some/model", 30, max_tokens=500) == 8.0
+    assert limits.get_timeout("some/model", 30, max_tokens=4000) == 30
+
+    timeouts = []
+    for _ in range(20):
+        timeout = limits.get_timeout("some/model", 8.0, max_tokens=4000)
+        limits.record_timeout("some/model", timeout, max_tokens=4000)
+        timeouts.append(timeout)
+
+    assert timeouts[-1] > timeouts[5] > timeouts[0]
+    assert timeouts[-1] == limits.max_timeout
+    assert limits.get_timeout("some/model", 30, max_tokens=500) == 8.0
+    assert set(limits.get_stats()["timeouts"]) == {"some/model@512", "some/model@4096"}
+
+def test_history_survives_restart(tmp_path):
+    """Test saving the history and loading it in a new instance"""
+    limits = AdaptiveLimits()
+    limits.state_file = str(tmp_path / "limits" / "adaptive_limits.json")
+    limits.record_latency("some/model", 2.5)
+    limits.record_completion("receipt", {"completion_tokens": 150})
+    limits.save()
+
+    restarted = AdaptiveLimits()
+    restarted.state_file = limits.state_file
+    restarted.load()
+
+    assert restarted.attempt_latency.dump() == {"some/model": [2.5]}
+    assert restarted.completion_tokens.dump() == {"receipt": [150.0]}
+
+
+@pytest.mark.asyncio
+async def test_history_is_saved_while_running(tmp_path):
+    """Test that the history is saved after enough samples, without waiting for shutdown"""
+    limits = AdaptiveLimits()
+    limits.enabled = True
+    limits.state_file = str(tmp_path / "adaptive_limits.json")
+    limits.save_interval = 3600
+    limits.save_every = 3
+    await limits.start()
+
+    for seconds in (1.0, 2.0):
+        limits.record_latency("some/model", seconds)
+    await asyncio.sleep(0.05)
+    assert not os.path.exists(limits.state_file)
+
+    limits.record_completion("receipt", {"completion_tokens": 150})
+    for _ in range(20):
+        await asyncio.sleep(0.01)
+        if os.path.exists(limits.state_file):
+            break
+
+    with open(limits.state_file) as f:
+        assert json.load(f)["attempt_latency"] == {"some/model": [1.0, 2.0]}
+    assert limits.get_stats()["unsaved_samples"] == 0
+    assert os.listdir(tmp_path) == ["adaptive_limits.json"]
+
+    limits.record_latency("some/model", 3.0)
+    await limits.close()
+    with open(limits.state_file) as f:
+        assert json.load(f)["attempt_latency"] == {"some/model": [1.0, 2.0, 3.0]}
@@ -0,0 +1,70 @@
+"""
+Tests for the circuit breaker
+run with venv/bin/activate && python -m pytest
+"""
+import pytest
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+def test_circuit_opens_after_consecutive_failures():
+    """Test that the circuit opens only after the failure threshold"""
+    breaker = CircuitBreaker("test/model", failure_threshold=3, recovery_time=60)
+
+    for _ in range(2):
+        breaker.before_request()
+        breaker.record_failure()
+
+    # A success resets the count
+    breaker.before_request()
+    breaker.record_success()
+    assert breaker.get_state()["consecutive_failures"] == 0
+
+    for _ in range(3):
+        breaker.before_request()
+        breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    state = breaker.get_state()
+    assert state["state"] == "open"
+    assert state["times_opened"] == 1
+    assert state["rejected"] == 1
+
+def test_half_open_allows_one_trial():
+    """Test that only one trial request passes once the recovery time is over"""
+    breaker = CircuitBreaker("test/model", failure_threshold=1, recovery_time=0)
+    breaker.before_request()
+    breaker.record_failure()
+
+    # Recovery time has passed: one trial is let through, others are refused
+    breaker.before_request()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    # A failed trial opens the circuit again
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    # A successful trial closes it
+    breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_request()
+
+def test_cancelled_trial_frees_half_open_slot():
+    """Test that a cancelled trial request does not block the circuit"""
+    breaker = CircuitBreaker("test/model", failure_threshold=1, recovery_time=0)
+    breaker.before_request()
+    breaker.record_failure()
+
+    breaker.before_request()
+    breaker.record_cancelled()
+    breaker.before_request()
+    assert breaker.state == "half_open"
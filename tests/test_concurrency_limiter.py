@@ -0,0 +1,117 @@
+"""
+Tests for the adaptive concurrency limiter
+run with venv/bin/activate && python -m pytest
+"""
+import pytest
+import os
+import asyncio
+import time
+import random
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.services.concurrency_limiter import AdaptiveConcurrencyLimiter, ConcurrencyQueueFullError
+
+@pytest.mark.asyncio
+async def test_limit_ramps_up_and_backs_off():
+    """Test additive increase on healthy responses and multiplicative decrease on overload"""
+    limiter = AdaptiveConcurrencyLimiter("test/model", initial_limit=4, max_limit=8)
+
+    # A full window of healthy responses raises the limit by one
+    for _ in range(5):
+        started_at = await limiter.acquire()
+        limiter.release(started_at)
+    assert limiter.get_stats()["limit"] == 5
+
+    # A rate limit halves it
+    first = await limiter.acquire()
+    second = await limiter.acquire()
+    limiter.release(first, overloaded=True, succeeded=False)
+    assert limiter.get_stats()["limit"] == 2
+
+    # Responses to requests sent before the decrease do not cut it again
+    limiter.release(second - 1, overloaded=True, succeeded=False)
+    assert limiter.get_stats()["decreases"] == 1
+
+@pytest.mark.asyncio
+async def test_slow_responses_hold_the_limit():
+    """Test that a slow response stops the ramp up without cutting the limit"""
+    limiter = AdaptiveConcurrencyLimiter("test/model", initial_limit=4, latency_tolerance=2.0)
+
+    await limiter.acquire()
+    limiter.release(time.monotonic() - 0.2)
+    assert limiter.get_stats()["baseline_latency"] == pytest.approx(0.2, abs=0.05)
+
+    limit = limiter.limit
+    await limiter.acquire()
+    limiter.release(time.monotonic() - 1.0)
+
+    stats = limiter.get_stats()
+    assert limiter.limit == limit
+    assert stats["slow"] == 1
+    assert stats["decreases"] == 0
+
+@pytest.mark.asyncio
+async def test_limit_survives_realistic_latency_variance():
+    """Test that LLM latencies spread over 1-30s do not collapse the limit"""
+    limiter = AdaptiveConcurrencyLimiter("test/model", initial_limit=8, max_limit=64)
+    rng = random.Random(3)
+
+    for _ in range(2000):
+        started_at = await limiter.acquire()
+        # Output lengths vary from a few tokens to the token limit; a few responses stall
+        latency = min(rng.lognormvariate(1.2, 0.8), 30.0) if rng.random() > 0.02 else 45.0
+        limiter.release(started_at - latency)
+
+    stats = limiter.get_stats()
+    assert stats["decreases"] == 0
+    assert stats["limit"] >= 32
+
+    # A rate limit still cuts it
+    started_at = await limiter.acquire()
+    limiter.release(started_at, overloaded=True, succeeded=False)
+    assert limiter.get_stats()["limit"] == stats["limit"] // 2
+
+@pytest.mark.asyncio
+async def test_waiters_are_bounded_and_served_in_order():
+    """Test the bounded FIFO wait queue"""
+    limiter = AdaptiveConcurrencyLimiter("test/model", initial_limit=1, queue_size=2)
+    order = []
+
+    started_at = await limiter.acquire()
+
+    async def wait(name):
+        slot = await limiter.acquire()
+        order.append(name)
+        limiter.release(slot)
+
+    waiters = [asyncio.create_task(wait(name)) for name in ("first", "second")]
+    await asyncio.sleep(0)
+    assert limiter.get_stats()["queued"] == 2
+
+    with pytest.raises(ConcurrencyQueueFullError):
+        await limiter.acquire()
+
+    limiter.release(started_at)
+    await asyncio.gather(*waiters)
+
+    assert order == ["first", "second"]
+    stats = limiter.get_stats()
+    assert stats["rejected"] == 1
+    assert stats["in_flight"] == 0
+    assert stats["queued"] == 0
+
+@pytest.mark.asyncio
+async def test_wait_times_out():
+    """Test that a waiter gives up after its timeout and leaves the queue"""
+    limiter = AdaptiveConcurrencyLimiter("test/model", initial_limit=1)
+    await limiter.acquire()
+
+    with pytest.raises(TimeoutError):
+        await limiter.acquire(timeout=0.05)
+
+    stats = limiter.get_stats()
+    assert stats["queued"] == 0
+    assert stats["timeouts"] == 1
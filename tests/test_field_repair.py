@@ -0,0 +1,147 @@
+"""
+Tests for targeted field repair
+run with venv/bin/activate && python -m pytest
+"""
+import pytest
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.services.field_repair import FieldRepairer
+from jaison.ocr_api.services.openrouter_client import ExtractionResult
+from jaison.ocr_api.utils.json_parser import REPAIR_TRUNCATED
+
+RECEIPT_SCHEMA = {
+    "type": "object",
+    "required": ["merchant", "total", "items"],
+    "properties": {
+        "merchant": {"type": "string"},
+        "total": {"type": "number"},
+        "items": {
+            "type": "array",
+            "items": {"type": "object", "properties": {"price": {"type": "number"}}},
+        },
+    },
+}
+
+@pytest.mark.asyncio
+async def test_only_failing_fields_are_requested_and_merged():
+    """Test that the follow-up asks for the invalid fields only and merges them into the result"""
+    repairer = FieldRepairer()
+    requests = []
+
+    async def extract(prompt, output_schema):
+        requests.append((prompt, output_schema))
+        return ExtractionResult(data={"total": 12.5, "items": [{"price": 12.5}], "merchant": "Ignored"}, model="m")
+
+    result = ExtractionResult(data={"merchant": "Acme", "items": [{"price": "12,50"}]}, model="m", repairs=["x"])
+    repaired = await repairer.repair(result, extract, output_schema=RECEIPT_SCHEMA)
+
+    prompt, schema = requests[0]
+    assert "items[0].price: expected number" in prompt
+    assert "total: missing" in prompt
+    assert set(schema["properties"]) == {"total", "items"}
+    assert schema["required"] == ["total", "items"]
+    assert repaired.data == {"merchant": "Acme", "total": 12.5, "items": [{"price": 12.5}]}
+    assert repaired.repairs == ["x"]
+
+    stats = repairer.get_stats()
+    assert stats["fields_requested"] == 2
+    assert stats["fields_repaired"] == 2
+    assert stats["completed"] == 1
+
+@pytest.mark.asyncio
+async def test_optional_fields_and_allowed_nulls_are_not_repaired():
+    """Test that only required fields trigger a follow-up, and nulls the schema allows do not"""
+    repairer = FieldRepairer()
+    schema = {
+        "type": "object",
+        "required": ["merchant", "total"],
+        "properties": {
+            "merchant": {"type": "string"},
+            "total": {"type": ["number", "null"]},
+            "tax": {"type": "number"},
+        },
+    }
+
+    async def extract(prompt, output_schema):
+        raise AssertionError("no follow-up expected")
+
+    results = [
+        ExtractionResult(data={"merchant": "Acme", "total": None}, model="m"),
+        ExtractionResult(data={"merchant": "Acme", "total": 3, "tax": "n/a"}, model="m"),
+    ]
+    for result in results:
+        assert await repairer.repair(result, extract, output_schema=schema) is result
+
+    # Without a schema there is nothing that is required
+    result = ExtractionResult(data={"total": None}, model="m")
+    assert await repairer.repair(result, extract) is result
+    assert repairer.get_stats()["attempts"] == 0
+
+@pytest.mark.asyncio
+async def test_repaired_result_is_cached_under_the_original_key(tmp_path, monkeypatch):
+    """Test that a cache hit returns the repaired result without another follow-up"""
+    from jaison.ocr_api.api import endpoints
+
+    monkeypatch.setattr(endpoints.micro_batcher, "enabled", False)
+    monkeypatch.setattr(endpoints.result_cache, "cache_dir", str(tmp_path))
+    repairer = FieldRepairer()
+    calls = []
+
+    async def extract_image(image_data, prompt, **kwargs):
+        calls.append(prompt)
+        if len(calls) == 1:
+            return ExtractionResult(data={"merchant": "Acme", "items": []}, model="m")
+        return ExtractionResult(data={"total": 12.5}, model="m")
+
+    monkeypatch.setattr(endpoints.openrouter_client, "extract_image", extract_image)
+
+    async def repair(extraction):
+        return await repairer.repair(
+            extraction,
+            lambda prompt, schema: endpoints.extract_with_cache(b"repair-test-image", prompt, "m", output_schema=schema),
+            output_schema=RECEIPT_SCHEMA,
+        )
+
+    for _ in range(2):
+        result = await endpoints.extract_with_cache(
+            b"repair-test-image", "Extract the receipt", "m", output_schema=RECEIPT_SCHEMA, repair=repair
+        )
+        assert result.data == {"merchant": "Acme", "items": [], "total": 12.5}
+
+    assert len(calls) == 2
+    assert repairer.get_stats()["attempts"] == 1
+
+@pytest.mark.asyncio
+async def test_results_needing_a_full_rerun_are_not_repaired():
+    """Test that unparsed, truncated, wholly invalid and mostly wrong results are returned unchanged"""
+    repairer = FieldRepairer()
+    repairer.max_fields = 2
+
+    async def extract(prompt, output_schema):
+        raise AssertionError("no follow-up expected")
+
+    results = [
+        ExtractionResult(data={"raw_content": "no json"}, model="m"),
+        ExtractionResult(data={"merchant": "Acme"}, model="m", repairs=[REPAIR_TRUNCATED]),
+        ExtractionResult(data={}, model="m"),
+        ExtractionResult(data={"merchant": "Acme", "total": 1, "items": []}, model="m"),
+    ]
+    for result in results:
+        assert await repairer.repair(result, extract, output_schema=RECEIPT_SCHEMA) is result
+    assert repairer.get_stats()["too_many_fields"] == 1
+
+@pytest.mark.asyncio
+async def test_failed_follow_up_keeps_the_result():
+    """Test that an error in the follow-up extraction does not fail the document"""
+    repairer = FieldRepairer()
+
+    async def extract(prompt, output_schema):
+        raise TimeoutError()
+
+    result = ExtractionResult(data={"merchant": "Acme", "items": []}, model="m")
+    assert await repairer.repair(result, extract, output_schema=RECEIPT_SCHEMA) is result
+    assert repairer.get_stats()["errors"] == 1
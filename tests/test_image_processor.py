@@ -0,0 +1,132 @@
+"""
+Tests for the image preprocessing stage
+run with venv/bin/activate && python -m pytest
+"""
+import pytest
+import os
+import asyncio
+from io import BytesIO
+from PIL import Image
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.services.image_processor import (
+    ImageProcessor,
+    ImageQueueFullError,
+    get_image_mime_type,
+    get_target_size,
+    normalize_image,
+)
+from jaison.ocr_api.services.image_profiles import ImageProfile, get_image_profile, DEFAULT_IMAGE_PROFILE
+
+def create_test_image(size=(3000, 1500), mode='RGBA'):
+    """Create a test image"""
+    img = Image.new(mode, size, color='red')
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+@pytest.mark.asyncio
+async def test_normalize_in_process_pool():
+    """Test that images are converted and resized by the worker pool"""
+    processor = ImageProcessor()
+    processor.max_workers = 1
+    try:
+        result = await processor.normalize(create_test_image(), ImageProfile(max_long_edge=1000))
+    finally:
+        await processor.close()
+
+    img = Image.open(BytesIO(result))
+    assert img.format == "JPEG"
+    assert img.mode == "RGB"
+    assert img.size == (1000, 500)
+    assert processor.get_stats()["completed"] == 1
+
+def test_target_size_follows_profile():
+    """Test resizing to the model's effective resolution"""
+    # Never upscale
+    assert get_target_size((800, 600), ImageProfile(max_long_edge=2000)) == (800, 600)
+
+    # Short edge limit applies on top of the long edge limit
+    profile = ImageProfile(max_long_edge=2048, max_short_edge=768)
+    assert get_target_size((4000, 3000), profile) == (1024, 768)
+
+    # An edge spilling just past a tile boundary is pulled back onto the grid
+    profile = ImageProfile(max_long_edge=2000, tile_size=512)
+    assert get_target_size((1060, 500), profile) == (1024, 483)
+    assert get_target_size((1400, 500), profile) == (1400, 500)
+
+def test_smallest_format_is_chosen():
+    """Test that the smallest encoding among the profile's formats is kept"""
+    image = create_test_image((600, 400), mode='RGB')
+    jpeg = normalize_image(image, ImageProfile(formats=["JPEG"]))
+    best = normalize_image(image, ImageProfile(formats=["JPEG", "WEBP", "PNG"]))
+
+    assert get_image_mime_type(jpeg) == "image/jpeg"
+    assert len(best) <= len(jpeg)
+
+def test_compact_image_is_sent_unchanged():
+    """Test that an image needing no resize or conversion is not re-encoded into a larger one"""
+    img = Image.effect_noise((600, 400), 64).convert("RGB")
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=40)
+    compact = buffer.getvalue()
+
+    assert normalize_image(compact, ImageProfile(quality=85)) is compact
+
+    # Resizing or converting the format still re-encodes
+    assert normalize_image(compact, ImageProfile(max_long_edge=300)) != compact
+    assert get_image_mime_type(normalize_image(compact, ImageProfile(formats=["PNG"]))) == "image/png"
+
+def test_profile_lookup_uses_longest_prefix():
+    """Test model name to profile resolution"""
+    assert get_image_profile(None) is DEFAULT_IMAGE_PROFILE
+    assert get_image_profile("unknown/model") is DEFAULT_IMAGE_PROFILE
+    assert get_image_profile("meta-llama/llama-4-maverick:free").tile_size == 336
+
+@pytest.mark.asyncio
+async def test_invalid_image_propagates_error():
+    """Test that errors raised in a worker reach the caller"""
+    processor = ImageProcessor()
+    processor.max_workers = 0  # Default thread pool
+
+    with pytest.raises(Exception):
+        await processor.normalize(b"not an image")
+
+    assert processor.get_stats()["failed"] == 1
+
+@pytest.mark.asyncio
+async def test_queue_is_bounded():
+    """Test that jobs beyond the queue size are rejected"""
+    processor = ImageProcessor()
+    processor.max_workers = 0
+    processor.queue_size = 0
+
+    release = asyncio.Event()
+
+    async def blocked():
+        async with processor._get_slots():
+            await release.wait()
+
+    # Occupy the only slot, then fill the queue
+    holder = asyncio.create_task(blocked())
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(processor.normalize(create_test_image((10, 10))))
+    await asyncio.sleep(0)
+
+    with pytest.raises(ImageQueueFullError):
+        await processor.normalize(create_test_image((10, 10)))
+
+    # Cancelling a queued job frees its place without running it
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    release.set()
+    await holder
+
+    stats = processor.get_stats()
+    assert stats["rejected"] == 1
+    assert stats["cancelled"] == 1
+    assert stats["pending"] == 0
@@ -0,0 +1,120 @@
+"""
+Tests for JSON parsing helpers
+run with venv/bin/activate && python -m pytest
+"""
+import os
+import json
+import random
+import sys
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.utils.json_parser import IncrementalJSONParser, extract_json
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'llm_outputs.jsonl')
+
+def load_corpus():
+    """Load the corpus of model outputs"""
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def is_prefix_of(partial, full):
+    """Whether a repaired value only contains data present in the full value"""
+    if isinstance(partial, dict) and isinstance(full, dict):
+        return all(key in full and is_prefix_of(value, full[key]) for key, value in partial.items())
+    if isinstance(partial, list) and isinstance(full, list):
+        return len(partial) <= len(full) and all(is_prefix_of(a, b) for a, b in zip(partial, full))
+    return partial == full
+
+DOCUMENT = {
+    "merchant": "Acme \"Corp\"",
+    "total": 42.99,
+    "paid": True,
+    "items": [
+        {"name": "Product 1", "price": 19.99},
+        {"name": "Product 2", "price": 23.0},
+    ],
+    "notes": None,
+}
+
+def test_snapshots_only_contain_completed_fields():
+    """Test that every snapshot is valid and never contains truncated values"""
+    text = json.dumps(DOCUMENT, indent=2)
+    parser = IncrementalJSONParser()
+
+    snapshots = []
+    for char in text:
+        parser.feed(char)
+        if parser.has_new_data:
+            snapshots.append(parser.snapshot())
+
+    assert all(isinstance(snapshot, dict) for snapshot in snapshots)
+    assert snapshots[-1] == DOCUMENT
+    assert parser.complete
+
+    # Values only appear once they are fully written
+    for snapshot in snapshots:
+        if "total" in snapshot:
+            assert snapshot["total"] == 42.99
+        if "merchant" in snapshot:
+            assert snapshot["merchant"] == DOCUMENT["merchant"]
+
+def test_prose_and_code_fence_are_skipped():
+    """Test that text around the JSON value is ignored"""
+    parser = IncrementalJSONParser()
+    parser.feed("Sure! Here is the data:\n```json\n{\"total\": 1")
+    assert parser.snapshot() == {}
+
+    parser.feed("0, \"currency\": \"EUR\"}\n```\nLet me know")
+    assert parser.snapshot() == {"total": 10, "currency": "EUR"}
+    assert parser.complete
+
+def test_nothing_complete_yet():
+    """Test that no snapshot is produced before the value starts"""
+    parser = IncrementalJSONParser()
+    parser.feed("Thinking...")
+    assert not parser.has_new_data
+    assert parser.snapshot() is None
+
+@pytest.mark.parametrize("output", [
+    'Here is the result (use {braces}): {"a": 1}',
+    'Sure! [note] {"a":1}',
+])
+def test_brackets_in_prose_before_the_value(output):
+    """Test that a bracket in the prose does not hide the JSON value after it"""
+    extraction = extract_json(output)
+    assert extraction.value == {"a": 1}
+    assert extraction.repairs == ["stripped_surrounding_text"]
+
+@pytest.mark.parametrize("case", load_corpus(), ids=lambda case: case["source"])
+def test_extract_json_corpus(case):
+    """Test extraction and reported repairs over real model outputs"""
+    extraction = extract_json(case["output"])
+
+    if case["expected"] is None:
+        assert extraction is None
+    else:
+        assert extraction.value == case["expected"]
+        assert extraction.repairs == case["repairs"]
+
+def test_extract_json_fuzz():
+    """Test that truncated and mangled outputs never raise and never invent data"""
+    rng = random.Random(1234)
+    complete = [case for case in load_corpus() if case["expected"] is not None and not case["repairs"]]
+
+    for case in complete:
+        output = case["output"]
+
+        # Every possible max-token cut-off
+        for end in range(len(output) + 1):
+            extraction = extract_json(output[:end])
+            if extraction is not None:
+                assert is_prefix_of(extraction.value, case["expected"])
+
+        # Random garbage spliced in
+        for _ in range(200):
+            position = rng.randrange(len(output) + 1)
+            noise = "".join(rng.choice('{}[]",:\\ ax1`\n') for _ in range(rng.randint(1, 4)))
+            extract_json(output[:position] + noise + output[position:])
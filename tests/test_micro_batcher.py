@@ -0,0 +1,126 @@
+"""
+Tests for micro-batching of small documents
+run with venv/bin/activate && python -m pytest
+"""
+import pytest
+import os
+import json
+import asyncio
+from io import BytesIO
+from unittest.mock import patch
+from PIL import Image
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.services.micro_batcher import MicroBatcher
+from jaison.ocr_api.services.openrouter_client import openrouter_client
+
+def create_test_image(color):
+    """Create a small test image"""
+    img = Image.new('RGB', (60, 40), color=color)
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+def create_batcher(size=3, wait_ms=20):
+    """Create an enabled micro-batcher"""
+    batcher = MicroBatcher()
+    batcher.enabled = True
+    batcher.max_batch_size = size
+    batcher.max_wait = wait_ms / 1000
+    return batcher
+
+def completion(content):
+    """Build a chat completion response"""
+    return {"model": "test/model", "choices": [{"message": {"content": json.dumps(content)}}]}
+
+@pytest.mark.asyncio
+async def test_batch_is_split_back_onto_each_document():
+    """Test that a full batch goes out as one request and each caller gets its own entry"""
+    batcher = create_batcher(size=3)
+    payloads = []
+
+    async def make_request(endpoint, payload, deadline=None):
+        payloads.append(payload)
+        # Answer out of order to check the index is honored
+        return completion({"results": [
+            {"index": 2, "data": {"name": "third"}},
+            {"index": 0, "data": {"name": "first"}},
+            {"index": 1, "data": {"name": "second"}},
+        ]})
+
+    images = [create_test_image(color) for color in ("red", "green", "blue")]
+    with patch.object(openrouter_client, '_make_request', side_effect=make_request):
+        results = await asyncio.gather(*(
+            batcher.submit(image, "Extract the card", "test/model") for image in images
+        ))
+
+    assert len(payloads) == 1
+    images_sent = [part for part in payloads[0]["messages"][0]["content"] if part["type"] == "image_url"]
+    assert len(images_sent) == 3
+    assert [result.data["name"] for result in results] == ["first", "second", "third"]
+    assert batcher.get_stats()["batches"] == 1
+
+@pytest.mark.asyncio
+async def test_missing_entries_are_extracted_separately():
+    """Test the fallback for documents the batch answer left out, after the wait expires"""
+    batcher = create_batcher(size=4, wait_ms=10)
+    calls = []
+
+    async def make_request(endpoint, payload, deadline=None):
+        images = [part for part in payload["messages"][0]["content"] if part["type"] == "image_url"]
+        calls.append(len(images))
+        if len(images) > 1:
+            return completion({"results": [{"index": 0, "data": {"name": "first"}}]})
+        return completion({"name": "alone"})
+
+    with patch.object(openrouter_client, '_make_request', side_effect=make_request):
+        results = await asyncio.gather(
+            batcher.submit(create_test_image("red"), "Extract the card", "test/model"),
+            batcher.submit(create_test_image("green"), "Extract the card", "test/model"),
+        )
+
+    assert calls == [2, 1]
+    assert [result.data["name"] for result in results] == ["first", "alone"]
+    assert batcher.get_stats()["split_failures"] == 1
+
+@pytest.mark.asyncio
+async def test_different_prompts_are_not_batched():
+    """Test that only documents with the same model and prompt share a call"""
+    batcher = create_batcher(size=2, wait_ms=10)
+    calls = []
+
+    async def make_request(endpoint, payload, deadline=None):
+        calls.append(payload["messages"][0]["content"][0]["text"])
+        return completion({"name": "card"})
+
+    with patch.object(openrouter_client, '_make_request', side_effect=make_request):
+        await asyncio.gather(
+            batcher.submit(create_test_image("red"), "Extract the card", "test/model"),
+            batcher.submit(create_test_image("red"), "Extract the coupon", "test/model"),
+        )
+
+    assert sorted(calls) == ["Extract the card", "Extract the coupon"]
+    assert batcher.get_stats()["single_jobs"] == 2
+
+@pytest.mark.asyncio
+async def test_api_keys_never_share_a_batch():
+    """Test that documents from different API keys are sent in separate calls"""
+    batcher = create_batcher(size=2, wait_ms=10)
+    calls = []
+
+    async def make_request(endpoint, payload, deadline=None):
+        calls.append(len([part for part in payload["messages"][0]["content"] if part["type"] == "image_url"]))
+        return completion({"name": "card"})
+
+    with patch.object(openrouter_client, '_make_request', side_effect=make_request):
+        await asyncio.gather(
+            batcher.submit(create_test_image("red"), "Extract the card", "test/model", api_key_id="key-a"),
+            batcher.submit(create_test_image("green"), "Extract the card", "test/model", api_key_id="key-b"),
+        )
+
+    assert calls == [1, 1]
+    assert batcher.get_stats()["batches"] == 0
+    assert batcher.get_stats()["single_jobs"] == 2
@@ -0,0 +1,89 @@
+"""
+Tests for the model cascade
+run with venv/bin/activate && python -m pytest
+"""
+import pytest
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.services.model_cascade import ModelCascade
+from jaison.ocr_api.services.openrouter_client import ExtractionResult
+
+def create_cascade():
+    """Create a cascade with a cheap and a large model for receipts"""
+    cascade = ModelCascade()
+    cascade.cascades = {"receipt": ["cheap/model", "large/model"], "default": ["large/model"]}
+    cascade.min_fill_ratio = 0.5
+    return cascade
+
+RECEIPT_FIELDS = ["merchant|store", "total"]
+
+@pytest.mark.asyncio
+async def test_cheap_model_result_is_accepted():
+    """Test that a valid cheap result stops the cascade"""
+    cascade = create_cascade()
+    calls = []
+
+    async def extract(model):
+        calls.append(model)
+        return ExtractionResult(data={"merchant": "Acme", "total": 9.5}, model=model)
+
+    result, tried = await cascade.run("receipt", extract, expected_fields=RECEIPT_FIELDS)
+
+    assert calls == ["cheap/model"]
+    assert tried == ["cheap/model"]
+    assert result.model == "cheap/model"
+    assert cascade.get_stats()["stages"]["receipt"]["cheap/model"]["hit_rate"] == 1.0
+
+@pytest.mark.asyncio
+async def test_invalid_result_escalates():
+    """Test escalation on schema errors, missing fields and low fill ratio"""
+    cascade = create_cascade()
+    schema = {"type": "object", "required": ["total"], "properties": {"total": {"type": "number"}}}
+    answers = {
+        "cheap/model": {"total": "about nine"},
+        "large/model": {"total": 9.5},
+    }
+
+    async def extract(model):
+        return ExtractionResult(data=answers[model], model=model)
+
+    result, tried = await cascade.run("receipt", extract, output_schema=schema)
+    assert tried == ["cheap/model", "large/model"]
+    assert result.data == {"total": 9.5}
+
+    # Template fields are used when there is no schema
+    answers["cheap/model"] = {"merchant": "Acme"}
+    result, _ = await cascade.run("receipt", extract, expected_fields=RECEIPT_FIELDS)
+    assert result.model == "large/model"
+
+    answers["cheap/model"] = {"merchant": "Acme", "total": 9.5, "date": None, "tax": None, "time": None}
+    result, _ = await cascade.run("receipt", extract, expected_fields=RECEIPT_FIELDS)
+    assert result.model == "large/model"
+
+    stages = cascade.get_stats()["stages"]["receipt"]
+    assert stages["cheap/model"]["schema_invalid"] == 1
+    assert stages["cheap/model"]["missing_fields"] == 1
+    assert stages["cheap/model"]["low_confidence"] == 1
+    assert stages["cheap/model"]["hit_rate"] == 0.0
+
+@pytest.mark.asyncio
+async def test_errors_escalate_and_last_stage_result_is_kept():
+    """Test that a failing stage escalates and the last result is returned even if rejected"""
+    cascade = create_cascade()
+
+    async def extract(model):
+        if model == "cheap/model":
+            raise TimeoutError("slow")
+        return ExtractionResult(data={"raw_content": "unreadable"}, model=model)
+
+    result, tried = await cascade.run("receipt", extract)
+
+    assert tried == ["cheap/model", "large/model"]
+    assert result.data == {"raw_content": "unreadable"}
+
+    # Document types without their own cascade use the default one
+    assert cascade.get_models("coupon") == ["large/model"]
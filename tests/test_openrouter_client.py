@@ -4,9 +4,12 @@ run with venv/bin/activate && python -m pytest
 """
 import pytest
 import os
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import base64
 import json
+import asyncio
+import time
+import httpx
 from io import BytesIO
 from PIL import Image
 import sys
@@ -14,7 +17,9 @@ import sys
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from jaison.ocr_api.services.openrouter_client import OpenRouterClient
+from jaison.ocr_api.services.circuit_breaker import CircuitOpenError
+from jaison.ocr_api.services.inference_providers import InferenceProvider, ModelRoute
+from jaison.ocr_api.services.openrouter_client import OpenRouterClient, DeadlineExceededError
 
 # Create a simple test image
 def create_test_image():
@@ -89,17 +94,335 @@ async def test_make_request_timeout():
     # Create client instance
     client = OpenRouterClient()
     client.timeout = 0.1  # Very short timeout for testing
+    client.max_retries = 0
 
     # Mock httpx.AsyncClient to raise TimeoutException
     with patch('httpx.AsyncClient') as mock_client:
         mock_instance = MagicMock()
-        mock_client.return_value.__aenter__.return_value = mock_instance
-        mock_instance.post.side_effect = TimeoutError("Request timed out")
+        mock_client.return_value = mock_instance
+        mock_instance.post = AsyncMock(side_effect=TimeoutError("Request timed out"))
 
         # Call the method and check for exception
         with pytest.raises(TimeoutError):
             await client._make_request("chat/completions", {"test": "payload"})
 
+@pytest.mark.asyncio
+async def test_pooled_client_reused(mock_response):
+    """Test that all requests share one pooled client"""
+    # Create client instance
+    client = OpenRouterClient()
+
+    with patch('httpx.AsyncClient') as mock_client:
+        mock_instance = MagicMock()
+        mock_client.return_value = mock_instance
+        http_response = MagicMock(http_version="HTTP/2")
+        http_response.json.return_value = mock_response
+        mock_instance.post = AsyncMock(return_value=http_response)
+        mock_instance.aclose = AsyncMock()
+
+        await client.start()
+        await client._make_request("chat/completions", {"test": "payload"})
+        await client._make_request("chat/completions", {"test": "payload"})
+
+        # Only one client is created for both requests
+        assert mock_client.call_count == 1
+        stats = client.get_pool_stats()
+        assert stats["requests"] == 2
+        assert stats["http_versions"] == {"HTTP/2": 2}
+
+        await client.close()
+        mock_instance.aclose.assert_awaited_once()
+        assert client.get_pool_stats()["started"] is False
+
+@pytest.mark.asyncio
+async def test_process_image_streaming(mock_response):
+    """Test streaming a completion with partial results"""
+    content = mock_response["choices"][0]["message"]["content"]
+
+    # Split the completion into small SSE chunks
+    events = [": OPENROUTER PROCESSING\n\n"]
+    for i in range(0, len(content), 7):
+        chunk = {"model": "test-model", "choices": [{"delta": {"content": content[i:i + 7]}}]}
+        events.append(f"data: {json.dumps(chunk)}\n\n")
+    events.append("data: [DONE]\n\n")
+
+    def handler(request):
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, text="".join(events), headers={"Content-Type": "text/event-stream"})
+
+    client = OpenRouterClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    partials = []
+
+    async def on_partial(partial):
+        partials.append(partial)
+
+    with patch('jaison.ocr_api.services.openrouter_client.settings.STREAM_PUBLISH_INTERVAL', 0):
+        result = await client.process_image(
+            image_data=create_test_image(),
+            prompt="Extract all information from this receipt",
+            on_partial=on_partial,
+        )
+    await client.close()
+
+    assert result == json.loads(content)
+    assert len(partials) > 1
+    assert partials[-1] == result
+
+@pytest.mark.asyncio
+async def test_failover_to_next_model(mock_response):
+    """Test failing over to a fallback model on 5xx errors"""
+    client = OpenRouterClient()
+    client.fallback_models = ["backup/model"]
+
+    async def make_request(endpoint, payload, deadline=None):
+        if payload["model"] == "primary/model":
+            request = httpx.Request("POST", "https://openrouter.ai/api/v1/chat/completions")
+            raise httpx.HTTPStatusError("unavailable", request=request, response=httpx.Response(503, request=request))
+        return mock_response
+
+    with patch.object(client, '_make_request', side_effect=make_request):
+        result = await client.extract_image(
+            image_data=create_test_image(),
+            prompt="Extract all information from this receipt",
+            model="primary/model",
+        )
+
+    assert result.model == "backup/model"
+    assert "extracted_data" in result.data
+    assert client.get_routing_stats()["failovers"] == 1
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins(mock_response):
+    """Test that a slow primary is hedged and the loser is cancelled"""
+    client = OpenRouterClient()
+    client.fallback_models = ["fast/model"]
+    cancelled = asyncio.Event()
+
+    # Teach the tracker that the primary usually answers in 10ms
+    for _ in range(client.latency_tracker.min_samples):
+        client.latency_tracker.record("slow/model", 0.01)
+
+    async def make_request(endpoint, payload, deadline=None):
+        if payload["model"] == "slow/model":
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        return mock_response
+
+    with patch.object(client, '_make_request', side_effect=make_request), \
+            patch('jaison.ocr_api.services.openrouter_client.settings.OPENROUTER_HEDGE_MIN_DELAY', 0.05):
+        result = await client.extract_image(
+            image_data=create_test_image(),
+            prompt="Extract all information from this receipt",
+            model="slow/model",
+        )
+    await asyncio.wait_for(cancelled.wait(), 1)
+
+    assert result.model == "fast/model"
+    assert client.get_routing_stats()["hedges"] == 1
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_fail_over():
+    """Test that 4xx errors other than 429 are raised without trying fallbacks"""
+    client = OpenRouterClient()
+    client.fallback_models = ["backup/model"]
+    models = []
+
+    async def make_request(endpoint, payload, deadline=None):
+        models.append(payload["model"])
+        request = httpx.Request("POST", "https://openrouter.ai/api/v1/chat/completions")
+        raise httpx.HTTPStatusError("bad request", request=request, response=httpx.Response(400, request=request))
+
+    with patch.object(client, '_make_request', side_effect=make_request):
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.process_image(image_data=create_test_image(), prompt="Extract", model="primary/model")
+
+    assert models == ["primary/model"]
+
+@pytest.mark.asyncio
+async def test_retry_honors_retry_after(mock_response):
+    """Test that 429 responses are retried after the delay the server asked for"""
+    attempts = []
+
+    def handler(request):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0.2"})
+        return httpx.Response(200, json=mock_response)
+
+    client = OpenRouterClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    with patch('jaison.ocr_api.services.openrouter_client.settings.OPENROUTER_RETRY_BASE_DELAY', 0.01):
+        result = await client._make_request("chat/completions", {"model": "test/model"})
+    await client.close()
+
+    assert result == mock_response
+    assert attempts[1] - attempts[0] >= 0.2
+    assert client.get_routing_stats()["retries"] == 1
+
+@pytest.mark.asyncio
+async def test_retry_stops_at_deadline():
+    """Test that no retry is started that could not finish before the deadline"""
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        return httpx.Response(503, headers={"Retry-After": "5"})
+
+    client = OpenRouterClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client._make_request("chat/completions", {"model": "test/model"}, deadline=time.monotonic() + 1)
+    await client.close()
+
+    assert len(attempts) == 1
+
+@pytest.mark.asyncio
+async def test_exhausted_deadline_is_not_a_model_failure():
+    """Test that running out of the caller's deadline neither trips the circuit nor lowers the limit"""
+    async def handler(request):
+        await asyncio.sleep(0.1)
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    client = OpenRouterClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    # Cut short by the deadline while the request was in flight
+    with pytest.raises(DeadlineExceededError):
+        await client._make_request("chat/completions", {"model": "test/model"}, deadline=time.monotonic() + 0.05)
+
+    # Used up before the request was sent
+    with pytest.raises(DeadlineExceededError):
+        await client._make_request("chat/completions", {"model": "test/model"}, deadline=time.monotonic() - 1)
+    await client.close()
+
+    assert client.get_circuit_breaker_states()["test/model"]["total_failures"] == 0
+    assert client.get_concurrency_stats()["test/model"]["decreases"] == 0
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast():
+    """Test that an open circuit rejects requests without calling the model"""
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        return httpx.Response(500)
+
+    client = OpenRouterClient()
+    client.max_retries = 0
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    with patch('jaison.ocr_api.services.openrouter_client.settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD', 2):
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                await client._make_request("chat/completions", {"model": "test/model"})
+
+        with pytest.raises(CircuitOpenError):
+            await client._make_request("chat/completions", {"model": "test/model"})
+    await client.close()
+
+    assert len(attempts) == 2
+    assert client.get_circuit_breaker_states()["test/model"]["state"] == "open"
+
+@pytest.mark.asyncio
+async def test_output_schema_uses_native_structured_outputs(mock_response):
+    """Test that the output schema is sent as a response format to capable models and embedded for others"""
+    client = OpenRouterClient()
+    client.fallback_models = ["backup/model"]
+    schema = {"type": "object", "properties": {"total": {"type": "number"}}}
+    payloads = []
+
+    async def make_request(endpoint, payload, deadline=None):
+        payloads.append(payload)
+        if payload["model"] == "openai/gpt-4o":
+            request = httpx.Request("POST", "https://openrouter.ai/api/v1/chat/completions")
+            raise httpx.HTTPStatusError("unavailable", request=request, response=httpx.Response(503, request=request))
+        return mock_response
+
+    with patch.object(client, '_make_request', side_effect=make_request):
+        await client.extract_image(
+            image_data=create_test_image(),
+            prompt="Extract all information from this receipt",
+            model="openai/gpt-4o",
+            output_schema=schema,
+        )
+
+    native, embedded = payloads[0], payloads[-1]
+    assert native["response_format"]["json_schema"]["schema"] == schema
+    assert "JSON schema" not in native["messages"][0]["content"][0]["text"]
+    assert embedded["response_format"]["type"] == "json_object"
+    assert '"total"' in embedded["messages"][0]["content"][0]["text"]
+    assert client.get_routing_stats()["output_schema_modes"]["prompt"] == 1
+
+@pytest.mark.asyncio
+async def test_routed_model_uses_its_provider(mock_response):
+    """Test that a routed model is sent to its provider under the upstream name, with its own concurrency limit"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=mock_response)
+
+    client = OpenRouterClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    local = InferenceProvider(name="local", base_url="http://vllm.internal:8000/v1/")
+    route = ModelRoute(provider="local", upstream_model="qwen2.5-vl", concurrency_max=4)
+
+    with patch.dict('jaison.ocr_api.services.inference_providers._providers', {"local": local}), \
+            patch.dict('jaison.ocr_api.services.inference_providers._routes', {"local/": route}):
+        await client._make_request("chat/completions", {"model": "local/qwen"})
+        await client._make_request("chat/completions", {"model": "openai/gpt-4o"})
+    await client.close()
+
+    assert str(requests[0].url) == "http://vllm.internal:8000/v1/chat/completions"
+    assert json.loads(requests[0].content)["model"] == "qwen2.5-vl"
+    assert "authorization" not in requests[0].headers
+    assert requests[1].url.host == "openrouter.ai"
+    assert json.loads(requests[1].content)["model"] == "openai/gpt-4o"
+    assert client.get_concurrency_stats()["local/qwen"]["limit"] <= 4
+    assert client.get_pool_stats()["provider_requests"] == {"local": 1, "openrouter": 1}
+
+@pytest.mark.asyncio
+async def test_system_prompt_sent_first_and_cache_use_recorded(mock_response):
+    """Test that the static system prompt leads the messages and cached prompt tokens are counted"""
+    client = OpenRouterClient()
+    client.fallback_models = []
+    payloads = []
+    mock_response["usage"]["prompt_tokens_details"] = {"cached_tokens": 40}
+
+    async def make_request(endpoint, payload, deadline=None):
+        payloads.append(payload)
+        return mock_response
+
+    with patch.object(client, '_make_request', side_effect=make_request):
+        for model in ("anthropic/claude-3.5-sonnet", "meta-llama/llama-4-maverick:free"):
+            await client.extract_image(
+                image_data=create_test_image(),
+                prompt="Extract the total",
+                model=model,
+                system_prompt="You are an expert OCR system.",
+                output_schema={"type": "object"},
+            )
+
+    cached, plain = payloads
+    assert cached["messages"][0]["content"] == [
+        {"type": "text", "text": "You are an expert OCR system.", "cache_control": {"type": "ephemeral"}}
+    ]
+    assert plain["messages"][0] == {"role": "system", "content": "You are an expert OCR system."}
+    assert plain["messages"][1]["content"][0]["text"].startswith("Extract the total")
+    assert "JSON schema" in plain["messages"][1]["content"][0]["text"]
+
+    stats = client.get_prompt_cache_stats()["anthropic/claude-3.5-sonnet"]
+    assert stats["cached_tokens"] == 40
+    assert stats["cached_ratio"] == 0.8
+    assert stats["mean_miss_latency"] is None
+
 @pytest.mark.asyncio
 async def test_invalid_image():
     """Test handling of invalid image data"""
@@ -0,0 +1,89 @@
+"""
+Tests for multi-page PDF support
+run with venv/bin/activate && python -m pytest
+"""
+import pytest
+import os
+import asyncio
+from io import BytesIO
+from PIL import Image
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.services.image_profiles import ImageProfile
+from jaison.ocr_api.services.pdf_processor import PDFProcessor, is_pdf, merge_page_results
+
+pytest.importorskip("pypdfium2")
+
+def create_test_pdf(pages=3):
+    """Create a PDF with one solid color page per color"""
+    colors = ['red', 'green', 'blue', 'white', 'black'][:pages]
+    images = [Image.new('RGB', (850, 1100), color=color) for color in colors]
+    buffer = BytesIO()
+    images[0].save(buffer, format="PDF", save_all=True, append_images=images[1:], resolution=100)
+    return buffer.getvalue()
+
+def test_is_pdf():
+    """Test PDF detection"""
+    assert is_pdf(create_test_pdf(1))
+    assert not is_pdf(b"\xff\xd8\xff\xe0 jpeg data")
+
+def test_merge_page_results():
+    """Test merging per-page results"""
+    pages = [
+        {"vendor": "Acme", "total": None, "items": [{"name": "A"}], "customer": {"name": "Bob"}},
+        {"vendor": "Other", "total": 42, "items": [{"name": "B"}], "customer": {"city": "Rome"}},
+    ]
+    assert merge_page_results(pages) == {
+        "vendor": "Acme",
+        "total": 42,
+        "items": [{"name": "A"}, {"name": "B"}],
+        "customer": {"name": "Bob", "city": "Rome"},
+    }
+
+@pytest.mark.asyncio
+async def test_extract_pages_concurrently():
+    """Test that pages are rendered, extracted under the concurrency limit and merged"""
+    processor = PDFProcessor()
+    processor.page_concurrency = 2
+
+    in_flight = 0
+    max_in_flight = 0
+    progress = []
+
+    async def extract_page(page_image):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+        img = Image.open(BytesIO(page_image))
+        assert max(img.size) == 800
+        return {"pages": [img.getpixel((10, 10))]}
+
+    async def on_progress(done, total, partial):
+        progress.append((done, total))
+
+    result = await processor.extract(
+        create_test_pdf(3), ImageProfile(max_long_edge=800, formats=["PNG"]), extract_page, on_progress
+    )
+
+    # Pages are merged in page order: red, green, blue
+    assert [pixel.index(max(pixel)) for pixel in result["pages"]] == [0, 1, 2]
+    assert max_in_flight <= 2
+    assert progress[-1] == (3, 3)
+
+@pytest.mark.asyncio
+async def test_page_limit():
+    """Test that documents over the page limit are rejected"""
+    processor = PDFProcessor()
+    processor.max_pages = 2
+
+    async def extract_page(page_image):
+        return {}
+
+    with pytest.raises(ValueError):
+        await processor.extract(create_test_pdf(3), ImageProfile(), extract_page)
@@ -0,0 +1,172 @@
+"""
+Tests for near-duplicate detection
+run with venv/bin/activate && python -m pytest
+"""
+import pytest
+import os
+import random
+from io import BytesIO
+from PIL import Image, ImageDraw, ImageFont
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.services.image_processor import compute_dhash, compute_fingerprint, images_match
+from jaison.ocr_api.services.phash_index import PerceptualHashIndex
+
+def hamming(a, b):
+    """Count differing bits"""
+    return bin(a ^ b).count("1")
+
+def make_receipt(items, quality=85):
+    """Render a receipt of a fixed template with the given (name, price) lines"""
+    img = Image.new("RGB", (576, 900), color="white")
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default(size=18)
+    draw.text((180, 20), "MOCK MARKET", fill="black", font=font)
+    draw.text((150, 50), "12 Main St, Springfield", fill="black", font=font)
+    draw.line((20, 90, 556, 90), fill="black", width=2)
+    for row, (name, price) in enumerate(items):
+        draw.text((30, 110 + row * 30), name, fill="black", font=font)
+        draw.text((460, 110 + row * 30), f"{price:6.2f}", fill="black", font=font)
+    draw.line((20, 700, 556, 700), fill="black", width=2)
+    draw.text((30, 720), "TOTAL", fill="black", font=font)
+    draw.text((460, 720), f"{sum(price for _, price in items):6.2f}", fill="black", font=font)
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+def recompress(image_data, quality, size=None):
+    """Re-encode an image as JPEG, at the same size unless another is given"""
+    img = Image.open(BytesIO(image_data))
+    if size is not None:
+        img = img.resize(size, Image.LANCZOS)
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+def test_dhash_matches_recompressed_image():
+    """Test that a re-encoded copy hashes close to the original and another document does not"""
+    with open(os.path.join(os.path.dirname(__file__), 'test_image.jpg'), 'rb') as f:
+        original = f.read()
+
+    img = Image.open(BytesIO(original)).convert("RGB")
+    buffer = BytesIO()
+    img.resize((img.width // 2, img.height // 2)).save(buffer, format="JPEG", quality=40)
+    recompressed = buffer.getvalue()
+
+    other = Image.new("RGB", img.size, color="white")
+    ImageDraw.Draw(other).rectangle((0, 0, img.width // 2, img.height), fill="black")
+    buffer = BytesIO()
+    other.save(buffer, format="PNG")
+
+    assert hamming(compute_dhash(original), compute_dhash(recompressed)) <= 4
+    assert hamming(compute_dhash(original), compute_dhash(buffer.getvalue())) > 10
+
+def test_index_finds_closest_within_distance():
+    """Test lookups by Hamming distance and scope isolation"""
+    index = PerceptualHashIndex(max_distance=4, max_entries=1000)
+    rng = random.Random(7)
+    base = rng.getrandbits(64)
+
+    index.add("key-1:receipt", base, "first")
+    index.add("key-1:receipt", base ^ 0b111, "second")
+    for _ in range(200):
+        index.add("key-1:receipt", rng.getrandbits(64), "noise")
+
+    # Four flipped bits spread over the hash still match; the closest entry wins
+    assert index.find("key-1:receipt", base ^ (1 << 63) ^ (1 << 40) ^ (1 << 20) ^ 1) == "first"
+    assert index.find("key-1:receipt", base ^ 0b110) == "second"
+    assert index.find("key-1:receipt", base ^ 0b11111 << 30) is None
+
+    # Other API keys and document types never see the entry
+    assert index.find("key-2:receipt", base) is None
+    assert index.find("key-1:invoice", base) is None
+
+def test_index_evicts_oldest():
+    """Test that the index stays within max_entries"""
+    index = PerceptualHashIndex(max_distance=2, max_entries=2)
+    index.add("scope", 0, "a")
+    index.add("scope", 0xFFFF, "b")
+    index.add("scope", 0xFFFF << 32, "c")
+
+    assert len(index) == 2
+    assert index.find("scope", 0) is None
+    assert index.find("scope", 0xFFFF << 32) == "c"
+
+
+def test_same_template_documents_are_not_verified():
+    """Test that receipts of one template are hash candidates but fail pixel verification"""
+    tolerance = PerceptualHashIndex().verify_tolerance
+    receipt = make_receipt([("Coffee", 3.50), ("Bagel", 2.25), ("Juice", 4.00)])
+    other = make_receipt([("Coffee", 3.50), ("Bagel", 2.26), ("Juice", 4.00)])
+    receipt_hash, receipt_pixels = compute_fingerprint(receipt)
+    other_hash, other_pixels = compute_fingerprint(other)
+
+    assert hamming(receipt_hash, other_hash) <= PerceptualHashIndex().max_distance
+    assert not images_match(receipt_pixels, other_pixels, tolerance)
+
+    for quality in (95, 75, 60):
+        copy_hash, copy_pixels = compute_fingerprint(recompress(receipt, quality))
+        assert hamming(receipt_hash, copy_hash) <= PerceptualHashIndex().max_distance
+        assert images_match(receipt_pixels, copy_pixels, tolerance)
+
+def test_rescanned_copies_are_verified():
+    """Test that copies a few pixels larger or smaller match, unless a character changed"""
+    tolerance = PerceptualHashIndex().verify_tolerance
+    receipt = make_receipt([("Coffee", 3.50), ("Bagel", 2.25), ("Juice", 4.00)])
+    other = make_receipt([("Coffee", 3.50), ("Bagel", 2.26), ("Juice", 4.00)])
+    _, receipt_pixels = compute_fingerprint(receipt)
+
+    for size, quality in (((570, 891), 85), ((540, 844), 75), ((600, 938), 60)):
+        _, copy_pixels = compute_fingerprint(recompress(receipt, quality, size))
+        _, other_pixels = compute_fingerprint(recompress(other, quality, size))
+        assert images_match(receipt_pixels, copy_pixels, tolerance)
+        assert images_match(copy_pixels, receipt_pixels, tolerance)
+        assert not images_match(receipt_pixels, other_pixels, tolerance)
+
+    # Beyond a few percent the images are not compared at all
+    _, half_pixels = compute_fingerprint(recompress(receipt, 85, (288, 450)))
+    assert not images_match(receipt_pixels, half_pixels, tolerance)
+
+
+@pytest.mark.asyncio
+async def test_same_template_documents_do_not_share_a_result(tmp_path, monkeypatch):
+    """Test that only a re-encoded copy reuses a result, never another receipt of the same template"""
+    from jaison.ocr_api.api import endpoints
+    from jaison.ocr_api.services.openrouter_client import ExtractionResult
+
+    monkeypatch.setattr(endpoints, "phash_index", PerceptualHashIndex())
+    monkeypatch.setattr(endpoints.phash_index, "enabled", True)
+    monkeypatch.setattr(endpoints.image_processor, "max_workers", 0)
+    monkeypatch.setattr(endpoints.micro_batcher, "enabled", False)
+    monkeypatch.setattr(endpoints.result_cache, "cache_dir", str(tmp_path))
+
+    calls = []
+
+    async def extract_image(image_data, **kwargs):
+        calls.append(image_data)
+        return ExtractionResult(data={"call": len(calls)}, model="mock/vision")
+
+    monkeypatch.setattr(endpoints.openrouter_client, "extract_image", extract_image)
+
+    scope = PerceptualHashIndex.make_scope("key-1", "receipt", "Extract the receipt", "mock/vision")
+    receipts = [
+        make_receipt([("Coffee", 3.50), ("Bagel", 2.25), ("Juice", 4.00)]),
+        make_receipt([("Coffee", 3.50), ("Bagel", 2.75), ("Juice", 4.00)]),
+        make_receipt([("Coffee", 3.50), ("Bagels", 2.25), ("Juice", 4.00)]),
+    ]
+    results = [
+        await endpoints.extract_with_cache(receipt, "Extract the receipt", "mock/vision", near_duplicate_scope=scope)
+        for receipt in receipts
+    ]
+
+    assert [result.data["call"] for result in results] == [1, 2, 3]
+    assert endpoints.phash_index.get_stats()["rejected"] >= 2
+
+    copy = await endpoints.extract_with_cache(
+        recompress(receipts[1], 70), "Extract the receipt", "mock/vision", near_duplicate_scope=scope
+    )
+    assert copy.data == {"call": 2}
+    assert len(calls) == 3
@@ -0,0 +1,81 @@
+"""
+Tests for prompt generation
+run with venv/bin/activate && python -m pytest
+"""
+import os
+import sys
+import json
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.api.models import DocumentType, PromptTemplate
+from jaison.ocr_api.services import prompt_service
+from jaison.ocr_api.services.prompt_service import PromptService, build_schema_instruction, estimate_tokens
+
+def test_system_prompt_is_stable_across_requests():
+    """Test that request-specific instructions and schemas only change the user message"""
+    service = PromptService()
+    schema = {"type": "object", "properties": {"total": {"type": "number"}}}
+
+    first = service.generate_prompt(DocumentType.INVOICE, "Only the totals")
+    second = service.generate_prompt(DocumentType.INVOICE, "Include line items", output_schema=schema)
+
+    assert first.system == second.system
+    assert "invoices" in first.system
+    assert "Only the totals" in first.user
+    assert '"total"' in second.user
+    assert '"total"' not in service.generate_prompt(DocumentType.INVOICE, "x", schema, embed_schema=False).user
+
+def test_template_with_placeholders_is_sent_as_user_message():
+    """Test that custom templates with placeholders are formatted as a whole"""
+    service = PromptService()
+    service.templates[DocumentType.TICKET] = PromptTemplate(
+        name="Custom",
+        document_type=DocumentType.TICKET,
+        template="Read the ticket. {user_prompt}",
+        parameters=["user_prompt"],
+    )
+
+    prompt = service.generate_prompt(DocumentType.TICKET, "Only the seat")
+
+    assert prompt.system is None
+    assert prompt.user == "Read the ticket. Only the seat"
+
+def test_schema_instruction_is_compact_and_memoized():
+    """Test that schemas are rendered without whitespace or metadata, once per schema content"""
+    schema = {
+        "$schema": "http://json-schema.org/draft-07/schema#",
+        "type": "object",
+        "properties": {"name": {"type": "string", "description": "Straße"}},
+    }
+    hits = prompt_service._schema_instruction_stats["hits"]
+
+    instruction = build_schema_instruction(schema)
+
+    assert '{"type":"object","properties":{"name":{"type":"string","description":"Straße"}}}' in instruction
+    assert "$schema" not in instruction
+    assert len(instruction) < len(json.dumps(schema, indent=2))
+    assert build_schema_instruction(schema) is instruction
+    assert prompt_service._schema_instruction_stats["hits"] == hits + 1
+
+    # An equal schema parsed from another request reuses the rendering, whatever its key order
+    assert build_schema_instruction(json.loads(json.dumps(schema, sort_keys=True))) is instruction
+    assert prompt_service._schema_instruction_stats["hits"] == hits + 2
+
+def test_prompt_sizes_are_counted_per_document_type():
+    """Test the exported token estimates of generated prompts"""
+    service = PromptService()
+    schema = {"type": "object", "properties": {"total": {"type": "number"}}}
+
+    service.generate_prompt(DocumentType.RECEIPT, "Only the total", schema, embed_schema=False)
+    service.generate_prompt(DocumentType.RECEIPT, "Only the total", schema)
+    plain = service.generate_prompt(DocumentType.RECEIPT, "Only the total")
+
+    stats = service.get_stats()["document_types"]["receipt"]
+    assert stats["prompts"] == 3
+    assert stats["mean_system_tokens"] == estimate_tokens(service.templates[DocumentType.RECEIPT].template)
+    # Only the prompt that embeds the schema counts it, and not again in its user tokens
+    assert stats["mean_schema_tokens"] == estimate_tokens(build_schema_instruction(schema)) / 3
+    assert abs(stats["mean_user_tokens"] - estimate_tokens(plain.user)) <= 1
+    assert stats["max_tokens"] > stats["mean_system_tokens"]
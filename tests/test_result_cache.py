@@ -0,0 +1,106 @@
+"""
+Tests for the extraction result cache
+run with venv/bin/activate && python -m pytest
+"""
+import pytest
+import os
+import sys
+import asyncio
+import threading
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.services.result_cache import ResultCache
+
+@pytest.fixture
+def cache(tmp_path):
+    """Result cache writing to a temporary directory"""
+    cache = ResultCache()
+    cache.enabled = True
+    cache.cache_dir = str(tmp_path / "cache")
+    return cache
+
+def test_make_key_depends_on_all_parts():
+    """Test that image, prompt and model all change the key"""
+    key = ResultCache.make_key(b"image", "prompt", "model")
+    assert key == ResultCache.make_key(b"image", "prompt", "model")
+    assert key != ResultCache.make_key(b"image2", "prompt", "model")
+    assert key != ResultCache.make_key(b"image", "prompt2", "model")
+    assert key != ResultCache.make_key(b"image", "prompt", "model2")
+
+@pytest.mark.asyncio
+async def test_memory_and_disk_tiers(cache):
+    """Test hits from the memory tier and from the disk tier"""
+    await cache.set("abc", {"total": 42})
+    assert await cache.get("abc") == {"total": 42}
+
+    # A new instance on the same directory only has the disk tier
+    reloaded = ResultCache()
+    reloaded.enabled = True
+    reloaded.cache_dir = cache.cache_dir
+    assert await reloaded.get("abc") == {"total": 42}
+    assert await reloaded.get("missing") is None
+
+    stats = reloaded.get_stats()
+    assert stats["disk_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+@pytest.mark.asyncio
+async def test_ttl_expiry(cache):
+    """Test that expired entries are not returned"""
+    cache.ttl = -1
+    await cache.set("abc", {"total": 42})
+    assert await cache.get("abc") is None
+    assert not os.path.exists(cache._get_disk_path("abc"))
+
+@pytest.mark.asyncio
+async def test_size_eviction(cache):
+    """Test that both tiers evict the least recently used entries"""
+    cache.max_memory_entries = 2
+    cache.max_disk_bytes = 200
+
+    for key in ("aa", "bb", "cc"):
+        await cache.set(key, {"value": key * 10})
+
+    assert list(cache._memory) == ["bb", "cc"]
+    assert cache.get_stats()["evictions"] >= 1
+    assert await cache.get("aa") is None
+    assert await cache.get("cc") == {"value": "cc" * 10}
+
+@pytest.mark.asyncio
+async def test_disk_operations_run_off_the_event_loop(cache, monkeypatch):
+    """Test that the index scan, writes and removals run in worker threads"""
+    threads = []
+    for name in ("_scan_disk_index", "_write_file", "_remove_file"):
+        method = getattr(cache, name)
+
+        def tracked(*args, method=method):
+            threads.append((method.__name__, threading.get_ident()))
+            return method(*args)
+
+        monkeypatch.setattr(cache, name, tracked)
+
+    await cache.start()
+    cache.ttl = -1
+    await cache.set("abc", {"total": 42})
+    assert await cache.get("abc") is None
+
+    assert [name for name, _ in threads] == ["_scan_disk_index", "_write_file", "_remove_file"]
+    assert threading.get_ident() not in [ident for _, ident in threads]
+
+@pytest.mark.asyncio
+async def test_writers_do_not_share_a_temporary_file(cache, monkeypatch):
+    """Test that concurrent writes of a key each use their own temporary file, removed on failure"""
+    await asyncio.gather(*(cache.set("abc", {"total": total}) for total in range(5)))
+    shard = os.path.dirname(cache._get_disk_path("abc"))
+    assert os.listdir(shard) == ["abc.json"]
+
+    def failing_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        await cache.set("abd", {"total": 1})
+    assert os.listdir(shard) == ["abc.json"]
@@ -0,0 +1,62 @@
+"""
+Tests for the embedded results store
+run with venv/bin/activate && python -m pytest
+"""
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.api.models import ProcessingResponse, ProcessingStatus
+from jaison.ocr_api.services.results_store import ResultsStore
+
+
+def make_response(request_id, status, created_at):
+    """Build a response as the endpoints save it"""
+    return ProcessingResponse(
+        request_id=request_id, status=status, created_at=created_at, updated_at=created_at
+    ).model_dump()
+
+
+def test_save_get_and_delete(tmp_path):
+    """Test that responses are inserted, replaced and deleted by request ID"""
+    store = ResultsStore(str(tmp_path / "results.db"))
+
+    assert store.save("r1", make_response("r1", ProcessingStatus.PENDING, "2024-01-01T00:00:00"), user_id="u1")
+    assert not store.save("r1", {**make_response("r1", ProcessingStatus.COMPLETED, "2024-01-01T00:00:00"), "result": {"total": 1}})
+
+    saved = store.get("r1")
+    assert saved["status"] == "completed"
+    assert saved["result"] == {"total": 1}
+    assert store.query(user_id="u1")[0]["request_id"] == "r1"  # The user is kept from the first save
+
+    assert store.delete("r1")
+    assert not store.delete("r1")
+    assert store.get("r1") is None
+
+
+def test_query_by_user_status_and_time(tmp_path):
+    """Test the indexed lookups by user, API key, status and creation time"""
+    store = ResultsStore(str(tmp_path / "results.db"))
+    store.save("r1", make_response("r1", ProcessingStatus.COMPLETED, "2024-01-01"), user_id="u1", api_key_id="k1")
+    store.save("r2", make_response("r2", ProcessingStatus.PENDING, "2024-01-02"), user_id="u1", api_key_id="k2")
+    store.save("r3", make_response("r3", ProcessingStatus.PENDING, "2024-01-03"), user_id="u2", api_key_id="k3")
+
+    assert [r["request_id"] for r in store.query(user_id="u1")] == ["r2", "r1"]
+    assert [r["request_id"] for r in store.query(status=ProcessingStatus.PENDING)] == ["r3", "r2"]
+    assert [r["request_id"] for r in store.query(api_key_id="k1")] == ["r1"]
+    assert [r["request_id"] for r in store.query(created_after="2024-01-01", limit=1)] == ["r3"]
+
+    # A second connection, like another API worker, sees committed responses
+    assert ResultsStore(store.db_file).get("r3")["status"] == "pending"
+
+
+def test_import_keeps_newer_responses(tmp_path):
+    """Test that saving without replace does not overwrite a response saved since"""
+    store = ResultsStore(str(tmp_path / "results.db"))
+    store.save("r1", make_response("r1", ProcessingStatus.COMPLETED, "2024-01-01"))
+
+    assert not store.save("r1", make_response("r1", ProcessingStatus.PENDING, "2024-01-01"), replace=False)
+    assert store.save("r2", make_response("r2", ProcessingStatus.PENDING, "2024-01-01"), replace=False)
+    assert store.get("r1")["status"] == "completed"
@@ -0,0 +1,57 @@
+"""
+Tests for result validation
+run with venv/bin/activate && python -m pytest
+"""
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.utils.schema_validator import validate_json, find_missing_fields, get_fill_ratio
+
+SCHEMA = {
+    "type": "object",
+    "required": ["merchant", "total", "items"],
+    "properties": {
+        "merchant": {"type": "string"},
+        "total": {"type": "number", "minimum": 0},
+        "currency": {"type": ["string", "null"], "enum": ["USD", "EUR", None]},
+        "items": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["name", "price"],
+                "properties": {"name": {"type": "string"}, "price": {"type": "number"}},
+            },
+        },
+    },
+}
+
+def test_valid_result_has_no_errors():
+    """Test a result matching the schema"""
+    result = {"merchant": "Acme", "total": 12, "currency": None, "items": [{"name": "Pen", "price": 2.5}]}
+    assert validate_json(result, SCHEMA) == []
+
+def test_errors_carry_field_paths():
+    """Test that missing and invalid fields are reported with their paths"""
+    result = {"total": "12.00", "currency": "GBP", "items": [{"name": "Pen"}, {"name": "Ink", "price": True}]}
+    errors = {error.path: error.message for error in validate_json(result, SCHEMA)}
+
+    assert errors == {
+        "merchant": "missing",
+        "total": "expected number",
+        "currency": "expected one of ['USD', 'EUR', None]",
+        "items[0].price": "missing",
+        "items[1].price": "expected number",
+    }
+
+def test_expected_fields_match_free_form_keys():
+    """Test template field matching on model-chosen key names"""
+    result = {"store_name": "Acme", "purchase": {"purchaseDate": "2024-01-01"}, "total_amount": None}
+    assert find_missing_fields(result, ["merchant|store", "date", "total"]) == ["total"]
+
+def test_fill_ratio():
+    """Test the share of non-null leaf values"""
+    assert get_fill_ratio({"a": 1, "b": None, "c": {"d": "", "e": "x"}}) == 0.5
+    assert get_fill_ratio({}) is None
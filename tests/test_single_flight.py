@@ -0,0 +1,64 @@
+"""
+Tests for single-flight coalescing
+run with venv/bin/activate && python -m pytest
+"""
+import pytest
+import os
+import asyncio
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.utils.single_flight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_identical_calls_share_one_result():
+    """Test that concurrent calls with the same key run once"""
+    flights = SingleFlight()
+    calls = []
+    release = asyncio.Event()
+
+    async def extract():
+        calls.append(1)
+        await release.wait()
+        return {"total": 42}
+
+    waiters = [asyncio.create_task(flights.do("key", extract)) for _ in range(3)]
+    other = asyncio.create_task(flights.do("other", extract))
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(*waiters, other)
+
+    assert len(calls) == 2
+    assert all(result == {"total": 42} for result in results)
+    stats = flights.get_stats()
+    assert stats["coalesced"] == 2
+    assert stats["in_flight"] == 0
+
+    # Later calls start a new flight
+    await flights.do("key", extract)
+    assert len(calls) == 3
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_caller_and_cancellation_does_not():
+    """Test error fan-out, and that a cancelled caller leaves the call running"""
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def fail():
+        await release.wait()
+        raise ValueError("model error")
+
+    first = asyncio.create_task(flights.do("key", fail))
+    second = asyncio.create_task(flights.do("key", fail))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    release.set()
+
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    with pytest.raises(ValueError):
+        await second
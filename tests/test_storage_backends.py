@@ -0,0 +1,239 @@
+"""
+Tests for the local and S3-compatible storage backends
+run with venv/bin/activate && python -m pytest
+"""
+import pytest
+import io
+import os
+import sys
+import threading
+
+from fastapi import UploadFile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.config.settings import settings
+from jaison.ocr_api.services.storage_backends import LocalStorageBackend, S3StorageBackend, is_part_file
+from jaison.ocr_api.services.storage_service import StorageService
+
+PNG_DATA = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 40
+
+
+class ClientError(Exception):
+    """Error shaped like botocore's ClientError"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class FakeS3Client:
+    """In-memory stand-in for an S3-compatible service such as MinIO"""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.calls = []
+
+    def _object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise ClientError("NoSuchKey")
+        return self.objects[(Bucket, Key)]
+
+    def head_object(self, Bucket, Key):
+        self.calls.append("head_object")
+        return {"ContentLength": len(self._object(Bucket, Key))}
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.calls.append(f"get_object {Range}")
+        data = self._object(Bucket, Key)
+        if Range:
+            start, _, end = Range[len("bytes="):].partition("-")
+            data = data[int(start):int(end) + 1 if end else None]
+        return {"Body": io.BytesIO(data)}
+
+    def put_object(self, Bucket, Key, Body):
+        self.calls.append("put_object")
+        self.objects[(Bucket, Key)] = bytes(Body)
+
+    def delete_object(self, Bucket, Key):
+        self.calls.append("delete_object")
+        self.objects.pop((Bucket, Key), None)
+
+    def create_multipart_upload(self, Bucket, Key):
+        self.calls.append("create_multipart_upload")
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.calls.append(f"upload_part {len(Body)}")
+        self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.calls.append("complete_multipart_upload")
+        parts = self.uploads.pop(UploadId)
+        self.objects[(Bucket, Key)] = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.calls.append("abort_multipart_upload")
+        self.uploads.pop(UploadId)
+
+
+def make_s3_backend(client, part_size=1024):
+    """S3 backend over the fake client, with small parts"""
+    backend = S3StorageBackend(bucket="jaison", prefix="test/", client=client)
+    backend.part_size = part_size
+    return backend
+
+
+@pytest.mark.asyncio
+async def test_s3_streams_large_objects_in_parts():
+    """Test that large objects are uploaded part by part and small ones with one request"""
+    client = FakeS3Client()
+    backend = make_s3_backend(client)
+
+    writer = backend.open_writer("uploads/large")
+    for start in range(0, len(PNG_DATA), 700):
+        await writer.write(PNG_DATA[start:start + 700])
+    await writer.commit()
+
+    assert client.objects[("jaison", "test/uploads/large")] == PNG_DATA
+    parts = [call for call in client.calls if call.startswith("upload_part")]
+    assert len(parts) == len(PNG_DATA) // 1024 + 1
+    assert all(part == "upload_part 1024" for part in parts[:-1])
+
+    client.calls.clear()
+    await backend.write("results/small.json", b"{}")
+    assert client.calls == ["put_object"]
+
+
+@pytest.mark.asyncio
+async def test_s3_ranged_reads_and_missing_objects():
+    """Test byte-range reads and the handling of missing keys"""
+    client = FakeS3Client()
+    backend = make_s3_backend(client)
+    await backend.write("uploads/file", PNG_DATA)
+
+    assert await backend.read("uploads/file", 1, 3) == b"PNG"
+    assert await backend.read("uploads/file", len(PNG_DATA) - 2) == PNG_DATA[-2:]
+    assert "get_object bytes=1-3" in client.calls
+
+    assert await backend.read("uploads/missing") is None
+    assert not await backend.exists("uploads/missing")
+    assert not await backend.delete("uploads/missing")
+    assert await backend.delete("uploads/file")
+
+
+@pytest.mark.asyncio
+async def test_s3_abort_discards_the_upload():
+    """Test that an aborted streaming write leaves no object or open multipart upload"""
+    client = FakeS3Client()
+    backend = make_s3_backend(client)
+
+    writer = backend.open_writer("uploads/partial")
+    await writer.write(PNG_DATA)
+    await writer.abort()
+
+    assert client.objects == {}
+    assert client.uploads == {}
+    assert client.calls[-1] == "abort_multipart_upload"
+
+
+@pytest.mark.asyncio
+async def test_local_backend_commits_atomically(tmp_path):
+    """Test that local objects appear only on commit and support ranged reads"""
+    backend = LocalStorageBackend(str(tmp_path))
+
+    writer = backend.open_writer("uploads/ab/cd/file")
+    await writer.write(PNG_DATA)
+    assert not await backend.exists("uploads/ab/cd/file")
+    await writer.commit()
+
+    assert await backend.read("uploads/ab/cd/file", 1, 3) == b"PNG"
+    assert await backend.delete("uploads/ab/cd/file")
+    assert await backend.read("uploads/ab/cd/file") is None
+
+
+@pytest.mark.asyncio
+async def test_local_writers_of_one_key_do_not_share_a_temporary_file(tmp_path):
+    """Test that concurrent writes of a key each commit a complete file"""
+    backend = LocalStorageBackend(str(tmp_path))
+    first = backend.open_writer("results/ab/cd/ab12cd34.json")
+    second = backend.open_writer("results/ab/cd/ab12cd34.json")
+
+    await first.write(b'{"status": ')
+    await second.write(b'{"status": "completed"}')
+    await first.write(b'"pending"}')
+    await second.commit()
+    await first.commit()
+
+    assert await backend.read("results/ab/cd/ab12cd34.json") == b'{"status": "pending"}'
+    assert os.listdir(os.path.join(tmp_path, "results", "ab", "cd")) == ["ab12cd34.json"]
+    assert is_part_file(os.path.basename(first.tmp_path))
+
+
+@pytest.mark.asyncio
+async def test_nodes_sharing_object_storage(tmp_path, monkeypatch):
+    """Test that a file uploaded and a response saved on one node are visible on another"""
+    monkeypatch.chdir(tmp_path)
+    client = FakeS3Client()
+    nodes = []
+    for _ in range(2):
+        node = StorageService()
+        node.backend = make_s3_backend(client)
+        node.flat_fallback = False
+        node.results_store = None
+        nodes.append(node)
+
+    saved = await nodes[0].save_file("3713a25e-aaaa", UploadFile(io.BytesIO(PNG_DATA), filename="scan.png"))
+    await nodes[0].save_processing_response("ab12cd34", {"status": "completed"})
+
+    assert ("jaison", f"test/{saved.key}") in client.objects
+    assert await nodes[1].file_exists("3713a25e-aaaa")
+    assert await nodes[1].read_file("3713a25e-aaaa") == PNG_DATA
+    assert await nodes[1].get_processing_response("ab12cd34") == {"status": "completed"}
+    assert not os.listdir(os.path.join(tmp_path, "uploads"))
+
+
+@pytest.mark.asyncio
+async def test_s3_retention_is_left_to_lifecycle_rules(tmp_path, monkeypatch):
+    """Test that object storage gets no node-local expiry index or sweeper"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "s3")
+    client = FakeS3Client()
+    node = StorageService()
+    node.backend = make_s3_backend(client)
+
+    await node.start()
+    await node.save_file("3713a25e-aaaa", UploadFile(io.BytesIO(PNG_DATA), filename="scan.png"))
+
+    assert node.expiry_index is None
+    assert node.get_stats()["mode"] == "bucket_lifecycle"
+    assert not node.get_stats()["sweeper_running"]
+    assert await node.cleanup_old_files(10 ** 12) == 0
+    assert await node.file_exists("3713a25e-aaaa")
+    assert not os.path.exists(os.path.join(tmp_path, "retention"))
+    await node.close()
+
+
+@pytest.mark.asyncio
+async def test_s3_calls_run_in_their_own_thread_pool():
+    """Test that client calls use a pool sized to the connection pool, not the default executor"""
+    client = FakeS3Client()
+    backend = make_s3_backend(client)
+    threads = []
+    put_object = client.put_object
+
+    def tracked_put_object(**kwargs):
+        threads.append(threading.current_thread().name)
+        return put_object(**kwargs)
+
+    client.put_object = tracked_put_object
+    await backend.write("results/small.json", b"{}")
+
+    assert threads[0].startswith("s3")
+    assert backend._executor._max_workers == backend.max_connections
+    await backend.close()
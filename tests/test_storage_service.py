@@ -0,0 +1,182 @@
+"""
+Tests for the storage service
+run with venv/bin/activate && python -m pytest
+"""
+import pytest
+import io
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import threading
+
+from fastapi import UploadFile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jaison.ocr_api.services.storage_service import StorageService, FileTooLargeError, shard_path, sniff_content_type
+
+PNG_DATA = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 40
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """Storage service writing under a temporary directory, with small chunks"""
+    monkeypatch.chdir(tmp_path)
+    service = StorageService()
+    service.chunk_size = 1024
+    return service
+
+
+@pytest.fixture
+def file_storage(storage):
+    """Storage service saving processing responses as one JSON file each"""
+    storage.results_store = None
+    return storage
+
+
+class CountingFile(io.BytesIO):
+    """File that records the size of each read"""
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.reads.append(len(chunk))
+        return chunk
+
+
+@pytest.mark.asyncio
+async def test_save_file_hashes_and_sniffs_in_one_pass(storage):
+    """Test that the file is saved in bounded chunks with its digest and format"""
+    source = CountingFile(PNG_DATA)
+    saved = await storage.save_file("file-1", UploadFile(source, filename="scan.png"))
+
+    assert saved.key == "uploads/fi/le/file-1"
+    assert saved.size == len(PNG_DATA)
+    assert saved.sha256 == hashlib.sha256(PNG_DATA).hexdigest()
+    assert saved.content_type == "image/png"
+    assert max(source.reads) <= 1024
+    assert await storage.read_file("file-1") == PNG_DATA
+    assert await storage.read_file("file-1", 1, 3) == b"PNG"
+
+
+@pytest.mark.asyncio
+async def test_oversized_upload_is_aborted(storage):
+    """Test that reading stops at the first chunk over the limit and nothing is left on disk"""
+    source = CountingFile(PNG_DATA)
+
+    with pytest.raises(FileTooLargeError):
+        await storage.save_file("file-2", UploadFile(source, filename="scan.png"), max_size=2048)
+
+    assert sum(source.reads) == 3072
+    assert [files for _, _, files in os.walk(storage.upload_dir) if files] == []
+
+
+def test_sniff_content_type():
+    """Test format detection from the first bytes"""
+    assert sniff_content_type(b"\xff\xd8\xff\xe0rest") == "image/jpeg"
+    assert sniff_content_type(b"\n%PDF-1.7") == "application/pdf"
+    assert sniff_content_type(b"GIF89a") is None
+
+
+@pytest.mark.asyncio
+async def test_files_are_sharded_by_id_prefix(file_storage):
+    """Test that uploads and results are written under directories named after the ID prefix"""
+    storage = file_storage
+    saved = await storage.save_file("3713a25e-aaaa", UploadFile(io.BytesIO(PNG_DATA), filename="scan.png"))
+    result_path = await storage.save_processing_response("ab12cd34", {"status": "pending"})
+
+    assert os.path.exists(os.path.join(storage.upload_dir, "37", "13", "3713a25e-aaaa"))
+    assert saved.key == "uploads/37/13/3713a25e-aaaa"
+    assert result_path == "results/ab/12/ab12cd34.json"
+    assert os.path.exists(os.path.join(storage.results_dir, "ab", "12", "ab12cd34.json"))
+    assert shard_path("/data", "x/../y", "x/../y", 2) == os.path.join("/data", "x/../y")
+
+
+@pytest.mark.asyncio
+async def test_flat_layout_is_still_read(file_storage):
+    """Test that files written before sharding are found and superseded by sharded writes"""
+    storage = file_storage
+    flat_path = os.path.join(storage.results_dir, "ab12cd34.json")
+    with open(flat_path, "w") as f:
+        f.write('{"status": "pending"}')
+
+    assert await storage.get_processing_response("ab12cd34") == {"status": "pending"}
+
+    await storage.save_processing_response("ab12cd34", {"status": "completed"})
+    assert not os.path.exists(flat_path)
+    assert await storage.delete_processing_response("ab12cd34")
+    assert await storage.get_processing_response("ab12cd34") is None
+
+
+@pytest.mark.asyncio
+async def test_sweep_deletes_only_expired_artifacts(storage):
+    """Test that a sweep reads the ended expiry buckets and deletes their uploads and results"""
+    storage.retention = {"upload": 3600, "result": 7200}
+    await storage.save_file("3713a25e-aaaa", UploadFile(io.BytesIO(PNG_DATA), filename="scan.png"))
+    await storage.save_processing_response("ab12cd34", {"status": "pending"})
+    await storage.save_processing_response("ab12cd34", {"status": "completed"})
+
+    now = time.time()
+    assert await storage.cleanup_old_files(now) == 0
+    assert await storage.cleanup_old_files(now + 3600 + storage.expiry_index.bucket_seconds) == 1
+    assert not await storage.file_exists("3713a25e-aaaa")
+    assert await storage.get_processing_response("ab12cd34") == {"status": "completed"}
+
+    assert await storage.cleanup_old_files(now + 7200 + storage.expiry_index.bucket_seconds) == 1
+    assert await storage.get_processing_response("ab12cd34") is None
+
+    stats = storage.get_stats()
+    assert stats["deleted"] == {"upload": 1, "result": 1}
+    assert stats["entries"] == 2  # The rewritten response is indexed once
+    assert stats["index"]["buckets"] == 0
+
+
+@pytest.mark.asyncio
+async def test_sweep_skips_artifacts_kept_forever(storage):
+    """Test that artifact types with no retention are not indexed"""
+    storage.retention = {"upload": 0, "result": 3600}
+    await storage.save_file("3713a25e-aaaa", UploadFile(io.BytesIO(PNG_DATA), filename="scan.png"))
+
+    assert await storage.cleanup_old_files(time.time() + 10 ** 9) == 0
+    assert await storage.file_exists("3713a25e-aaaa")
+
+
+@pytest.mark.asyncio
+async def test_result_files_are_read_until_migrated(storage):
+    """Test that responses saved as files before the results store was enabled are still served and deleted"""
+    with open(os.path.join(storage.results_dir, "ab12cd34.json"), "w") as f:
+        f.write('{"status": "processing"}')
+
+    assert await storage.get_processing_response("ab12cd34") == {"status": "processing"}
+
+    await storage.save_processing_response("ab12cd34", {"status": "completed"})
+    assert await storage.get_processing_response("ab12cd34") == {"status": "completed"}
+
+    assert await storage.delete_processing_response("ab12cd34")
+    assert await storage.get_processing_response("ab12cd34") is None
+
+
+@pytest.mark.asyncio
+async def test_results_store_runs_off_the_event_loop(storage, monkeypatch):
+    """Test that database calls run in a worker thread and the store is closed with the service"""
+    threads = []
+    get = storage.results_store.get
+
+    def tracked_get(request_id):
+        threads.append(threading.get_ident())
+        return get(request_id)
+
+    monkeypatch.setattr(storage.results_store, "get", tracked_get)
+    await storage.save_processing_response("ab12cd34", {"status": "pending"})
+    assert await storage.get_processing_response("ab12cd34") == {"status": "pending"}
+    assert threads and threading.get_ident() not in threads
+
+    await storage.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        get("ab12cd34")